@@ -0,0 +1,74 @@
+"""
+Surcoût de l'authentification par clé API, par requête : cache chaud (aucune
+requête SQL) et cache froid (résolution en base à chaque appel).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_auth [--keys 1000] [--requests 20000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import setup_django, temporary_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import RequestFactory
+    from projet.authentication import APIKeyAuthentication, api_key_cache
+    from tickets.models import ApiKey
+
+    with temporary_database():
+        raw_keys = [ApiKey.generate(f'Plateforme {i % 50}')[1] for i in range(args.keys)]
+        factory = RequestFactory()
+        rng = random.Random(1)
+        requests = [
+            factory.post('/api/tickets/submit/', HTTP_X_API_KEY=rng.choice(raw_keys))
+            for _ in range(args.requests)
+        ]
+        unknown = [
+            factory.post('/api/tickets/submit/', HTTP_X_API_KEY=f'inconnue-{i % 100}')
+            for i in range(args.requests)
+        ]
+        authentication = APIKeyAuthentication()
+
+        def run(label, reqs, clear_each=False, expect_failure=False):
+            api_key_cache.clear()
+            if not clear_each:
+                for request in reqs:  # préchauffage
+                    try:
+                        authentication.authenticate(request)
+                    except Exception:
+                        pass
+            executed = []
+
+            def count_queries(execute, sql, params, many, context):
+                executed.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_queries):
+                start = time.perf_counter()
+                for request in reqs:
+                    if clear_each:
+                        api_key_cache._entries.clear()
+                    try:
+                        authentication.authenticate(request)
+                    except Exception:
+                        if not expect_failure:
+                            raise
+                elapsed = time.perf_counter() - start
+            print(f"{label:<40} {elapsed / len(reqs) * 1e6:>10.1f} µs {len(executed) / len(reqs):>8.3f} requêtes SQL")
+
+        print(f"{'scénario':<40} {'par requête':>13} {'SQL/requête':>20}")
+        run('cache chaud, clés valides', requests)
+        run('cache chaud, clés inconnues (négatif)', unknown, expect_failure=True)
+        run('cache froid, clés valides', requests, clear_each=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Débit du regroupement en incidents avec un grand nombre d'empreintes déjà
+stockées (pire cas : chaque ticket antérieur forme son propre incident, tous
+encore ouverts) : calcul de l'empreinte, recherche de l'incident par les
+bandes indexées, et rattachement d'un lot de tickets.
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_clustering [--clusters 1000000] [--batch 500]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import PLATFORMS, measure, setup_django, temporary_database
+
+TEXTS = [
+    ('Site inaccessible', 'Bonjour, le site est inaccessible depuis ce matin.'),
+    ('Plus rien ne fonctionne', 'Plus rien ne fonctionne sur la plateforme depuis 10h.'),
+    ('Impossible de me connecter', 'Je ne peux plus me connecter à mon compte, erreur 500.'),
+    ('Problème de facturation', 'Ma facture de mars est erronée.'),
+]
+
+
+def seed_clusters(count, batch_size=10000, seed=42):
+    from django.utils import timezone
+    from tickets.clustering import bands, to_signed
+    from tickets.models import IncidentCluster
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    batch = []
+    for i in range(count):
+        fingerprint = rng.getrandbits(64)
+        batch.append(IncidentCluster(
+            platform_name=rng.choice(PLATFORMS), label=f'Incident {i}', fingerprint=to_signed(fingerprint),
+            ticket_count=1, first_seen_at=now, last_seen_at=now,
+            **{f'band_{band}': value for band, value in enumerate(bands(fingerprint))}
+        ))
+        if len(batch) == batch_size:
+            IncidentCluster.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        IncidentCluster.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clusters', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import transaction
+    from tickets.clustering import ClusterAssigner, simhash
+    from tickets.models import Ticket
+
+    with temporary_database():
+        print(f"Insertion de {args.clusters} empreintes d'incidents...")
+        seed_clusters(args.clusters)
+
+        rng = random.Random(7)
+        platform = PLATFORMS[0]
+        subject, message = TEXTS[0]
+        fingerprint = simhash(subject, message)
+
+        results = [
+            ('empreinte SimHash', lambda: simhash(subject, message)),
+            ('recherche des candidats (bandes)', lambda: ClusterAssigner().find(platform, rng.getrandbits(64))),
+        ]
+        print(f"{'scénario':<40} {'médiane (ms)':>13} {'p95 (ms)':>10}")
+        for label, func in results:
+            median, p95 = measure(func, repeat=args.repeat)
+            print(f"{label:<40} {median:>13.3f} {p95:>10.3f}")
+
+        candidates = len(ClusterAssigner().candidates(platform, fingerprint))
+        print(f"candidats examinés pour une empreinte : {candidates}")
+
+        # Lot mêlant doublons d'incidents en cours et textes inédits
+        tickets = []
+        for i in range(args.batch):
+            if i % 2:
+                subject, message = rng.choice(TEXTS)
+            else:
+                subject, message = f'Question {i}', f'Demande {rng.getrandbits(32)} sur le compte {i}.'
+            tickets.append(Ticket(
+                first_name='Awa', last_name='Dossou', email=f'client{i}@example.com',
+                subject=subject, message=message, platform_name=rng.choice(PLATFORMS),
+            ))
+        start = time.perf_counter()
+        with transaction.atomic():
+            assigner = ClusterAssigner()
+            assigner.assign_many(tickets)
+            Ticket.objects.bulk_create(tickets)
+            assigner.finish()
+        elapsed = time.perf_counter() - start
+        clusters = len({ticket.cluster_id for ticket in tickets})
+        print(
+            f"lot de {args.batch} tickets : {elapsed * 1000:.1f} ms, "
+            f"{args.batch / elapsed:,.0f} tickets/s, {clusters} incident(s)"
+        )
+
+
+if __name__ == '__main__':
+    main()
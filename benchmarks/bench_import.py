@@ -0,0 +1,72 @@
+"""
+Import en masse (commande import_tickets, tickets/importer.py) : débit en
+lignes/s d'un fichier JSONL, validation dans ce processus puis dans un pool,
+comparé au chemin de l'API (validation et enregistrement ticket par ticket,
+sans le coût HTTP). Une ligne sur cinquante est invalide.
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_import [--rows 100000] [--workers 4]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.utils import PLATFORMS, setup_django, temporary_database
+
+SUBJECTS = ['Site inaccessible', 'Lenteur du tableau de bord', 'Question sur ma facture', 'Paiement non reçu']
+
+
+def write_file(path, rows, rng):
+    with open(path, 'w', encoding='utf-8') as stream:
+        for i in range(rows):
+            row = {
+                'first_name': 'Prénom', 'last_name': 'Nom', 'email': f'client{i}@example.com',
+                'subject': rng.choice(SUBJECTS), 'message': 'Bonjour, ' + 'détail du problème. ' * rng.randint(1, 30),
+                'platform_name': rng.choice(PLATFORMS), 'submission_date': f'2023-{rng.randint(1, 12):02d}-15T10:00:00Z',
+            }
+            if i % 50 == 0:
+                row['email'] = 'invalide'
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--api-rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from tickets.importer import import_tickets, read_rows
+    from tickets.models import Ticket
+    from tickets.serializers import TicketSerializer
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory, temporary_database():
+        path = os.path.join(directory, 'tickets.jsonl')
+        write_file(path, args.rows, rng)
+        print(f"{args.rows} lignes, {os.path.getsize(path) / 1e6:.1f} Mo")
+
+        started = time.perf_counter()
+        for number, row in read_rows(path):
+            if number > args.api_rows:
+                break
+            serializer = TicketSerializer(data=row)
+            if serializer.is_valid():
+                serializer.save()
+        elapsed = time.perf_counter() - started
+        print(f"chemin de l'API, {args.api_rows} lignes : {args.api_rows / elapsed:.0f} lignes/s")
+
+        for workers in sorted({1, args.workers}):
+            Ticket.objects.all().delete()
+            result = import_tickets(path, source=f'bench-{workers}', workers=workers, rejected_path=path + f'.{workers}.rejected')
+            print(
+                f"import_tickets, {workers} processus : {result.read / result.seconds:.0f} lignes/s "
+                f"({result.imported} importés, {result.rejected} refusés, {result.seconds:.1f} s)"
+            )
+
+
+if __name__ == '__main__':
+    main()
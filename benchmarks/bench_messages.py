@@ -0,0 +1,103 @@
+"""
+Effet du stockage à part des messages longs (tickets/message_store.py) : taille
+de la table des tickets et durée des lectures qui ne montrent pas le message
+(liste de l'admin, parcours complet pour un filtre non indexé), avec tous les
+messages dans la table (« en ligne ») puis seulement leur début.
+
+Sous SQLite, un message long déborde sur des pages chaînées, lues dès qu'une
+colonne placée après lui est demandée (message_truncated, cluster...). Sous
+PostgreSQL, TOAST compresse et sort déjà les grands textes de la ligne : le gain
+y est surtout sur la taille (compression zlib d'un journal répétitif). Base
+en cache, les durées bougent peu : le gain vient quand la table ne tient plus
+en mémoire (pages lues sur disque, sauvegardes, VACUUM).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_messages [--tickets 20000] [--long-ratio 0.1]
+"""
+import argparse
+import random
+
+from benchmarks.utils import PLATFORMS, measure, setup_django, temporary_database
+
+LINES = [
+    'ERROR [payment] Timeout contacting gateway after 30000 ms\n',
+    'WARN  [auth] Token refresh failed for session {n}\n',
+    'INFO  [http] GET /api/certificats/{n} 500 1234 ms\n',
+    '    at com.esseyi.api.Handler.invoke(Handler.java:{n})\n',
+]
+
+
+def log_message(rng, size):
+    parts = ['Bonjour, voici le journal complet :\n']
+    length = len(parts[0])
+    while length < size:
+        line = rng.choice(LINES).format(n=rng.randint(1, 99999))
+        parts.append(line)
+        length += len(line)
+    return ''.join(parts)
+
+
+def table_sizes(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ('tickets_ticket', 'tickets_ticketmessage') GROUP BY name"
+        )
+        return dict(cursor.fetchall())
+
+
+def run(args, inline_length):
+    from django.db import connection
+    from django.test import override_settings
+    from tickets.models import Ticket
+
+    rng = random.Random(42)
+    with temporary_database(on_disk=True), override_settings(TICKET_MESSAGE_INLINE_LENGTH=inline_length):
+        batch = []
+        for i in range(args.tickets):
+            message = log_message(rng, args.long_size) if rng.random() < args.long_ratio else 'Message court.'
+            batch.append(Ticket(
+                first_name='Prénom', last_name='Nom', email=f'client{i}@example.com', subject=f'Sujet {i}',
+                message=message, platform_name=rng.choice(PLATFORMS),
+            ))
+            if len(batch) == 5000:
+                Ticket.objects.bulk_create(batch)
+                batch = []
+        Ticket.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        sizes = table_sizes(connection)
+
+        changelist = lambda: list(
+            Ticket.objects.defer('message').select_related('agent').order_by('-submission_date', '-pk')[:100]
+        )
+        scan = lambda: Ticket.objects.filter(email__endswith='7@example.com', message_truncated=False).count()
+        pk = Ticket.objects.filter(message_truncated=True).values_list('pk', flat=True).first()
+        pk = pk or Ticket.objects.order_by('pk').values_list('pk', flat=True).first()
+        detail = lambda: Ticket.objects.get(pk=pk).full_message
+        timings = [measure(func, repeat=args.repeat) for func in (changelist, scan, detail)]
+    return sizes, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--long-ratio', type=float, default=0.1, help="part des tickets avec un journal collé")
+    parser.add_argument('--long-size', type=int, default=40000, help="taille d'un journal, en caractères")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    print(f"{args.tickets} tickets, {args.long_ratio:.0%} avec un message de {args.long_size} caractères")
+    print(f"{'stockage':<10} {'tickets Mo':>10} {'messages Mo':>11} {'liste ms':>9} {'parcours ms':>12} {'fiche ms':>9}")
+    for label, inline_length in (('en ligne', 10 ** 9), ('à part', settings.TICKET_MESSAGE_INLINE_LENGTH)):
+        sizes, timings = run(args, inline_length)
+        print(
+            f"{label:<10} {sizes.get('tickets_ticket', 0) / 2 ** 20:>10.1f} "
+            f"{sizes.get('tickets_ticketmessage', 0) / 2 ** 20:>11.1f} "
+            + ' '.join(f"{median:>{width}.1f}" for (median, _), width in zip(timings, (9, 12, 9)))
+        )
+
+
+if __name__ == '__main__':
+    main()
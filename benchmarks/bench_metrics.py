@@ -0,0 +1,73 @@
+"""
+Coût du middleware de métriques (projet/metrics.py) :
+- à vide : appel du middleware autour d'une vue qui ne fait rien ;
+- sur la soumission de tickets (quelques requêtes SQL), sans et avec le
+  middleware dans MIDDLEWARE.
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_metrics [--calls 100000] [--requests 500]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.utils import percentile, setup_django, temporary_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory, override_settings
+    from projet.authentication import api_key_cache
+    from projet.metrics import MetricsMiddleware, registry
+    from tickets.models import ApiKey
+    from tickets.throttling import _memory_store
+    from benchmarks.seed import TicketFactory
+
+    request = RequestFactory().get('/api/tickets/')
+    response = HttpResponse()
+
+    def view(request):
+        return response
+
+    middleware = MetricsMiddleware(view)
+    print(f"{'à vide':<28} {'µs par appel':>14}")
+    for label, func in (('sans middleware', view), ('avec middleware', middleware)):
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            func(request)
+        print(f"{label:<28} {(time.perf_counter() - start) / args.calls * 1e6:>14.2f}")
+
+    without = [name for name in settings.MIDDLEWARE if name != 'projet.metrics.MetricsMiddleware']
+    with temporary_database(), override_settings(TICKET_THROTTLE_ENABLED=False):
+        api_key_cache.clear()
+        _memory_store.clear()
+        api_key = ApiKey.generate('CV Studioo')[1]
+        payloads = [json.dumps(TicketFactory().payload()) for _ in range(args.requests)]
+
+        def submit(middleware):
+            client = Client()
+            latencies = []
+            with override_settings(MIDDLEWARE=middleware):
+                for payload in payloads:
+                    start = time.perf_counter()
+                    client.post('/api/tickets/submit/', payload, content_type='application/json', HTTP_X_API_KEY=api_key)
+                    latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+
+        print(f"\n{'soumission':<28} {'p50 (ms)':>9} {'p95 (ms)':>9} {'moyenne (ms)':>13}")
+        submit(settings.MIDDLEWARE)  # échauffement
+        for label, middleware in (('sans middleware', without), ('avec middleware', settings.MIDDLEWARE)):
+            registry.clear()
+            latencies = submit(middleware)
+            mean = sum(latencies) / len(latencies)
+            print(f"{label:<28} {percentile(latencies, 0.5):>9.3f} {percentile(latencies, 0.95):>9.3f} {mean:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
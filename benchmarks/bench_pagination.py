@@ -0,0 +1,66 @@
+"""
+Latence de la liste des tickets : page 1 et page profonde, avant (OFFSET et
+double COUNT(*)) et après (comptage estimé et curseur keyset).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_pagination [--rows 1000000] [--page 10000]
+"""
+import argparse
+
+from benchmarks.utils import measure, seed_tickets, setup_django, temporary_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--page', type=int, default=10_000)
+    parser.add_argument('--per-page', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from tickets.models import Ticket
+    from tickets.pagination import EstimatedCountPaginator, after_cursor, encode_cursor
+
+    with temporary_database():
+        print(f"Insertion de {args.rows} tickets...")
+        seed_tickets(args.rows)
+
+        last_page = max(1, (args.rows + args.per_page - 1) // args.per_page)
+        page = min(args.page, last_page)
+        per_page = args.per_page
+        queryset = Ticket.objects.order_by('-submission_date', '-pk')
+        filtered = queryset.filter(status='resolu')
+
+        def offset_page(number):
+            def run():
+                # Avant : COUNT(*) filtré, COUNT(*) total, puis OFFSET
+                filtered.count()
+                queryset.count()
+                list(filtered[(number - 1) * per_page:number * per_page])
+            return run
+
+        # Curseur de la page précédant la page profonde (calculé hors mesure)
+        previous_last = filtered[(page - 1) * per_page - 1] if page > 1 else None
+        cursor = encode_cursor(previous_last) if previous_last else None
+
+        def keyset_page(cursor):
+            def run():
+                EstimatedCountPaginator(filtered, per_page).count
+                rows = after_cursor(filtered, cursor) if cursor else filtered
+                list(rows[:per_page])
+            return run
+
+        results = [
+            ('page 1, OFFSET + 2 COUNT(*)', offset_page(1)),
+            (f'page {page}, OFFSET + 2 COUNT(*)', offset_page(page)),
+            ('page 1, curseur + estimation', keyset_page(None)),
+            (f'page {page}, curseur + estimation', keyset_page(cursor)),
+        ]
+        print(f"{'scénario':<40} {'médiane (ms)':>13} {'p95 (ms)':>10}")
+        for label, func in results:
+            median, p95 = measure(func, args.repeat)
+            print(f"{label:<40} {median:>13.2f} {p95:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
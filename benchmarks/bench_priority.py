@@ -0,0 +1,80 @@
+"""
+Micro-benchmark du classifieur de priorité.
+
+Compare, pour un nombre croissant de règles, l'ancien parcours
+``any(keyword in subject ...)`` et le classifieur compilé de tickets.priority.
+
+    python -m benchmarks.bench_priority [--rules 40 1000 5000] [--tickets 2000]
+"""
+import argparse
+import random
+import time
+
+from tickets.priority import DEFAULT_RULES, PriorityClassifier, normalize
+
+WORDS = [
+    'compte', 'paiement', 'connexion', 'serveur', 'page', 'formulaire', 'facture',
+    'certificat', 'inscription', 'profil', 'mot', 'passe', 'erreur', 'session',
+    'commande', 'affichage', 'bouton', 'lien', 'courriel', 'document', 'téléchargement',
+    'interface', 'mobile', 'abonnement', 'remboursement', 'validation', 'examen',
+]
+
+
+def make_rules(count, rng):
+    rules = {level: list(keywords) for level, keywords in DEFAULT_RULES.items()}
+    levels = list(rules)
+    while sum(len(keywords) for keywords in rules.values()) < count:
+        phrase = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4)))
+        rules[rng.choice(levels)].append(f'{phrase} {rng.randint(0, 10 ** 6)}')
+    return rules
+
+
+def make_subjects(count, rng):
+    samples = ['Site inaccessible', 'Lenteur sur la page', 'Question sur ma facture', 'Bonjour']
+    return [
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) + ' ' + rng.choice(samples)
+        for _ in range(count)
+    ]
+
+
+def legacy_classify(rules, subject):
+    subject = subject.lower()
+    for level, keywords in rules.items():
+        if any(keyword in subject for keyword in keywords):
+            return level
+    return 'basse'
+
+
+def per_ticket_us(func, subjects):
+    start = time.perf_counter()
+    for subject in subjects:
+        func(subject)
+    return (time.perf_counter() - start) / len(subjects) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, nargs='+', default=[40, 1000, 5000])
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    subjects = make_subjects(args.tickets, rng)
+
+    print(f"{'règles':>8} {'compilation (ms)':>17} {'ancien (µs/ticket)':>19} {'compilé (µs/ticket)':>20}")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        start = time.perf_counter()
+        classifier = PriorityClassifier(rules)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        # L'ancien code ne normalisait pas ; on compare à texte égal.
+        legacy_rules = {level: [normalize(k) for k in keywords] for level, keywords in rules.items()}
+        legacy = per_ticket_us(lambda s: legacy_classify(legacy_rules, normalize(s)), subjects)
+        compiled = per_ticket_us(classifier.classify, subjects)
+        print(f"{classifier.rule_count:>8} {compile_ms:>17.1f} {legacy:>19.1f} {compiled:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Simulation de l'attribution automatique (tickets/scheduler.py) : une file de
+tickets nouveaux répartie entre des agents de charges initiales inégales, dont
+une partie ne traite qu'une plateforme.
+
+Mesure d'abord le choix des agents seul (tas en mémoire), puis les passages
+complets en base (lecture de la file, un UPDATE par agent) : durée par lot et
+équité de la répartition finale (écart max - min, indice de Jain : 1 = charges
+égales). Sous SQLite, l'essentiel du temps en base vient des triggers de
+statistiques (tickets/stats.py), exécutés pour chaque ligne passée en cours.
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_scheduler [--tickets 100000] [--agents 200]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.utils import PLATFORMS, percentile, setup_django, temporary_database
+
+
+def jain(values):
+    values = list(values)
+    squares = sum(value * value for value in values)
+    return sum(values) ** 2 / (len(values) * squares) if squares else 1.0
+
+
+def describe(loads):
+    values = list(loads.values())
+    return (
+        f"charges min {min(values)}, max {max(values)}, moyenne {statistics.mean(values):.1f}, "
+        f"Jain {jain(values):.4f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--agents', type=int, default=200)
+    parser.add_argument('--specialists', type=float, default=0.3, help="part des agents limités à une plateforme")
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Count
+    from django.test import override_settings
+    from tickets.models import Ticket
+    from tickets.scheduler import AgentLoads, Scheduler
+
+    rng = random.Random(42)
+    initial = {agent: rng.randint(0, 30) for agent in range(args.agents)}
+    skills = {
+        agent: frozenset([rng.choice(PLATFORMS)])
+        for agent in range(args.agents) if rng.random() < args.specialists
+    }
+    platforms = [rng.choice(PLATFORMS) for _ in range(args.tickets)]
+    print(f"{args.tickets} tickets en file, {args.agents} agents dont {len(skills)} limités à une plateforme")
+    print(f"avant : {describe(initial)}")
+
+    loads = AgentLoads()
+    loads.update(dict(initial), skills)
+    started = time.perf_counter()
+    for platform in platforms:
+        loads.add(loads.pick(platform))
+    elapsed = time.perf_counter() - started
+    print(f"\nchoix en mémoire : {elapsed * 1000:.0f} ms, {elapsed / args.tickets * 1e6:.2f} µs par ticket")
+    print(f"après : {describe(loads.loads)}")
+
+    with temporary_database():
+        User.objects.bulk_create(
+            User(username=f'agent{i}', email=f'agent{i}@example.com', is_staff=True) for i in range(args.agents)
+        )
+        agents = list(User.objects.filter(is_staff=True).order_by('pk'))
+        open_tickets = []
+        for index, agent in enumerate(agents):
+            open_tickets += [
+                Ticket(first_name='Prénom', last_name='Nom', email='client@example.com', subject='Sujet',
+                       message='Message', platform_name=PLATFORMS[0], status='en cours de traitement', agent=agent)
+                for _ in range(initial[index])
+            ]
+        Ticket.objects.bulk_create(open_tickets, batch_size=5000)
+        Ticket.objects.bulk_create((
+            Ticket(first_name='Prénom', last_name='Nom', email=f'client{i}@example.com', subject=f'Sujet {i}',
+                   message='Message', platform_name=platform, priority=rng.choice(['basse', 'basse', 'moyenne', 'critique']))
+            for i, platform in enumerate(platforms)
+        ), batch_size=5000)
+        agent_skills = {agents[index].username: sorted(handled) for index, handled in skills.items()}
+
+        with override_settings(TICKET_AGENT_SKILLS=agent_skills, TICKET_SCHEDULER_MAX_LOAD=0):
+            scheduler = Scheduler(batch_size=args.batch_size, refresh_interval=3600)
+            timings = []
+            assigned = 0
+            started = time.perf_counter()
+            while True:
+                batch_started = time.perf_counter()
+                result = scheduler.run_once()
+                if not result.assigned:
+                    break
+                timings.append((time.perf_counter() - batch_started) * 1000)
+                assigned += result.assigned
+            elapsed = time.perf_counter() - started
+
+        final = dict(
+            Ticket.objects.filter(status='en cours de traitement')
+            .values_list('agent').annotate(n=Count('pk'))
+        )
+        print(
+            f"\nen base, lots de {args.batch_size} : {assigned} tickets en {elapsed:.1f} s "
+            f"({assigned / elapsed:.0f}/s), lot médian {statistics.median(timings):.1f} ms, "
+            f"p95 {percentile(timings, 0.95):.1f} ms"
+        )
+        print(f"après : {describe(final)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Page des délais de traitement (tickets/sla.py) : durée d'un rapport servi par
+les esquisses en mémoire (rien de nouveau, puis 1000 événements à lire),
+comparée au calcul direct des quantiles en relisant tout le journal, et durée
+du recalcul complet (commande rebuild_sla).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_sla [--tickets 100000]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.utils import PLATFORMS, measure, setup_django, temporary_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import override_settings
+    from django.utils import timezone
+    from tickets import sla, workflow
+    from tickets.models import Ticket, TicketEvent
+
+    rng = random.Random(42)
+    now = timezone.now()
+    with temporary_database(), override_settings(TICKET_SLA_SAVE_INTERVAL=3600):
+        agent = User.objects.create_user('agent', is_staff=True)
+        Ticket.objects.bulk_create((
+            Ticket(first_name='Prénom', last_name='Nom', email=f'client{i}@example.com', subject=f'Sujet {i}',
+                   message='Message', platform_name=rng.choice(PLATFORMS), priority=rng.choice(['basse', 'moyenne', 'critique']),
+                   submission_date=now - timedelta(seconds=rng.lognormvariate(9, 1.5)))
+            for i in range(args.tickets)
+        ), batch_size=5000)
+        # Prise en charge de tous, résolution des deux tiers : 1,7 événement par ticket
+        Ticket.objects.update(status=workflow.IN_PROGRESS, agent=agent)
+        Ticket.objects.filter(pk__in=Ticket.objects.filter(priority__in=['basse', 'moyenne']).values('pk')).update(status=workflow.RESOLVED)
+        events = TicketEvent.objects.count()
+        print(f"{args.tickets} tickets, {events} événements")
+
+        tracker = sla.SlaTracker()
+        started = time.perf_counter()
+        tracker.rebuild()
+        print(f"recalcul complet (rebuild_sla) : {time.perf_counter() - started:.2f} s")
+
+        def direct():
+            durations = {}
+            for platform, priority, status, submitted, at in TicketEvent.objects.values_list(
+                'platform_name', 'priority', 'new_status', 'submission_date', 'created_at'
+            ).iterator(chunk_size=5000):
+                durations.setdefault((platform, priority, status), []).append((at - submitted).total_seconds())
+            for values in durations.values():
+                values.sort()
+                [values[int(q * (len(values) - 1))] for q in sla.QUANTILES]
+
+        fresh = Ticket.objects.filter(status=workflow.IN_PROGRESS).values_list('pk', flat=True)
+        batches = iter(list(fresh[i:i + 1000]) for i in range(0, args.repeat * 1000, 1000))
+        idle, _ = measure(tracker.report, repeat=args.repeat)
+        updated, _ = measure(lambda: (
+            Ticket.objects.filter(pk__in=next(batches)).update(status=workflow.RESOLVED), tracker.report()
+        ), repeat=args.repeat)
+        naive, _ = measure(direct, repeat=max(1, args.repeat // 5))
+        print(f"rapport, rien de nouveau : {idle:.1f} ms")
+        print(f"rapport, 1000 événements à lire (UPDATE compris) : {updated:.1f} ms")
+        print(f"quantiles recalculés depuis tout le journal : {naive:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Latence du tableau de bord à mesure que la table des tickets grossit :
+agrégat GROUP BY sur la table des tickets (avant) et lecture des compteurs
+tenus à jour par les triggers (après).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_stats [--sizes 10000 100000 1000000 10000000]
+"""
+import argparse
+
+from benchmarks.utils import measure, seed_tickets, setup_django, temporary_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from datetime import timedelta
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from tickets.models import Ticket
+    from tickets.stats import OPEN_STATUSES, dashboard
+
+    def live_dashboard():
+        since = timezone.now() - timedelta(days=30)
+        list(
+            Ticket.objects.filter(submission_date__gte=since)
+            .annotate(day=TruncDate('submission_date'))
+            .values('day', 'platform_name', 'status', 'priority').annotate(count=Count('pk')).order_by()
+        )
+        list(Ticket.objects.filter(status__in=OPEN_STATUSES).values('platform_name', 'priority').annotate(count=Count('pk')).order_by())
+        # Totaux par plateforme, statut et priorité sur toute la table
+        list(Ticket.objects.values('platform_name', 'status', 'priority').annotate(count=Count('pk')).order_by())
+
+    with temporary_database():
+        print(f"{'tickets':>10} {'GROUP BY médiane (ms)':>22} {'compteurs médiane (ms)':>23} {'p95 (ms)':>9}")
+        inserted = 0
+        for size in sorted(args.sizes):
+            # Les tickets sont étalés sur deux ans : la taille de la table de
+            # statistiques ne dépend que du nombre de jours et de combinaisons.
+            seed_tickets(size - inserted, seed=size)
+            inserted = size
+            live, _ = measure(live_dashboard, repeat=args.repeat)
+            rollup, rollup_p95 = measure(dashboard, repeat=args.repeat)
+            print(f"{size:>10} {live:>22.2f} {rollup:>23.2f} {rollup_p95:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Test de charge de la limitation par plateforme : une plateforme « bruyante »
+(plusieurs threads en boucle, comme une intégration bloquée en retry) et une
+plateforme « calme » à débit modéré. On compare la latence p50/p99 de la
+plateforme calme sans et avec limitation.
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_throttle [--duration 5] [--noisy-threads 8]
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.utils import percentile, setup_django, temporary_database
+
+PAYLOAD = {
+    'first_name': 'Awa', 'last_name': 'Dossou', 'email': 'awa@example.com',
+    'subject': 'Plus rien ne fonctionne', 'message': 'Bonjour, le site ne répond plus.',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--noisy-threads', type=int, default=8)
+    parser.add_argument('--quiet-rate', type=float, default=20.0, help="requêtes par seconde de la plateforme calme")
+    args = parser.parse_args()
+
+    setup_django()
+    import logging
+    from django.db import connections
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from projet.authentication import api_key_cache
+    from tickets.models import ApiKey
+    from tickets.throttling import _memory_store
+
+    def scenario(throttled):
+        _memory_store.clear()
+        api_key_cache.clear()
+        noisy_key = ApiKey.generate('CV Studioo', rate_per_minute=60, burst=10)[1]
+        quiet_key = ApiKey.generate('Africa Certif', rate_per_minute=6000, burst=100)[1]
+        stop = threading.Event()
+        noisy_status = {}
+        quiet_latencies = []
+        lock = threading.Lock()
+
+        def noisy():
+            client = APIClient()
+            try:
+                while not stop.is_set():
+                    code = client.post('/api/tickets/submit/', PAYLOAD, format='json', HTTP_X_API_KEY=noisy_key).status_code
+                    with lock:
+                        noisy_status[code] = noisy_status.get(code, 0) + 1
+            finally:
+                connections.close_all()
+
+        def quiet():
+            client = APIClient()
+            interval = 1.0 / args.quiet_rate
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    client.post('/api/tickets/submit/', PAYLOAD, format='json', HTTP_X_API_KEY=quiet_key)
+                    elapsed = time.perf_counter() - start
+                    quiet_latencies.append(elapsed * 1000)
+                    time.sleep(max(0.0, interval - elapsed))
+            finally:
+                connections.close_all()
+
+        with override_settings(TICKET_THROTTLE_ENABLED=throttled):
+            threads = [threading.Thread(target=noisy) for _ in range(args.noisy_threads)]
+            threads.append(threading.Thread(target=quiet))
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        label = 'avec limitation' if throttled else 'sans limitation'
+        print(
+            f"{label:<17} calme : {len(quiet_latencies):>5} req, p50 {percentile(quiet_latencies, 0.5):>7.1f} ms, "
+            f"p99 {percentile(quiet_latencies, 0.99):>7.1f} ms | bruyante : {noisy_status}"
+        )
+
+    # Un avertissement par 429 noierait le résultat
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    with temporary_database(on_disk=True):
+        scenario(throttled=False)
+        scenario(throttled=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Débit d'envoi des notifications webhook (tickets/webhooks.py) vers un serveur
+HTTP local qui répond 204, selon la taille des lots, sur connexions
+persistantes ; avec --latency, le serveur attend avant de répondre (plateforme
+lointaine).
+
+    DB_ENGINE=sqlite python -m benchmarks.bench_webhooks [--events 5000] [--latency 0.005]
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.utils import PLATFORMS, setup_django, temporary_database
+
+
+def stand_in_server(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            if latency:
+                time.sleep(latency)
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.005, help="secondes d'attente du serveur par requête")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from tickets import webhooks
+    from tickets.models import Ticket, WebhookEvent
+
+    server = stand_in_server(args.latency)
+    url = f'http://127.0.0.1:{server.server_port}/hooks'
+    hooks = {platform: {'url': url, 'secret': 'bench'} for platform in PLATFORMS}
+    with temporary_database(), override_settings(TICKET_WEBHOOKS=hooks):
+        tickets = Ticket.objects.bulk_create(
+            Ticket(first_name='Awa', last_name='Dossou', email='awa@example.com', subject='Sujet',
+                   message='Message', platform_name=PLATFORMS[i % len(PLATFORMS)], status='resolu')
+            for i in range(args.events)
+        )
+        print(f"{args.events} événements, {len(PLATFORMS)} plateformes, latence serveur {args.latency * 1000:.0f} ms")
+        print(f"{'lot':>6} {'secondes':>9} {'événements/s':>13}")
+        for batch_size in args.batch_sizes:
+            WebhookEvent.objects.all().delete()
+            webhooks.enqueue((t.pk, t.platform_name, 'en cours de traitement', 'resolu', t.priority) for t in tickets)
+            dispatcher = webhooks.Dispatcher(batch_size=batch_size)
+            started = time.perf_counter()
+            delivered = 0
+            while delivered < args.events:
+                delivered += dispatcher.run_once(limit=args.events).delivered
+            elapsed = time.perf_counter() - started
+            dispatcher.close()
+            print(f"{batch_size:>6} {elapsed:>9.2f} {delivered / elapsed:>13.0f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
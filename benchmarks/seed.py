@@ -0,0 +1,165 @@
+"""
+Générateur de tickets réalistes (plaignants, sujets et messages en français,
+répartis sur les trois plateformes), pour les benchmarks ou pour remplir une
+base de développement.
+
+    python -m benchmarks.seed --count 2000000 [--days 730] [--batch-size 10000]
+
+Sans DB_ENGINE=sqlite, remplit la base configurée (PostgreSQL) : à n'utiliser
+que sur une base jetable.
+"""
+import argparse
+import random
+import time
+import unicodedata
+from datetime import timedelta
+
+from benchmarks.utils import PLATFORMS, setup_django
+
+FIRST_NAMES = [
+    'Awa', 'Koffi', 'Aïcha', 'Mathieu', 'Fatou', 'Sèna', 'Jean', 'Marie', 'Rodrigue', 'Chantal',
+    'Ibrahim', 'Nadège', 'Espérance', 'Cédric', 'Olivia', 'Gildas', 'Prisca', 'Romaric', 'Hélène', 'Moussa',
+]
+LAST_NAMES = [
+    'Dossou', 'Agbo', 'Houngbo', 'Adjovi', 'Mensah', 'Kiki', 'Gbaguidi', 'Hounkpatin', 'Sossou', 'Zinsou',
+    'Diallo', 'Traoré', 'Lefèvre', 'Martin', 'Ahouandjinou', 'Tchibozo', 'Akakpo', 'Dupont', 'Bio', 'Yayi',
+]
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.fr', 'outlook.fr', 'hotmail.com', 'orange.bj']
+
+# (sujet, phrases possibles du message) par type de demande
+TOPICS = [
+    ("Paiement refusé", [
+        "Mon paiement par carte a été refusé alors que mon compte est approvisionné.",
+        "J'ai été débité deux fois pour la même commande.",
+        "Le paiement Mobile Money reste en attente depuis hier.",
+    ]),
+    ("Impossible de me connecter", [
+        "Je n'arrive plus à me connecter à mon compte depuis la mise à jour.",
+        "Le lien de réinitialisation du mot de passe ne fonctionne pas.",
+        "Je reçois le message « identifiants invalides » alors que mon mot de passe est correct.",
+    ]),
+    ("Certificat introuvable", [
+        "Mon certificat n'apparaît pas dans mon espace après la réussite de l'examen.",
+        "Le téléchargement du certificat en PDF échoue.",
+        "Le nom affiché sur le certificat comporte une faute.",
+    ]),
+    ("Site inaccessible", [
+        "Le site affiche une erreur 500 quand je valide le formulaire.",
+        "La page reste blanche sur mon téléphone.",
+        "Le site est très lent depuis ce matin.",
+    ]),
+    ("Question sur mon CV", [
+        "Je voudrais modifier le modèle de mon CV après l'avoir acheté.",
+        "L'export de mon CV en Word ne conserve pas la mise en page.",
+        "Comment ajouter une photo à mon CV ?",
+    ]),
+    ("Demande de remboursement", [
+        "Je souhaite être remboursé de ma formation, je ne peux pas y assister.",
+        "La formation a été annulée mais je n'ai pas été remboursé.",
+    ]),
+    ("Problème urgent de sécurité", [
+        "Quelqu'un a modifié l'adresse email de mon compte sans mon accord.",
+        "J'ai reçu un email suspect qui se fait passer pour vous.",
+    ]),
+    ("Information sur les inscriptions", [
+        "Quand ouvrent les inscriptions pour la prochaine session ?",
+        "Quels sont les documents à fournir pour l'inscription ?",
+    ]),
+]
+OPENINGS = ["Bonjour,", "Bonsoir,", "Bonjour madame, monsieur,", ""]
+CLOSINGS = ["Merci d'avance.", "Cordialement.", "Merci de me répondre rapidement.", ""]
+SUFFIXES = ["", "", "", " (urgent)", " - relance", " svp", " depuis 3 jours"]
+
+# Même répartition qu'en production : la plupart des tickets sont clos
+STATUSES = ['resolu'] * 6 + ['ignore', 'en cours de traitement', 'nouveau', 'nouveau']
+
+
+def _ascii(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+
+
+class TicketFactory:
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+
+    def payload(self, platform_name=None):
+        """Données d'une soumission d'API (sans plateforme si ``platform_name`` est None)."""
+        rng = self.rng
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        subject, sentences = rng.choice(TOPICS)
+        message = ' '.join(filter(None, [
+            rng.choice(OPENINGS),
+            *rng.sample(sentences, rng.randint(1, len(sentences))),
+            rng.choice(CLOSINGS),
+        ]))
+        data = {
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': f"{_ascii(first_name)}.{_ascii(last_name)}{rng.randint(1, 999)}@{rng.choice(EMAIL_DOMAINS)}",
+            'subject': subject + rng.choice(SUFFIXES),
+            'message': message,
+        }
+        if platform_name:
+            data['platform_name'] = platform_name
+        return data
+
+    def tickets(self, count, days=730, now=None):
+        """``count`` tickets (non enregistrés) étalés sur ``days`` jours, du plus ancien au plus récent."""
+        from django.utils import timezone
+        from tickets.models import Ticket
+        from tickets.priority import classify
+
+        rng = self.rng
+        start = (now or timezone.now()) - timedelta(days=days)
+        step = days * 86400 / max(count, 1)
+        for i in range(count):
+            data = self.payload(rng.choice(PLATFORMS))
+            yield Ticket(
+                **data,
+                priority=classify(data['subject'], data['message']).priority,
+                status=rng.choice(STATUSES),
+                submission_date=start + timedelta(seconds=i * step + rng.random() * step),
+            )
+
+
+def seed(count, batch_size=10000, days=730, seed=42, progress=None):
+    """Insère ``count`` tickets réalistes par lots (bulk_create)."""
+    from tickets.models import Ticket
+
+    batch = []
+    inserted = 0
+    for ticket in TicketFactory(seed).tickets(count, days):
+        batch.append(ticket)
+        if len(batch) == batch_size:
+            Ticket.objects.bulk_create(batch)
+            inserted += len(batch)
+            batch = []
+            if progress:
+                progress(inserted)
+    if batch:
+        Ticket.objects.bulk_create(batch)
+        inserted += len(batch)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    setup_django()
+    started = time.monotonic()
+
+    def progress(inserted):
+        rate = inserted / (time.monotonic() - started)
+        print(f"{inserted}/{args.count} tickets insérés ({rate:.0f} tickets/s)", flush=True)
+
+    inserted = seed(args.count, args.batch_size, args.days, args.seed, progress=progress)
+    print(f"{inserted} tickets insérés en {time.monotonic() - started:.1f} s.")
+
+
+if __name__ == '__main__':
+    main()
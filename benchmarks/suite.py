@@ -0,0 +1,270 @@
+"""
+Suite de benchmarks de bout en bout : requêtes HTTP jouées dans le processus
+(client de test Django, et application ASGI pour les rafales) sur une base
+jetable remplie de tickets réalistes (voir seed.py).
+
+Scénarios :
+- submit : soumissions une à une sur api/tickets/submit/ ;
+- submit_burst : rafales de --concurrency soumissions simultanées via ASGI ;
+- changelist : liste des tickets de l'admin, avec filtres et recherche ;
+- claim : prise des prochains tickets par un agent dans l'admin.
+
+Pour chaque scénario : débit, latences p50/p95/p99 et nombre de requêtes SQL
+par requête HTTP. Le résultat est un JSON (sur la sortie standard ou dans
+--output) ; avec --baseline, il est comparé à un résultat de référence et la
+commande échoue (code 1) en cas de régression au-delà de --tolerance.
+
+    DB_ENGINE=sqlite python -m benchmarks.suite [--tickets 20000] [--requests 100]
+        [--scenarios submit changelist] [--output resultats.json]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.utils import PLATFORMS, percentile, setup_django, temporary_database
+
+SCENARIOS = ('submit', 'submit_burst', 'changelist', 'claim')
+CHANGELIST_QUERIES = [
+    {},
+    {'status__exact': 'nouveau'},
+    {'platform_name__exact': PLATFORMS[2], 'priority__exact': 'critique'},
+    {'q': 'paiement'},
+]
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+class Recorder:
+    """Latences (ms), requêtes SQL et erreurs d'un scénario."""
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.seconds = 0.0
+
+    def add(self, milliseconds, ok, queries=None):
+        self.latencies.append(milliseconds)
+        if queries is not None:
+            self.queries.append(queries)
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        count = len(self.latencies)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'throughput': round(count / self.seconds, 1) if self.seconds else 0.0,
+            'p50_ms': round(percentile(self.latencies, 0.50), 2),
+            'p95_ms': round(percentile(self.latencies, 0.95), 2),
+            'p99_ms': round(percentile(self.latencies, 0.99), 2),
+            'queries_per_request': round(statistics.mean(self.queries), 2) if self.queries else None,
+            'max_queries': max(self.queries) if self.queries else None,
+        }
+
+
+def timed_requests(count, send, expected):
+    """Joue ``send(i)`` ``count`` fois, une requête HTTP à la fois."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    for i in range(count):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(i)
+            elapsed = (time.perf_counter() - start) * 1000
+        recorder.add(elapsed, response.status_code in expected, len(queries))
+    recorder.seconds = time.perf_counter() - started
+    return recorder
+
+
+def scenario_submit(context, count):
+    from django.test import Client
+
+    client = Client()
+    payloads = [context['factory'].payload() for _ in range(count)]
+    return timed_requests(count, lambda i: client.post(
+        '/api/tickets/submit/', json.dumps(payloads[i]), content_type='application/json',
+        HTTP_X_API_KEY=context['api_key'],
+    ), expected={201})
+
+
+def scenario_submit_burst(context, count):
+    import asyncio
+    from asgiref.sync import async_to_sync
+    from django.db import connection
+    from django.test import AsyncClient
+    from django.test.utils import CaptureQueriesContext
+
+    concurrency = context['concurrency']
+    payloads = [json.dumps(context['factory'].payload()) for _ in range(count)]
+    headers = {'X-API-Key': context['api_key']}
+    recorder = Recorder()
+
+    async def send(client, payload):
+        start = time.perf_counter()
+        response = await client.post('/api/tickets/submit/', payload, content_type='application/json', headers=headers)
+        recorder.add((time.perf_counter() - start) * 1000, response.status_code == 201)
+
+    async def bursts():
+        client = AsyncClient()
+        for offset in range(0, count, concurrency):
+            await asyncio.gather(*(send(client, payload) for payload in payloads[offset:offset + concurrency]))
+
+    # Lancées depuis le thread principal, les vues synchrones y sont exécutées :
+    # les requêtes SQL de toute la rafale sont comptées ici.
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        async_to_sync(bursts)()
+        recorder.seconds = time.perf_counter() - started
+    recorder.queries = [len(queries) / max(count, 1)]
+    return recorder
+
+
+def scenario_changelist(context, count):
+    from django.test import Client
+
+    client = Client()
+    client.force_login(context['superuser'])
+    return timed_requests(count, lambda i: client.get(
+        '/admin/tickets/ticket/', CHANGELIST_QUERIES[i % len(CHANGELIST_QUERIES)]
+    ), expected={200})
+
+
+def scenario_claim(context, count):
+    from django.test import Client
+
+    client = Client()
+    client.force_login(context['agent'])
+    return timed_requests(count, lambda i: client.post('/admin/tickets/ticket/claim/'), expected={302})
+
+
+def prepare(args):
+    from django.contrib.auth.models import Permission, User
+    from projet.authentication import api_key_cache
+    from tickets.models import ApiKey, Ticket
+    from tickets.throttling import _memory_store
+    from benchmarks.seed import TicketFactory, seed
+
+    started = time.monotonic()
+    seed(args.tickets, progress=lambda inserted: log(f"{inserted}/{args.tickets} tickets insérés"))
+    log(f"{args.tickets} tickets insérés en {time.monotonic() - started:.1f} s.")
+
+    api_key_cache.clear()
+    _memory_store.clear()
+    agent = User.objects.create_user('agent_bench', 'agent@example.com', 'pass', is_staff=True)
+    agent.user_permissions.set(Permission.objects.filter(
+        content_type__app_label='tickets', codename__in=['view_ticket', 'change_ticket']
+    ))
+    return {
+        'factory': TicketFactory(seed=args.seed),
+        'api_key': ApiKey.generate(PLATFORMS[0])[1],
+        'superuser': User.objects.create_superuser('admin_bench', 'admin@example.com', 'pass'),
+        'agent': agent,
+        'concurrency': args.concurrency,
+        'tickets': Ticket.objects.count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Écarts par rapport à la référence ; renvoie la liste des régressions."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if not reference:
+            continue
+        checks = [
+            ('p95_ms', current['p95_ms'] > reference['p95_ms'] * (1 + tolerance)),
+            ('throughput', current['throughput'] < reference['throughput'] * (1 - tolerance)),
+            # Déterministe : toute requête SQL supplémentaire est une régression
+            ('queries_per_request', (current['queries_per_request'] or 0) > (reference['queries_per_request'] or 0) + 0.01),
+        ]
+        for metric, regressed in checks:
+            ratio = current[metric] / reference[metric] if reference[metric] else float('inf')
+            flag = 'RÉGRESSION' if regressed else ''
+            log(f"{name:<14} {metric:<20} {reference[metric]:>10} -> {current[metric]:>10} ({ratio:>5.2f}x) {flag}")
+            if regressed:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=20_000, help="tickets insérés avant les mesures")
+    parser.add_argument('--requests', type=int, default=100, help="requêtes HTTP par scénario")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=20, help="taille des rafales de submit_burst")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="fichier JSON des résultats (sortie standard par défaut)")
+    parser.add_argument('--baseline', help="résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="écart de latence/débit toléré (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    setup_django()
+    import logging
+    import django
+    from django.db import connection
+    from django.test import override_settings
+
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    scenarios = {name: globals()[f'scenario_{name}'] for name in args.scenarios}
+
+    # Limitation par plateforme désactivée : on mesure l'application, pas les 429
+    with temporary_database(), override_settings(TICKET_THROTTLE_ENABLED=False):
+        context = prepare(args)
+        results = {
+            'meta': {
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'vendor': connection.vendor,
+                'tickets': context['tickets'],
+                'requests': args.requests,
+                'concurrency': args.concurrency,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'scenarios': {},
+        }
+        log(f"{'scénario':<14} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'SQL/req':>8} {'erreurs':>8}")
+        for name, run in scenarios.items():
+            if args.warmup:
+                run(context, args.warmup)
+            summary = run(context, args.requests).summary()
+            results['scenarios'][name] = summary
+            log(
+                f"{name:<14} {summary['throughput']:>8.1f} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+                f"{summary['p99_ms']:>9.2f} {summary['queries_per_request'] or 0:>8.2f} {summary['errors']:>8}"
+            )
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key in ('vendor', 'tickets', 'requests', 'concurrency'):
+            if baseline.get('meta', {}).get(key) != results['meta'][key]:
+                log(f"Attention : {key} diffère de la référence ({baseline.get('meta', {}).get(key)} / {results['meta'][key]}).")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            log(f"{len(regressions)} régression(s) : {', '.join(regressions)}")
+            sys.exit(1)
+        log("Aucune régression par rapport à la référence.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Outils communs aux benchmarks qui ont besoin de Django et d'une base.
+
+Les benchmarks tournent sur une base de test jetable, créée à partir de la
+configuration courante (DB_ENGINE=sqlite pour une base SQLite en mémoire).
+"""
+import contextlib
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+PLATFORMS = ['Site Web Principal Esseyi', 'Africa Certif', 'CV Studioo']
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projet.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def temporary_database(verbosity=0, on_disk=False):
+    """
+    ``on_disk`` : avec SQLite, base dans un fichier temporaire plutôt qu'en
+    mémoire, pour les scénarios où plusieurs threads écrivent.
+    """
+    import tempfile
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if on_disk and connection.vendor == 'sqlite':
+        tmpdir = tempfile.TemporaryDirectory()
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir.name, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def seed_tickets(count, batch_size=10000, seed=42, days=730):
+    """Insère ``count`` tickets répartis sur ``days`` jours."""
+    from django.utils import timezone
+    from tickets.models import Ticket
+
+    rng = random.Random(seed)
+    statuses = ['resolu'] * 6 + ['ignore', 'en cours de traitement', 'nouveau', 'nouveau']
+    priorities = ['basse', 'basse', 'moyenne', 'critique']
+    start = timezone.now() - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    batch = []
+    for i in range(count):
+        batch.append(Ticket(
+            first_name='Prénom', last_name='Nom', email=f'client{i}@example.com',
+            subject=f'Sujet {i}', message='Message de test.', platform_name=rng.choice(PLATFORMS),
+            status=rng.choice(statuses), priority=rng.choice(priorities),
+            submission_date=start + timedelta(seconds=i * step),
+        ))
+        if len(batch) == batch_size:
+            Ticket.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Ticket.objects.bulk_create(batch)
+
+
+def measure(func, repeat=20):
+    """Médiane et p95 en millisecondes de ``repeat`` appels à ``func``."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, int(len(timings) * 0.95))]
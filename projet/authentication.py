@@ -1,6 +1,99 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
+from django.db.models import Count, Max
+
+ApiKeyEntry = namedtuple('ApiKeyEntry', ['platform_name', 'rate_per_minute', 'burst', 'key_id'])
+
+
+class ApiKeyCache:
+    """
+    Cache LRU borné, par processus, des clés API résolues (empreinte -> entrée).
+    Les clés inconnues sont aussi mises en cache (cache négatif, TTL plus court).
+    Toute création, modification ou suppression de clé change l'horodatage de
+    version de la table, vérifié au plus toutes les ``stamp_interval`` secondes :
+    le cache est alors vidé, ce qui propage une révocation en quelques secondes.
+    """
+    _MISSING = object()
+
+    def __init__(self, max_size=1024, ttl=300, negative_ttl=30, stamp_interval=2):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stamp_interval = stamp_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._stamp_checked_at = float('-inf')
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stamp = None
+            self._stamp_checked_at = float('-inf')
+
+    def _check_stamp(self, now):
+        if now - self._stamp_checked_at < self.stamp_interval:
+            return
+        from tickets.models import ApiKey
+
+        stamp = ApiKey.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+            self._stamp_checked_at = now
+
+    def get(self, key_hash):
+        now = time.monotonic()
+        self._check_stamp(now)
+        with self._lock:
+            cached = self._entries.get(key_hash)
+            if cached is not None and cached[1] > now:
+                self._entries.move_to_end(key_hash)
+                self.hits += 1
+                return cached[0]
+        self.misses += 1
+        entry = self._load(key_hash)
+        ttl = self.ttl if entry is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key_hash] = (entry, now + ttl)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, key_hash):
+        from tickets.models import ApiKey
+
+        rows = ApiKey.objects.filter(key_hash=key_hash, is_active=True).order_by().values_list(
+            'platform_name', 'rate_per_minute', 'burst', 'pk'
+        )[:1]
+        return ApiKeyEntry(*rows[0]) if rows else None
+
+
+api_key_cache = ApiKeyCache(
+    max_size=getattr(settings, 'API_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'API_KEY_CACHE_TTL', 300),
+    negative_ttl=getattr(settings, 'API_KEY_CACHE_NEGATIVE_TTL', 30),
+    stamp_interval=getattr(settings, 'API_KEY_CACHE_STAMP_INTERVAL', 2),
+)
+
+
+def resolve_api_key(api_key):
+    """Renvoie l'ApiKeyEntry d'une clé active, ou None."""
+    # Les clés de settings.API_KEYS sont importées en base par la migration 0008,
+    # et par 0019 sur une base dont la table des clés est vide : pas de repli sur
+    # les réglages, qui ignorerait leur révocation.
+    return api_key_cache.get(hashlib.sha256(api_key.encode()).hexdigest())
+
 
 class APIKeyAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -9,7 +102,13 @@ class APIKeyAuthentication(BaseAuthentication):
         if not api_key:
             return None
 
-        if api_key not in settings.API_KEYS:
+        entry = resolve_api_key(api_key)
+        if entry is None:
             raise AuthenticationFailed('Clé API invalide.')
 
-        return (None, settings.API_KEYS[api_key])
\ No newline at end of file
+        request.api_key = entry
+        return (None, entry.platform_name)
+
+    def authenticate_header(self, request):
+        # Clé absente ou révoquée : 401 (et non 403) avec WWW-Authenticate
+        return 'X-API-Key'
@@ -0,0 +1,52 @@
+"""
+Taille maximale du corps des requêtes de l'API.
+
+Vérifiée sur l'en-tête Content-Length, une fois la vue connue mais avant que
+DRF ne lise le corps : un envoi trop gros (journal entier collé dans un
+message...) est refusé en 413 sans être lu ni analysé. API_MAX_REQUEST_BODY
+octets par requête, API_BATCH_MAX_REQUEST_BODY pour l'envoi par lots.
+Sans Content-Length, le serveur WSGI ne transmet pas de corps à Django.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+API_PREFIX = '/api/'
+BATCH_VIEWS = ('ticket-submit-batch',)
+
+
+def body_limit(request):
+    match = request.resolver_match
+    if match is not None and match.url_name in BATCH_VIEWS:
+        return settings.API_BATCH_MAX_REQUEST_BODY
+    return settings.API_MAX_REQUEST_BODY
+
+
+class RequestBodyLimitMiddleware:
+    # Tout se passe dans process_view : __call__ passe la main telle quelle,
+    # synchrone ou asynchrone, sans adapter la chaîne sous ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not request.path.startswith(API_PREFIX):
+            return None
+        try:
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return JsonResponse({"detail": "En-tête Content-Length invalide."}, status=400)
+        limit = body_limit(request)
+        if length > limit:
+            return JsonResponse(
+                {"detail": f"Corps de la requête trop volumineux : {length} octets (maximum {limit})."},
+                status=413,
+            )
+        return None
@@ -0,0 +1,285 @@
+"""
+Métriques des requêtes HTTP, exposées au format texte de Prometheus sur /metrics.
+
+Le middleware mesure pour chaque requête la durée totale, le nombre de
+requêtes SQL et le temps passé en base (``connection.execute_wrapper`` sur
+toutes les connexions), étiquetés par vue, méthode, code de retour et
+plateforme (clé API). Le code applicatif peut mesurer ses propres étapes avec
+``phase('nom')`` (validation, classification... de la soumission de tickets).
+
+Les compteurs sont agrégés en mémoire, par processus : avec plusieurs workers,
+chaque scrape ne voit que le worker qui répond. Les requêtes plus lentes que
+METRICS_SLOW_REQUEST_MS sont journalisées avec leurs requêtes SQL les plus
+coûteuses (sans les paramètres).
+"""
+import contextlib
+import contextvars
+import ipaddress
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+SLOW_SQL_LIMIT = 10
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}  # étiquettes -> [compte par tranche..., +Inf, somme]
+
+    def observe(self, labels, value):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    """Métriques du processus. Un seul verrou, tenu le temps d'une addition."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        request_labels = ('view', 'method', 'status', 'platform')
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', "Durée des requêtes HTTP.", request_labels, DURATION_BUCKETS
+        )
+        self.db_queries = Counter('db_queries_total', "Requêtes SQL exécutées.", request_labels)
+        self.db_duration = Counter(
+            'db_query_duration_seconds_total', "Temps passé dans les requêtes SQL.", request_labels
+        )
+        self.phase_duration = Histogram(
+            'app_phase_duration_seconds', "Durée des étapes mesurées dans les vues.", ('view', 'phase'), PHASE_BUCKETS
+        )
+        self.metrics = [self.request_duration, self.db_queries, self.db_duration, self.phase_duration]
+
+    def observe_request(self, labels, duration, stats):
+        with self._lock:
+            self.request_duration.observe(labels, duration)
+            self.db_queries.inc(labels, stats.query_count)
+            self.db_duration.inc(labels, stats.query_time)
+
+    def observe_phase(self, view, name, duration):
+        with self._lock:
+            self.phase_duration.observe((view, name), duration)
+
+    def clear(self):
+        with self._lock:
+            for metric in self.metrics:
+                metric._values.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Requêtes SQL d'une requête HTTP (texte et durée, pour le journal des requêtes lentes)."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries = []
+        self.view = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.query_time += duration
+            self.queries.append((duration, sql))
+
+
+_current = contextvars.ContextVar('metrics_request', default=None)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Mesure une étape du traitement de la requête en cours."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            registry.observe_phase(stats.view, name, time.perf_counter() - start)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unmatched>'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Sous ASGI, la chaîne reste asynchrone de bout en bout
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED or request.path == '/metrics':
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                self.watch_queries(stack, stats)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED or request.path == '/metrics':
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        stack = contextlib.ExitStack()
+        try:
+            # Les connexions sont propres au thread : les enveloppes sont posées
+            # dans le thread où la requête exécute son code synchrone
+            # (sync_to_async, thread_sensitive), et retirées dans le même thread
+            await sync_to_async(self.watch_queries)(stack, stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    @staticmethod
+    def watch_queries(stack, stats):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+
+    def record(self, request, response, stats, duration):
+        view = _view_name(request)
+        # request.auth : plateforme de la clé API, posée par DRF sur la requête Django
+        platform = getattr(request, 'auth', None)
+        labels = (view, request.method, str(response.status_code), platform if isinstance(platform, str) else '')
+        registry.observe_request(labels, duration, stats)
+        if duration * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            self.log_slow_request(request, response, view, duration, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Nom de la vue connu dès maintenant, pour étiqueter les étapes (phase())
+        stats = _current.get()
+        if stats is not None:
+            stats.view = _view_name(request)
+
+    def log_slow_request(self, request, response, view, duration, stats):
+        slowest = sorted(stats.queries, key=lambda query: query[0], reverse=True)[:SLOW_SQL_LIMIT]
+        details = ''.join(f"\n  {query_time * 1000:8.1f} ms  {sql}" for query_time, sql in slowest)
+        logger.warning(
+            "Requête lente %s %s (%s, %s) : %.0f ms, %d requête(s) SQL en %.0f ms%s",
+            request.method, request.path, view, response.status_code, duration * 1000,
+            stats.query_count, stats.query_time * 1000, details,
+        )
+
+
+def _client_allowed(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """
+    Métriques au format texte de Prometheus. Refusées par défaut : accordées
+    avec le jeton METRICS_TOKEN (Authorization: Bearer ...), à un membre de
+    l'équipe connecté, ou à une adresse de METRICS_ALLOWED_NETWORKS.
+    """
+    token = settings.METRICS_TOKEN
+    user = getattr(request, 'user', None)
+    if not (
+        (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+        or (user is not None and user.is_active and user.is_staff)
+        or _client_allowed(request)
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
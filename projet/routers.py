@@ -0,0 +1,174 @@
+"""
+Lectures de l'admin sur la réplique en lecture seule.
+
+Seules les lectures explicitement marquées (bloc ``replica_reads()``, ou
+``using(read_alias())``) vont sur l'alias ``replica`` : listes, recherche,
+filtres et exports de l'admin et de l'API. Les écritures, et toute lecture
+hors de ces vues (formulaire de modification, prise de tickets, soumission),
+restent sur la base principale.
+
+La réplique est écartée tant que son retard dépasse DATABASE_REPLICA_MAX_LAG
+secondes ou qu'elle ne répond pas ; le retard est mesuré au plus toutes les
+DATABASE_REPLICA_CHECK_INTERVAL secondes, par processus. Après une écriture
+(requête POST d'une session), la session lit sur la base principale pendant
+DATABASE_REPLICA_PIN_SECONDS secondes, le temps que la réplique rattrape.
+
+En local, l'alias ``replica`` est une seconde base SQLite (DB_REPLICA_ENABLED=True).
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Max
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+PIN_SESSION_KEY = '_db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replication_lag(replica=REPLICA):
+    """Retard de la réplique, en secondes."""
+    connection = connections[replica]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_SQL)
+            return float(cursor.fetchone()[0])
+
+    # Pas de réplication native (deux bases SQLite en local) : écart entre les
+    # tickets les plus récents de chaque base
+    from tickets.models import Ticket
+
+    primary, copy = (
+        Ticket.objects.using(alias).aggregate(newest=Max('submission_date'))['newest']
+        for alias in (DEFAULT_DB_ALIAS, replica)
+    )
+    if primary is None:
+        return 0.0
+    if copy is None:
+        return float('inf')
+    return max(0.0, (primary - copy).total_seconds())
+
+
+class ReplicaMonitor:
+    """Disponibilité de la réplique, vérifiée au plus toutes les DATABASE_REPLICA_CHECK_INTERVAL secondes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checked_at = float('-inf')
+        self.lag = None
+        self.available = False
+
+    def is_available(self):
+        now = time.monotonic()
+        if now - self.checked_at >= settings.DATABASE_REPLICA_CHECK_INTERVAL:
+            with self._lock:
+                if now - self.checked_at >= settings.DATABASE_REPLICA_CHECK_INTERVAL:
+                    self.checked_at = now
+                    self._check()
+        return self.available
+
+    def _check(self):
+        try:
+            self.lag = replication_lag()
+        except DatabaseError as exc:
+            self.lag = None
+            self.available = False
+            logger.warning("Réplique injoignable, lectures sur la base principale : %s", exc)
+            return
+        self.available = self.lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if not self.available:
+            logger.warning("Réplique en retard de %.1f s, lectures sur la base principale.", self.lag)
+
+
+monitor = ReplicaMonitor()
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def _pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def read_alias(request=None):
+    """Base où lire maintenant : la réplique si elle est configurée, à jour, et que la session n'est pas épinglée."""
+    if not settings.DATABASE_REPLICA_ENABLED or REPLICA not in connections:
+        return DEFAULT_DB_ALIAS
+    if request is not None and _pinned(request):
+        return DEFAULT_DB_ALIAS
+    return REPLICA if monitor.is_available() else DEFAULT_DB_ALIAS
+
+
+@contextlib.contextmanager
+def replica_reads(request=None):
+    """Les lectures faites dans le bloc vont sur la réplique (si read_alias() le permet)."""
+    token = _replica_reads.set(read_alias(request) == REPLICA)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if _replica_reads.get() else None
+
+    def db_for_write(self, model, **hints):
+        # Même pour un objet lu sur la réplique
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+
+@sync_and_async_middleware
+class ReplicaPinMiddleware:
+    """Après une écriture d'une session, ses lectures restent un temps sur la base principale."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # La session peut encore être lue en base : hors de la boucle d'événements
+        await sync_to_async(self.pin)(request)
+        return response
+
+    @staticmethod
+    def pin(request):
+        if (
+            settings.DATABASE_REPLICA_ENABLED
+            and request.method not in SAFE_METHODS
+            and getattr(request, 'session', None) is not None
+            and request.session.session_key
+        ):
+            request.session[PIN_SESSION_KEY] = time.time() + settings.DATABASE_REPLICA_PIN_SECONDS
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os 
 from dotenv import load_dotenv
 load_dotenv() # Charge les variables du fichier .env
@@ -32,7 +33,6 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-votre_cle_secr
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
-.
 
 
 ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
@@ -49,11 +49,16 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    # En premier : mesure aussi le temps des autres middlewares (voir projet/metrics.py)
+    'projet.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Avant toute lecture du corps (voir projet/limits.py)
+    'projet.limits.RequestBodyLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'projet.routers.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,6 +97,39 @@ DATABASES = {
     }
 }
 
+# Réplique en lecture seule pour les listes et exports de l'admin (voir projet/routers.py)
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('DB_REPLICA_HOST'),
+        'PORT': os.environ.get('DB_REPLICA_PORT') or os.environ.get('DB_PORT'),
+        # Les tests n'ont pas de seconde base : la réplique y est la base principale
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Base SQLite locale pour le développement et les tests (DB_ENGINE=sqlite)
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+        },
+        # Seconde base tenant lieu de réplique, utilisée si DB_REPLICA_ENABLED=True
+        # (à remplir par copie de db.sqlite3)
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_REPLICA_NAME') or BASE_DIR / 'db-replica.sqlite3',
+        },
+    }
+
+DATABASE_ROUTERS = ['projet.routers.ReplicaRouter']
+DATABASE_REPLICA_ENABLED = os.environ.get('DB_REPLICA_ENABLED', str(bool(os.environ.get('DB_REPLICA_HOST')))) == 'True'
+# Au-delà de ce retard (secondes), les lectures reviennent sur la base principale
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 10))
+DATABASE_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+# Après une écriture, la session lit sur la base principale pendant ce délai (secondes)
+DATABASE_REPLICA_PIN_SECONDS = float(os.environ.get('DB_REPLICA_PIN_SECONDS', 15))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,6 +164,131 @@ API_KEYS = {
     os.environ.get("API_KEY_SITE3"): "CV Studioo",
 }
 
+# Clés API en base (modèle tickets.ApiKey) : cache par processus des clés résolues.
+# Les clés ci-dessus ne sont lues que par les migrations, qui les importent en base :
+# 0008, puis 0019 sur chaque base dont la table des clés est encore vide (réplique
+# migrée à part...) ; les clés ajoutées ensuite se créent dans l'admin ou avec la
+# commande create_api_key.
+API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE', 1024))
+API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 300))
+API_KEY_CACHE_NEGATIVE_TTL = int(os.environ.get('API_KEY_CACHE_NEGATIVE_TTL', 30))
+# Délai maximal de prise en compte d'une révocation (secondes)
+API_KEY_CACHE_STAMP_INTERVAL = float(os.environ.get('API_KEY_CACHE_STAMP_INTERVAL', 2))
+
+# Limitation de débit par plateforme (voir tickets/throttling.py)
+TICKET_THROTTLE_ENABLED = os.environ.get('TICKET_THROTTLE_ENABLED', 'True') == 'True'
+TICKET_THROTTLE_DEFAULT_RATE = int(os.environ.get('TICKET_THROTTLE_DEFAULT_RATE', 120))  # tickets par minute
+TICKET_THROTTLE_DEFAULT_BURST = int(os.environ.get('TICKET_THROTTLE_DEFAULT_BURST', 60))
+# Par plateforme, ex. {"CV Studioo": [60, 20]} ; les limites d'une clé API priment
+TICKET_THROTTLE_RATES = json.loads(os.environ.get('TICKET_THROTTLE_RATES', '{}'))
+# 'memory' (par processus) ou 'cache' (cache Django partagé par les workers)
+TICKET_THROTTLE_BACKEND = os.environ.get('TICKET_THROTTLE_BACKEND', 'memory')
+TICKET_THROTTLE_CACHE = os.environ.get('TICKET_THROTTLE_CACHE', 'default')
+
+# Clés d'idempotence de api/tickets/submit/ (voir tickets/idempotency.py)
+TICKET_IDEMPOTENCY_TTL = int(os.environ.get('TICKET_IDEMPOTENCY_TTL', 24 * 3600))  # secondes
+TICKET_IDEMPOTENCY_CACHE = os.environ.get('TICKET_IDEMPOTENCY_CACHE', 'default')
+
+# Notification des tickets clos aux plateformes (commande dispatch_webhooks, voir tickets/webhooks.py)
+# Par plateforme, ex. {"CV Studioo": {"url": "https://...", "secret": "..."}} ; vide = aucune notification
+TICKET_WEBHOOKS = json.loads(os.environ.get('TICKET_WEBHOOKS', '{}'))
+TICKET_WEBHOOK_BATCH_SIZE = int(os.environ.get('TICKET_WEBHOOK_BATCH_SIZE', 100))  # événements par requête
+TICKET_WEBHOOK_TIMEOUT = float(os.environ.get('TICKET_WEBHOOK_TIMEOUT', 10))  # secondes
+TICKET_WEBHOOK_CONCURRENCY = int(os.environ.get('TICKET_WEBHOOK_CONCURRENCY', 4))  # plateformes servies en parallèle
+TICKET_WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('TICKET_WEBHOOK_MAX_ATTEMPTS', 10))
+TICKET_WEBHOOK_RETRY_BASE = float(os.environ.get('TICKET_WEBHOOK_RETRY_BASE', 30))  # secondes, doublé à chaque essai
+TICKET_WEBHOOK_RETRY_MAX = float(os.environ.get('TICKET_WEBHOOK_RETRY_MAX', 6 * 3600))
+
+# Regroupement des tickets quasi identiques en incidents (voir tickets/clustering.py)
+TICKET_CLUSTERING = os.environ.get('TICKET_CLUSTERING', 'True') == 'True'
+# Un incident sans nouveau ticket depuis ce délai n'en accueille plus (heures)
+TICKET_CLUSTER_WINDOW_HOURS = int(os.environ.get('TICKET_CLUSTER_WINDOW_HOURS', 48))
+
+# Export en flux (voir tickets/export.py) : lignes lues par paquets de cette taille
+TICKET_EXPORT_CHUNK_SIZE = int(os.environ.get('TICKET_EXPORT_CHUNK_SIZE', 2000))
+
+# Archivage des tickets clos (commande archive_tickets, voir tickets/archive.py)
+TICKET_ARCHIVE_AFTER_DAYS = int(os.environ.get('TICKET_ARCHIVE_AFTER_DAYS', 180))
+TICKET_ARCHIVE_BATCH_SIZE = int(os.environ.get('TICKET_ARCHIVE_BATCH_SIZE', 500))
+TICKET_ARCHIVE_PAUSE = float(os.environ.get('TICKET_ARCHIVE_PAUSE', 0.5))  # secondes entre deux lots
+
+# Taille maximale du corps des requêtes de l'API (octets), refusée avant lecture (voir projet/limits.py)
+API_MAX_REQUEST_BODY = int(os.environ.get('API_MAX_REQUEST_BODY', 256 * 1024))
+API_BATCH_MAX_REQUEST_BODY = int(os.environ.get('API_BATCH_MAX_REQUEST_BODY', 16 * 1024 * 1024))  # api/tickets/submit/batch/
+
+# Messages des tickets (caractères) : longueur maximale acceptée, et au-delà de
+# TICKET_MESSAGE_INLINE_LENGTH, message complet compressé à part (voir tickets/message_store.py)
+TICKET_MESSAGE_MAX_LENGTH = int(os.environ.get('TICKET_MESSAGE_MAX_LENGTH', 100_000))
+TICKET_MESSAGE_INLINE_LENGTH = int(os.environ.get('TICKET_MESSAGE_INLINE_LENGTH', 2000))
+
+# Nombre maximal de tickets acceptés par requête sur api/tickets/submit/batch/
+TICKET_BATCH_MAX_SIZE = int(os.environ.get('TICKET_BATCH_MAX_SIZE', 500))
+
+# Attribution automatique des tickets nouveaux (commande assign_tickets, voir tickets/scheduler.py)
+# Aussi dès l'enregistrement des tickets, sans attendre la commande
+TICKET_AUTO_ASSIGN = os.environ.get('TICKET_AUTO_ASSIGN', 'False') == 'True'
+TICKET_SCHEDULER_BATCH_SIZE = int(os.environ.get('TICKET_SCHEDULER_BATCH_SIZE', 500))
+TICKET_SCHEDULER_MAX_LOAD = int(os.environ.get('TICKET_SCHEDULER_MAX_LOAD', 20))  # tickets en cours par agent ; 0 = sans limite
+TICKET_SCHEDULER_REFRESH = float(os.environ.get('TICKET_SCHEDULER_REFRESH', 30))  # secondes entre deux relectures des charges
+# Plateformes traitées par agent, ex. {"koffi": ["CV Studioo"]} ; agent absent = toutes les plateformes
+TICKET_AGENT_SKILLS = json.loads(os.environ.get('TICKET_AGENT_SKILLS', '{}'))
+
+# Délais de traitement (page SLA de l'admin, voir tickets/sla.py)
+# Objectifs en secondes par priorité : prise en charge (first_response) et résolution
+TICKET_SLA_TARGETS = json.loads(os.environ.get('TICKET_SLA_TARGETS', json.dumps({
+    'critique': {'first_response': 3600, 'resolution': 86400},
+    'moyenne': {'first_response': 4 * 3600, 'resolution': 3 * 86400},
+    'basse': {'first_response': 86400, 'resolution': 7 * 86400},
+})))
+TICKET_SLA_RELATIVE_ACCURACY = float(os.environ.get('TICKET_SLA_RELATIVE_ACCURACY', 0.01))  # erreur relative des quantiles
+TICKET_SLA_RECENT_BREACHES = int(os.environ.get('TICKET_SLA_RECENT_BREACHES', 100))  # dépassements gardés en liste
+TICKET_SLA_SAVE_INTERVAL = float(os.environ.get('TICKET_SLA_SAVE_INTERVAL', 60))  # secondes entre deux enregistrements
+TICKET_SLA_SETTLE = float(os.environ.get('TICKET_SLA_SETTLE', 60))  # secondes avant d'abandonner un trou dans le journal
+
+# Import en masse (commande import_tickets, voir tickets/importer.py)
+TICKET_IMPORT_CHUNK_SIZE = int(os.environ.get('TICKET_IMPORT_CHUNK_SIZE', 5000))  # lignes par transaction
+TICKET_IMPORT_WORKERS = int(os.environ.get('TICKET_IMPORT_WORKERS', os.cpu_count() or 1))  # processus de validation
+
+# Suivi des tickets par les plateformes (api/tickets/status/, voir tickets/status_cache.py)
+TICKET_STATUS_MAX_IDS = int(os.environ.get('TICKET_STATUS_MAX_IDS', 500))
+TICKET_STATUS_CACHE = os.environ.get('TICKET_STATUS_CACHE', 'default')
+TICKET_STATUS_CACHE_TTL = int(os.environ.get('TICKET_STATUS_CACHE_TTL', 300))  # secondes
+
+# Classification de la priorité (voir tickets/priority.py)
+# Fichier JSON optionnel {"critique": [...], "moyenne": [...]}, relu à chaud s'il change
+TICKET_PRIORITY_RULES_FILE = os.environ.get('TICKET_PRIORITY_RULES_FILE') or None
+TICKET_PRIORITY_RULES_CHECK_INTERVAL = int(os.environ.get('TICKET_PRIORITY_RULES_CHECK_INTERVAL', 5))
+# Analyser aussi le message, et pas seulement le sujet
+TICKET_PRIORITY_SCAN_MESSAGE = os.environ.get('TICKET_PRIORITY_SCAN_MESSAGE', 'False') == 'True'
+
+# Ingestion asynchrone (api/tickets/submit/async/, voir tickets/ingest.py)
+TICKET_ASYNC_INGEST = os.environ.get('TICKET_ASYNC_INGEST', 'False') == 'True'
+TICKET_ASYNC_INGEST_QUEUE_SIZE = int(os.environ.get('TICKET_ASYNC_INGEST_QUEUE_SIZE', 10000))
+TICKET_ASYNC_INGEST_BATCH_SIZE = int(os.environ.get('TICKET_ASYNC_INGEST_BATCH_SIZE', 200))
+TICKET_ASYNC_INGEST_FLUSH_INTERVAL = float(os.environ.get('TICKET_ASYNC_INGEST_FLUSH_INTERVAL', 0.5))
+TICKET_ASYNC_INGEST_SPILL_FILE = os.environ.get('TICKET_ASYNC_INGEST_SPILL_FILE', str(BASE_DIR / 'ingest_spill.jsonl'))
+# Secondes entre deux relectures du fichier de débordement et des relectures laissées en route
+TICKET_ASYNC_INGEST_REPLAY_INTERVAL = float(os.environ.get('TICKET_ASYNC_INGEST_REPLAY_INTERVAL', 60))
+
+# Prise de tickets par les agents (api/tickets/claim/ et bouton de l'admin)
+TICKET_CLAIM_MAX_COUNT = int(os.environ.get('TICKET_CLAIM_MAX_COUNT', 50))
+TICKET_CLAIM_DEFAULT_COUNT = int(os.environ.get('TICKET_CLAIM_DEFAULT_COUNT', 5))
+
+# Au-delà, la liste de l'admin affiche le nombre de tickets estimé par PostgreSQL
+TICKET_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('TICKET_ESTIMATED_COUNT_THRESHOLD', 50000))
+
+# Métriques des requêtes exposées sur /metrics (voir projet/metrics.py)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+# /metrics est refusé par défaut (403). Accès : jeton (Authorization: Bearer ...),
+# membre de l'équipe connecté à l'admin, ou adresse des réseaux listés
+# (REMOTE_ADDR : derrière un proxy, c'est l'adresse du proxy)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.environ.get('METRICS_ALLOWED_NETWORKS', '').split(',') if network.strip()
+]
+# Au-delà, la requête est journalisée avec ses requêtes SQL les plus lentes
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 1000))
+
 
 REST_FRAMEWORK = {
 
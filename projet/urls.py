@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from projet.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/tickets/', include('tickets.urls')),# Endpoint pour votre API de tickets
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
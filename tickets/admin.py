@@ -1,8 +1,87 @@
 from django.contrib import admin
 from django.contrib import messages
-from .models import Ticket
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.db.models import Count, Q
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import format_html
+from .models import ApiKey, ArchivedTicket, IncidentCluster, Ticket, TicketEvent, TicketImport, WebhookEvent
+from .claims import assign, claim_next
+from .export import export_response
+from .pagination import EstimatedCountPaginator, after_cursor, encode_cursor
+from .search import search, is_supported
+from .stats import dashboard
+from . import sla
 from django.contrib.auth.models import User
 from .forms import TicketAdminForm
+from . import workflow
+from projet.routers import read_alias, replica_reads
+
+
+CURSOR_VAR = 'cursor'
+
+
+def transition_action(modeladmin, request, queryset, to_status):
+    """Transition en masse des tickets de ``queryset``, avec compte rendu."""
+    result = workflow.transition(queryset, to_status, request.user)
+    label = dict(Ticket.STATUS_CHOICES)[to_status]
+    if result.updated:
+        modeladmin.message_user(request, f"{result.updated} ticket(s) passé(s) au statut '{label}'.", messages.SUCCESS)
+    if result.rejected:
+        ids = ', '.join(str(pk) for pk, _ in result.rejected)
+        modeladmin.message_user(request, f"{len(result.rejected)} ticket(s) non modifié(s) (transition non autorisée) : {ids}.", messages.WARNING)
+
+
+class TicketChangeList(ChangeList):
+    """
+    Ajoute une navigation par curseur (?cursor=...) sur (submission_date, id),
+    disponible avec le tri par défaut et hors recherche.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR) or None
+        self.next_cursor = None
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def keyset_enabled(self):
+        return ORDER_VAR not in self.params and not self.query
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # Le message n'est pas affiché dans la liste : inutile de le charger
+        queryset = super().get_queryset(request, exclude_parameters).defer('message')
+        if self.cursor and self.keyset_enabled:
+            try:
+                queryset = after_cursor(queryset, self.cursor)
+            except ValueError as exc:
+                raise IncorrectLookupParameters(exc)
+        return queryset
+
+    def get_results(self, request):
+        super().get_results(request)
+        if self.keyset_enabled and self.multi_page and not self.show_all:
+            self.result_list = list(self.result_list)
+            if len(self.result_list) == self.list_per_page:
+                self.next_cursor = encode_cursor(self.result_list[-1])
+
+    def next_cursor_url(self):
+        if self.next_cursor is None:
+            return None
+        return self.get_query_string({CURSOR_VAR: self.next_cursor}, [PAGE_VAR])
+
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
 
 
 @admin.register(Ticket)
@@ -14,6 +93,15 @@ class TicketAdmin(admin.ModelAdmin):
     list_filter = ('status', 'priority', 'platform_name', 'submission_date')
     search_fields = ('first_name', 'last_name', 'email', 'subject', 'message')
 
+    # Agent chargé par jointure, et saisi par identifiant plutôt que via un
+    # <select> listant tous les utilisateurs
+    list_select_related = ('agent',)
+    raw_id_fields = ('agent',)
+
+    # Pas de second COUNT(*) sur toute la table, total estimé sur les gros volumes
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     fieldsets = (
         (None, {
             'fields': ('subject', 'message', 'platform_name')
@@ -22,7 +110,7 @@ class TicketAdmin(admin.ModelAdmin):
             'fields': ('first_name', 'last_name', 'email')
         }),
         ('Statut et Priorité', {
-            'fields': ('status', 'priority', 'agent')
+            'fields': ('status', 'priority', 'agent', 'expected_version')
         }),
         ('Dates', {
             'fields': ('submission_date',)
@@ -36,34 +124,82 @@ class TicketAdmin(admin.ModelAdmin):
         form.request = request
         return form
 
+    def get_changelist(self, request, **kwargs):
+        return TicketChangeList
+
+    def changelist_view(self, request, extra_context=None):
+        # Liste, filtres et recherche sur la réplique ; les actions (POST) écrivent
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads(request):
+            return super().changelist_view(request, extra_context)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip() or not is_supported(queryset):
+            return super().get_search_results(request, queryset, search_term)
+        queryset = search(queryset, search_term)
+        # Résultats par pertinence, sauf tri explicite choisi dans la liste
+        if ORDER_VAR not in request.GET:
+            queryset = queryset.order_by('-search_rank', '-pk')
+        return queryset, False
+
     def agent_display(self, obj):
         if obj.agent:
             return f"{obj.agent.first_name} {obj.agent.last_name} ({obj.agent.username})"
         return "Non assigné"
     agent_display.short_description = 'Agent Assigné'
 
+    def get_fieldsets(self, request, obj=None):
+        if obj is None or not obj.message_truncated:
+            return super().get_fieldsets(request, obj)
+        # Message long : affiché en entier, en lecture seule
+        return [
+            (name, {**options, 'fields': tuple('full_message' if f == 'message' else f for f in options['fields'])})
+            for name, options in super().get_fieldsets(request, obj)
+        ]
+
     def get_readonly_fields(self, request, obj=None):
         if request.user.is_superuser:
-            return ('submission_date',)
+            fields = ('submission_date',)
         else:
-            return (
+            fields = (
                 'first_name', 'last_name', 'email', 'platform_name',
                 'submission_date', 'subject', 'message'
             )
+        if obj is not None and obj.message_truncated:
+            fields += ('full_message',)
+        return fields
+
+    def full_message(self, obj):
+        return obj.full_message
+    full_message.short_description = "Description détaillée"
 
     def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
+        if not change:
+            return super().save_model(request, obj, form, change)
+        try:
+            workflow.save_ticket(obj, request.user, form.changed_data, form.cleaned_data.get('expected_version'))
+        except workflow.ConcurrentModification as exc:
+            request._ticket_conflict = True
+            self.message_user(request, f"{exc} Vos modifications n'ont pas été enregistrées.", messages.ERROR)
+
+    def response_change(self, request, obj):
+        if getattr(request, '_ticket_conflict', False):
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
+    actions = ['mark_as_in_progress_and_assign', 'mark_as_resolved', 'mark_as_ignored', 'export_csv', 'export_ndjson']
 
-    actions = ['mark_as_in_progress_and_assign']
+    def mark_as_resolved(self, request, queryset):
+        transition_action(self, request, queryset, workflow.RESOLVED)
+    mark_as_resolved.short_description = "Marquer comme 'résolu'"
+
+    def mark_as_ignored(self, request, queryset):
+        transition_action(self, request, queryset, workflow.IGNORED)
+    mark_as_ignored.short_description = "Marquer comme 'ignoré'"
 
     def mark_as_in_progress_and_assign(self, request, queryset):
-        tickets_to_update = queryset.filter(status='nouveau', agent__isnull=True)
-        updated_count = 0
-        for ticket in tickets_to_update:
-            ticket.status = 'en cours de traitement'
-            ticket.agent = request.user
-            ticket.save()
-            updated_count += 1
+        updated_count = assign(queryset, request.user)
 
         if updated_count > 0:
             self.message_user(request, f"{updated_count} ticket(s) marqué(s) 'en cours de traitement' et assigné(s).", messages.SUCCESS)
@@ -72,6 +208,110 @@ class TicketAdmin(admin.ModelAdmin):
         
     mark_as_in_progress_and_assign.short_description = "Marquer comme 'en cours' et m'assigner"
 
+    def export_csv(self, request, queryset):
+        return export_response(queryset.using(read_alias(request)), 'csv')
+    export_csv.short_description = "Exporter en CSV"
+
+    def export_ndjson(self, request, queryset):
+        return export_response(queryset.using(read_alias(request)), 'ndjson')
+    export_ndjson.short_description = "Exporter en NDJSON"
+
+    def get_urls(self):
+        urls = [
+            path(
+                'claim/',
+                self.admin_site.admin_view(self.claim_view),
+                name='tickets_ticket_claim',
+            ),
+            path(
+                'stats/',
+                self.admin_site.admin_view(self.stats_view),
+                name='tickets_ticket_stats',
+            ),
+            path(
+                'sla/',
+                self.admin_site.admin_view(self.sla_view),
+                name='tickets_ticket_sla',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def claim_view(self, request):
+        if request.method != 'POST' or not self.has_view_permission(request):
+            raise PermissionDenied
+        tickets = claim_next(request.user, settings.TICKET_CLAIM_DEFAULT_COUNT)
+        if tickets:
+            ids = ', '.join(str(ticket.pk) for ticket in tickets)
+            self.message_user(request, f"{len(tickets)} ticket(s) vous ont été assigné(s) : {ids}.", messages.SUCCESS)
+        else:
+            self.message_user(request, "Aucun ticket 'nouveau' non assigné n'est disponible.", messages.WARNING)
+        changelist_url = reverse('admin:tickets_ticket_changelist')
+        return HttpResponseRedirect(f"{changelist_url}?agent__id__exact={request.user.pk}")
+
+    def stats_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        with replica_reads(request):
+            stats = dashboard()
+        statuses = Ticket.STATUS_CHOICES
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Statistiques des tickets",
+            'stats': stats,
+            'status_labels': [label for _, label in statuses],
+            'by_status': [(label, stats['totals']['by_status'].get(value, 0)) for value, label in statuses],
+            'by_priority': [
+                (label, stats['totals']['by_priority'].get(value, 0), stats['backlog']['by_priority'].get(value, 0))
+                for value, label in Ticket.PRIORITY_CHOICES
+            ],
+            'by_platform': [
+                (platform, count, stats['backlog']['by_platform'].get(platform, 0))
+                for platform, count in sorted(stats['totals']['by_platform'].items())
+            ],
+            'by_day': [
+                (day['day'], day['total'], [day['by_status'].get(value, 0) for value, _ in statuses])
+                for day in stats['by_day']
+            ],
+        }
+        return TemplateResponse(request, 'admin/tickets/ticket/stats.html', context)
+
+    def sla_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        # Esquisses tenues en mémoire : pas d'agrégation du journal
+        report = sla.get_tracker().report()
+        priorities = dict(Ticket.PRIORITY_CHOICES)
+
+        def rows(items):
+            return [
+                (
+                    row['platform_name'], priorities.get(row['priority'], row['priority']), sla.METRICS[row['metric']],
+                    row['count'], [sla.format_duration(value) for value in row['quantiles']],
+                    sla.format_duration(row['target']), row['breaches'],
+                )
+                for row in items
+            ]
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Délais de traitement",
+            'quantiles': [f"p{round(q * 100)}" for q in sla.QUANTILES],
+            'totals': rows(report['totals']),
+            'rows': rows(report['rows']),
+            'recent_breaches': [
+                (
+                    breach['ticket_id'], breach['platform_name'], priorities.get(breach['priority'], breach['priority']),
+                    sla.METRICS[breach['metric']], sla.format_duration(breach['seconds']),
+                    parse_datetime(breach['at']),
+                )
+                for breach in report['recent_breaches']
+            ],
+            'overdue': sla.overdue_tickets(),
+        }
+        return TemplateResponse(request, 'admin/tickets/ticket/sla.html', context)
+
     def get_actions(self, request):
         actions = super().get_actions(request)
         if request.user.is_superuser:
@@ -88,4 +328,166 @@ class TicketAdmin(admin.ModelAdmin):
                 return False
             return True
         
-        return super().has_change_permission(request, obj)
\ No newline at end of file
+        return super().has_change_permission(request, obj)
+
+
+@admin.register(IncidentCluster)
+class IncidentClusterAdmin(admin.ModelAdmin):
+    """Incidents regroupant les tickets quasi identiques, traitables en bloc."""
+    list_display = (
+        'id', 'label', 'platform_name', 'ticket_count', 'open_tickets',
+        'first_seen_at', 'last_seen_at', 'tickets_link'
+    )
+    list_filter = ('platform_name', 'last_seen_at')
+    search_fields = ('label',)
+    readonly_fields = ('platform_name', 'label', 'fingerprint', 'ticket_count', 'first_seen_at', 'last_seen_at')
+    exclude = ('band_0', 'band_1', 'band_2', 'band_3')
+    show_full_result_count = False
+    actions = ['take_tickets', 'resolve_tickets', 'ignore_tickets']
+
+    def get_queryset(self, request):
+        # Compté sur la page affichée seulement
+        return super().get_queryset(request).annotate(
+            open_ticket_count=Count('tickets', filter=Q(tickets__status__in=[workflow.NEW, workflow.IN_PROGRESS]))
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def open_tickets(self, obj):
+        return obj.open_ticket_count
+    open_tickets.short_description = 'Tickets ouverts'
+    open_tickets.admin_order_field = 'open_ticket_count'
+
+    def tickets_link(self, obj):
+        url = reverse('admin:tickets_ticket_changelist')
+        return format_html('<a href="{}?cluster__id__exact={}">Voir les tickets</a>', url, obj.pk)
+    tickets_link.short_description = 'Tickets'
+
+    def _cluster_tickets(self, queryset):
+        return Ticket.objects.filter(cluster__in=queryset)
+
+    def take_tickets(self, request, queryset):
+        transition_action(self, request, self._cluster_tickets(queryset), workflow.IN_PROGRESS)
+    take_tickets.short_description = "Passer les tickets des incidents 'en cours'"
+
+    def resolve_tickets(self, request, queryset):
+        transition_action(self, request, self._cluster_tickets(queryset), workflow.RESOLVED)
+    resolve_tickets.short_description = "Marquer les tickets des incidents comme 'résolu'"
+
+    def ignore_tickets(self, request, queryset):
+        transition_action(self, request, self._cluster_tickets(queryset), workflow.IGNORED)
+    ignore_tickets.short_description = "Marquer les tickets des incidents comme 'ignoré'"
+
+
+@admin.register(ArchivedTicket)
+class ArchivedTicketAdmin(admin.ModelAdmin):
+    """
+    Tickets archivés (voir archive.py), en lecture seule. La liste des tickets
+    renvoie ici pour chercher aussi dans les archives.
+    """
+    list_display = (
+        'id', 'subject', 'status', 'priority', 'platform_name',
+        'first_name', 'last_name', 'email', 'submission_date', 'agent', 'archived_at'
+    )
+    list_filter = ('status', 'priority', 'platform_name', 'submission_date')
+    search_fields = ('=id', 'first_name', 'last_name', 'email', 'subject', 'message')
+    list_select_related = ('agent',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        with replica_reads(request):
+            return super().changelist_view(request, extra_context)
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        if obj is not None and obj.message_truncated:
+            return ['full_message' if f == 'message' else f for f in fields]
+        return fields
+
+    def full_message(self, obj):
+        return obj.full_message
+    full_message.short_description = "Description détaillée"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ApiKey)
+class ApiKeyAdmin(admin.ModelAdmin):
+    list_display = ('platform_name', 'key_prefix', 'is_active', 'rate_per_minute', 'burst', 'created_at', 'updated_at')
+    list_filter = ('is_active', 'platform_name')
+    readonly_fields = ('key_prefix', 'created_at', 'updated_at')
+    actions = ['revoke']
+
+    def save_model(self, request, obj, form, change):
+        raw_key = None if change else obj.set_random_key()
+        super().save_model(request, obj, form, change)
+        if raw_key:
+            self.message_user(
+                request,
+                f"Clé API de « {obj.platform_name} » : {raw_key} — copiez-la maintenant, elle ne sera plus affichée.",
+                messages.WARNING
+            )
+
+    def revoke(self, request, queryset):
+        # updated_at est mis à jour explicitement : c'est lui qui invalide les caches
+        revoked = queryset.filter(is_active=True).update(is_active=False, updated_at=timezone.now())
+        self.message_user(request, f"{revoked} clé(s) révoquée(s).", messages.SUCCESS)
+    revoke.short_description = "Révoquer les clés sélectionnées"
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Notifications des plateformes (voir webhooks.py), en lecture seule."""
+    list_display = ('id', 'platform_name', 'ticket_id', 'event', 'state', 'attempts', 'next_attempt_at', 'created_at', 'delivered_at')
+    list_filter = ('state', 'platform_name')
+    search_fields = ('=ticket__id',)
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        retried = queryset.exclude(state=WebhookEvent.DELIVERED).update(
+            state=WebhookEvent.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{retried} notification(s) remise(s) en attente.", messages.SUCCESS)
+    retry.short_description = "Renvoyer les notifications sélectionnées"
+
+
+@admin.register(TicketEvent)
+class TicketEventAdmin(admin.ModelAdmin):
+    """Journal des changements de statut et d'agent (voir events.py), en ajout seul."""
+    list_display = ('id', 'ticket_id', 'platform_name', 'priority', 'old_status', 'new_status', 'old_agent', 'new_agent', 'created_at')
+    list_filter = ('new_status', 'platform_name', 'priority')
+    list_select_related = ('old_agent', 'new_agent')
+    search_fields = ('=ticket__id',)
+    readonly_fields = [field.name for field in TicketEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TicketImport)
+class TicketImportAdmin(admin.ModelAdmin):
+    """Points de reprise des imports (commande import_tickets) ; supprimer un point fait repartir du début."""
+    list_display = ('source', 'line', 'imported', 'rejected', 'duplicates', 'finished_at', 'updated_at')
+    readonly_fields = [field.name for field in TicketImport._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,33 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_schema(sender, using, **kwargs):
+    from django.db import connections
+    from .search import install_search_schema
+
+    install_search_schema(connections[using])
+
+
+def ensure_stats_schema(sender, using, **kwargs):
+    from django.db import connections
+    from .stats import install_stats_schema
+
+    install_stats_schema(connections[using])
+
+
+def ensure_events_schema(sender, using, **kwargs):
+    from django.db import connections
+    from .events import install_events_schema
+
+    install_events_schema(connections[using])
 
 
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tickets'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_schema, sender=self)
+        post_migrate.connect(ensure_stats_schema, sender=self)
+        post_migrate.connect(ensure_events_schema, sender=self)
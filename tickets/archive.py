@@ -0,0 +1,90 @@
+"""
+Archivage des tickets clos.
+
+Les tickets résolus ou ignorés soumis il y a plus de
+TICKET_ARCHIVE_AFTER_DAYS jours sont déplacés vers ``tickets_archivedticket`` :
+la table des tickets, ses index et la recherche plein texte ne portent plus
+que les tickets récents. Chaque lot est une transaction courte (copie puis
+suppression des mêmes lignes, verrouillées) et une pause sépare deux lots, ce
+qui laisse la base aux requêtes des agents pendant un archivage en journée.
+
+Les statistiques ne bougent pas (voir stats.py) ; l'admin consulte les
+archives séparément.
+"""
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import workflow
+from .models import ArchivedTicket, Ticket
+
+FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'subject', 'message', 'message_truncated', 'submission_date',
+    'platform_name', 'status', 'priority', 'agent_id', 'cluster_id',
+)
+
+BatchProgress = namedtuple('BatchProgress', 'archived batch seconds')
+
+
+def archivable(days=None, now=None):
+    """Tickets clos soumis il y a plus de ``days`` jours."""
+    if days is None:
+        days = settings.TICKET_ARCHIVE_AFTER_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Ticket.objects.filter(status__in=workflow.CLOSED_STATUSES, submission_date__lt=cutoff)
+
+
+def archive_batch(pks, now=None):
+    """
+    Archive ceux des tickets ``pks`` qui sont toujours clos. Les lignes prises
+    par une autre transaction (ticket rouvert à l'instant) sont laissées pour
+    un passage suivant. Renvoie le nombre de tickets archivés.
+    """
+    archived_at = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Ticket.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=pks, status__in=workflow.CLOSED_STATUSES)
+            .order_by()
+            .values(*FIELDS)
+        )
+        if not rows:
+            return 0
+        ArchivedTicket.objects.bulk_create([ArchivedTicket(archived_at=archived_at, **row) for row in rows])
+        # only('pk') : les références (clés d'idempotence...) sont mises à NULL
+        # sans relire les tickets entiers
+        Ticket.objects.filter(pk__in=[row['id'] for row in rows]).only('pk').delete()
+    return len(rows)
+
+
+def archive_tickets(queryset, batch_size=None, pause=None, limit=None, progress=None, sleep=time.sleep):
+    """
+    Archive les tickets de ``queryset`` par lots de ``batch_size``, dans l'ordre
+    des identifiants, en attendant ``pause`` secondes entre deux lots ; au plus
+    ``limit`` tickets si précisé. ``progress`` reçoit un BatchProgress après
+    chaque lot. Renvoie le nombre de tickets archivés.
+    """
+    batch_size = batch_size or settings.TICKET_ARCHIVE_BATCH_SIZE
+    pause = settings.TICKET_ARCHIVE_PAUSE if pause is None else pause
+    pending = queryset.order_by('pk').values_list('pk', flat=True)
+    archived = last_pk = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        pks = list(pending.filter(pk__gt=last_pk)[:size])
+        if not pks:
+            break
+        started = time.monotonic()
+        moved = archive_batch(pks)
+        archived += moved
+        last_pk = pks[-1]
+        if progress:
+            progress(BatchProgress(archived, moved, time.monotonic() - started))
+        if len(pks) < size:
+            break
+        if pause:
+            sleep(pause)
+    return archived
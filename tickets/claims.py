@@ -0,0 +1,88 @@
+"""
+File de travail des agents : attribution atomique des prochains tickets
+« nouveau » non assignés, par priorité puis ancienneté.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import status_cache
+from .models import Ticket
+
+CLAIMABLE = {'status': 'nouveau', 'agent__isnull': True}
+CLAIMED_STATUS = 'en cours de traitement'
+
+PRIORITY_RANK = Case(
+    When(priority='critique', then=Value(0)),
+    When(priority='moyenne', then=Value(1)),
+    default=Value(2),
+    output_field=IntegerField(),
+)
+
+
+def claimable_tickets():
+    return Ticket.objects.filter(**CLAIMABLE).order_by(PRIORITY_RANK, 'submission_date', 'pk')
+
+
+def assign(queryset, agent):
+    """
+    Passe en « en cours » et assigne à ``agent`` les tickets de ``queryset``
+    encore nouveaux et non assignés, en un seul UPDATE conditionnel.
+    Renvoie le nombre de tickets effectivement pris.
+    """
+    updated = Ticket.objects.filter(
+        pk__in=queryset.values('pk'), **CLAIMABLE
+    ).update(status=CLAIMED_STATUS, agent=agent, version=F('version') + 1)
+    if updated:
+        status_cache.invalidate()
+    return updated
+
+
+def claim_next(agent, count=1):
+    """Attribue à ``agent`` jusqu'à ``count`` tickets et les renvoie."""
+    if count <= 0:
+        return []
+    using = router.db_for_write(Ticket)
+    # Tout dans une transaction : un ticket attribué est toujours renvoyé.
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update_skip_locked:
+            claimed_ids = _claim_skip_locked(agent, count, using)
+        else:
+            claimed_ids = _claim_conditional(agent, count, using)
+        status_cache.invalidate(claimed_ids)
+        return list(
+            Ticket.objects.using(using).filter(pk__in=claimed_ids)
+            .order_by(PRIORITY_RANK, 'submission_date', 'pk')
+        )
+
+
+def _claim_skip_locked(agent, count, using):
+    # Les lignes verrouillées par un autre agent sont sautées, sans attente.
+    ids = list(
+        claimable_tickets().using(using)
+        .select_for_update(skip_locked=True)
+        .values_list('pk', flat=True)[:count]
+    )
+    if ids:
+        Ticket.objects.using(using).filter(pk__in=ids).update(status=CLAIMED_STATUS, agent=agent, version=F('version') + 1)
+    return ids
+
+
+def _claim_conditional(agent, count, using, max_attempts=5):
+    # Sans SKIP LOCKED (SQLite) : UPDATE conditionnel, puis relecture de ce
+    # qui a réellement été obtenu ; on recommence si un autre agent a pris
+    # une partie des candidats entre-temps.
+    claimed = []
+    for _ in range(max_attempts):
+        wanted = count - len(claimed)
+        candidates = list(claimable_tickets().using(using).values_list('pk', flat=True)[:wanted])
+        if not candidates:
+            break
+        Ticket.objects.using(using).filter(pk__in=candidates, **CLAIMABLE).update(
+            status=CLAIMED_STATUS, agent=agent, version=F('version') + 1
+        )
+        claimed += Ticket.objects.using(using).filter(
+            pk__in=candidates, agent=agent, status=CLAIMED_STATUS
+        ).values_list('pk', flat=True)
+        if len(claimed) >= count:
+            break
+    return claimed
@@ -0,0 +1,178 @@
+"""
+Regroupement des tickets quasi identiques en incidents.
+
+Chaque ticket reçoit une empreinte SimHash de 64 bits calculée sur le sujet
+(compté double) et le début du message : deux textes proches ont des
+empreintes qui ne diffèrent que de quelques bits. Un ticket rejoint
+l'incident ouvert de sa plateforme dont l'empreinte est à au plus
+MAX_DISTANCE bits de la sienne.
+
+Pour ne pas comparer le ticket à tous les incidents, l'empreinte est coupée
+en BANDS bandes de 16 bits, indexées : deux empreintes à moins de BANDS bits
+l'une de l'autre ont forcément une bande identique, et c'est encore probable
+jusqu'à MAX_DISTANCE bits. Une requête sur les bandes ramène une poignée de
+candidats, départagés en Python.
+"""
+import hashlib
+import re
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from .models import IncidentCluster
+from .priority import normalize
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_DISTANCE = 6
+MAX_MESSAGE_WORDS = 100
+
+_WORD_RE = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a au aux avec ce ces cet cette d de des du elle en est et il j je l la le les '
+    'ma me mes mon ne nous on pour qu que qui sa se ses sur son ta te tes ton un une '
+    'vos votre vous y bonjour merci svp'.split()
+)
+
+
+def _words(text, limit=None):
+    words = [word for word in _WORD_RE.findall(normalize(text)) if word not in STOPWORDS]
+    return words[:limit] if limit else words
+
+
+@lru_cache(maxsize=8192)
+def _feature_signs(feature):
+    value = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+    return tuple(1 if value >> bit & 1 else -1 for bit in range(BITS))
+
+
+def simhash(subject, message=''):
+    """Empreinte non signée de 64 bits, ou None si le texte est vide."""
+    # Les paires de mots rendraient l'empreinte trop sensible à un mot ajouté
+    features = _words(subject) * 2 + _words(message, MAX_MESSAGE_WORDS)
+    if not features:
+        return None
+    totals = [sum(column) for column in zip(*map(_feature_signs, features))]
+    return sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+
+
+def to_signed(value):
+    """Empreinte stockable dans un BigIntegerField (signé)."""
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value + (1 << BITS) if value < 0 else value
+
+
+def bands(value):
+    return [(value >> (band * BAND_BITS)) & BAND_MASK for band in range(BANDS)]
+
+
+def distance(a, b):
+    return (to_unsigned(a) ^ to_unsigned(b)).bit_count()
+
+
+def _candidates_sql(connection):
+    # Écrite à la main : compiler l'équivalent ORM coûte plus cher que la
+    # requête elle-même, servie par les index des bandes.
+    sql = _CANDIDATES_SQL.get(connection.vendor)
+    if sql is None:
+        qn = connection.ops.quote_name
+        bands_sql = ' OR '.join(f'{qn(f"band_{band}")} = %s' for band in range(BANDS))
+        sql = _CANDIDATES_SQL[connection.vendor] = (
+            f'SELECT {qn("id")}, {qn("fingerprint")} FROM {qn(IncidentCluster._meta.db_table)} '
+            f'WHERE ({bands_sql}) AND {qn("platform_name")} = %s AND {qn("last_seen_at")} >= %s'
+        )
+    return sql
+
+
+_CANDIDATES_SQL = {}
+
+
+class ClusterAssigner:
+    """
+    Rattache des tickets (pas encore enregistrés) à un incident. Les nouveaux
+    incidents sont créés en un seul INSERT par ``assign_many()`` ; les
+    compteurs des incidents existants sont mis à jour par ``finish()``, à
+    appeler après l'insertion des tickets.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self.window_start = self.now - timedelta(hours=settings.TICKET_CLUSTER_WINDOW_HOURS)
+        self._seen = {}  # plateforme -> [(empreinte, incident)] vus dans ce lot
+        self._added = {}  # pk d'incident existant -> tickets ajoutés
+
+    def candidates(self, platform_name, fingerprint):
+        """(pk, empreinte) des incidents ouverts ayant une bande en commun."""
+        connection = connections[router.db_for_read(IncidentCluster)]
+        params = bands(fingerprint) + [
+            platform_name, connection.ops.adapt_datetimefield_value(self.window_start)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(_candidates_sql(connection), params)
+            return cursor.fetchall()
+
+    def find(self, platform_name, fingerprint):
+        best, best_distance = None, MAX_DISTANCE + 1
+        for known, cluster in self._seen.get(platform_name, ()):
+            d = distance(known, fingerprint)
+            if d < best_distance:
+                best, best_distance = cluster, d
+        if best is not None:
+            return best
+        for pk, known in self.candidates(platform_name, fingerprint):
+            d = distance(known, fingerprint)
+            if d < best_distance:
+                best, best_distance = IncidentCluster(pk=pk, fingerprint=known), d
+        return best
+
+    def assign_many(self, tickets):
+        new_clusters = []
+        for ticket in tickets:
+            fingerprint = simhash(ticket.subject, ticket.message)
+            if fingerprint is None:
+                continue
+            ticket.fingerprint = to_signed(fingerprint)
+            cluster = self.find(ticket.platform_name, fingerprint)
+            if cluster is None:
+                cluster = IncidentCluster(
+                    platform_name=ticket.platform_name, label=ticket.subject,
+                    fingerprint=ticket.fingerprint, ticket_count=1,
+                    first_seen_at=self.now, last_seen_at=self.now,
+                    **{f'band_{band}': value for band, value in enumerate(bands(fingerprint))}
+                )
+                new_clusters.append(cluster)
+            elif cluster.pk is None:
+                cluster.ticket_count += 1
+            else:
+                self._added[cluster.pk] = self._added.get(cluster.pk, 0) + 1
+            self._seen.setdefault(ticket.platform_name, []).append((fingerprint, cluster))
+            ticket.cluster = cluster
+        IncidentCluster.objects.bulk_create(new_clusters)
+        # Les tickets reprennent l'identifiant des incidents tout juste créés
+        for ticket in tickets:
+            if ticket.cluster_id is None and ticket.cluster is not None:
+                ticket.cluster_id = ticket.cluster.pk
+
+    def finish(self):
+        for pk, added in self._added.items():
+            IncidentCluster.objects.filter(pk=pk).update(
+                ticket_count=F('ticket_count') + added, last_seen_at=self.now
+            )
+        self._added.clear()
+
+
+def assign_clusters(tickets):
+    """Rattache une liste de tickets à leurs incidents ; renvoie l'assigneur à terminer."""
+    assigner = ClusterAssigner()
+    if settings.TICKET_CLUSTERING:
+        assigner.assign_many(tickets)
+    return assigner
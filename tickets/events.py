@@ -0,0 +1,82 @@
+"""
+Journal des changements de statut et d'agent des tickets.
+
+Comme les statistiques (stats.py), le journal ``tickets_ticketevent`` est
+écrit par des triggers : les actions en masse de l'admin, les transitions
+(workflow.transition), la prise de tickets (claims) et tout UPDATE ensembliste
+sont couverts, sans requête de plus côté Django.
+- PostgreSQL : trigger par instruction avec tables de transition, un seul
+  INSERT ... SELECT par instruction ;
+- SQLite : trigger par ligne.
+La création d'un ticket n'est pas journalisée : sa date de soumission suffit.
+"""
+TABLE = 'tickets_ticket'
+EVENT_TABLE = 'tickets_ticketevent'
+TRIGGER = f'{EVENT_TABLE}_au'
+COLUMNS = (
+    'ticket_id, platform_name, priority, submission_date, old_status, new_status, '
+    'old_agent_id, new_agent_id, created_at'
+)
+
+POSTGRES_SCHEMA = [
+    f"""
+    CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO {EVENT_TABLE} ({COLUMNS})
+        SELECT n.id, n.platform_name, n.priority, n.submission_date, o.status, n.status,
+               o.agent_id, n.agent_id, statement_timestamp()
+        FROM old_rows o JOIN new_rows n ON n.id = o.id
+        WHERE (o.status, o.agent_id) IS DISTINCT FROM (n.status, n.agent_id)
+        ORDER BY n.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS {TRIGGER}_trg ON {TABLE}",
+    # Pas de liste de colonnes possible avec des tables de transition
+    f"""
+    CREATE TRIGGER {TRIGGER}_trg AFTER UPDATE ON {TABLE}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {TRIGGER}()
+    """,
+]
+
+POSTGRES_DROP = [
+    f"DROP TRIGGER IF EXISTS {TRIGGER}_trg ON {TABLE}",
+    f"DROP FUNCTION IF EXISTS {TRIGGER}()",
+]
+
+# Même format de date que Django (UTC, sans fuseau)
+SQLITE_TRIGGER = f"""
+    CREATE TRIGGER {TRIGGER} AFTER UPDATE OF status, agent_id ON {TABLE}
+    WHEN old.status IS NOT new.status OR old.agent_id IS NOT new.agent_id BEGIN
+        INSERT INTO {EVENT_TABLE} ({COLUMNS}) VALUES (
+            new.id, new.platform_name, new.priority, new.submission_date, old.status, new.status,
+            old.agent_id, new.agent_id, strftime('%Y-%m-%d %H:%M:%f', 'now')
+        );
+    END
+"""
+
+
+def install_events_schema(connection):
+    """Crée ou répare le trigger du journal. Idempotent."""
+    if EVENT_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            # Recréé après chaque migrate : Django reconstruit les tables SQLite
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s", [TRIGGER])
+            if cursor.fetchone() is None:
+                cursor.execute(SQLITE_TRIGGER)
+
+
+def uninstall_events_schema(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_DROP:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"DROP TRIGGER IF EXISTS {TRIGGER}")
@@ -0,0 +1,100 @@
+"""
+Export des tickets en CSV ou NDJSON, en flux.
+
+Les lignes sont lues par paquets (``iterator(chunk_size=...)``, curseur côté
+serveur sous PostgreSQL) et écrites au fil de l'eau dans une
+StreamingHttpResponse, éventuellement compressée en gzip : la mémoire utilisée
+ne dépend pas du nombre de tickets exportés. Le nom de l'agent et les messages
+longs (voir message_store.py) viennent de jointures, sans requête par ligne.
+"""
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .message_store import decompress
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+COLUMNS = (
+    'id', 'submission_date', 'platform_name', 'status', 'priority', 'subject', 'message',
+    'first_name', 'last_name', 'email', 'agent', 'cluster_id',
+)
+_FIELDS = COLUMNS[:10] + (
+    'agent__username', 'agent__first_name', 'agent__last_name', 'cluster_id', 'message_truncated', 'stored_message__data',
+)
+# Taille approximative des morceaux envoyés au client
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(queryset, chunk_size=None):
+    """Tuples dans l'ordre de COLUMNS."""
+    rows = queryset.values_list(*_FIELDS).iterator(chunk_size=chunk_size or settings.TICKET_EXPORT_CHUNK_SIZE)
+    for row in rows:
+        username, first_name, last_name = row[10:13]
+        agent = f"{first_name} {last_name} ({username})".strip() if username else ''
+        message = decompress(row[15]) if row[14] and row[15] is not None else row[6]
+        yield (row[0], timezone.localtime(row[1]).isoformat()) + row[2:6] + (message,) + row[7:10] + (agent, row[13])
+
+
+def _buffered(lines):
+    buffer = io.StringIO()
+    for line in lines:
+        buffer.write(line)
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne formatée."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, export_format='csv', compress=False):
+    rows = export_rows(queryset)
+    lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    chunks = _buffered(lines)
+    filename = f"tickets-{timezone.localtime():%Y%m%d-%H%M%S}.{export_format}"
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = FORMATS[export_format]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
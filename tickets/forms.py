@@ -1,37 +1,40 @@
 from django import forms
 from .models import Ticket
+from . import workflow
 from django.contrib.auth.models import User
 
 class TicketAdminForm(forms.ModelForm):
+    # Version affichée, comparée à l'enregistrement (verrouillage optimiste)
+    expected_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Ticket
         fields = '__all__'
 
     def __init__(self, *args, **kwargs):
-        self.request = kwargs.pop('request', None)
+        # get_form() de l'admin pose la requête sur la classe du formulaire
+        self.request = kwargs.pop('request', None) or getattr(self, 'request', None)
         super().__init__(*args, **kwargs)
-        
+
+        if self.instance.pk:
+            # Statut tel que lu en base par l'admin : pas de seconde lecture
+            self.current_status = getattr(self.instance, '_loaded_status', None) or self.instance.status
+            self.fields['expected_version'].initial = self.instance.version
+        else:
+            self.current_status = workflow.NEW
+
         if 'status' in self.fields:
-            if self.instance.pk:
-                self.instance.refresh_from_db()
-                current_status = self.instance.status
-            else:
-                current_status = 'nouveau'
-            
-            if self.request and not self.request.user.is_superuser: 
-                if current_status == 'nouveau':
-                    self.fields['status'].choices = [
-                        ('nouveau', 'Nouveau'),
-                        ('en cours de traitement', 'En cours de traitement'),
-                        ('ignore', 'Ignoré'),
-                    ]
-                elif current_status == 'en cours de traitement':
-                    self.fields['status'].choices = [
-                        ('en cours de traitement', 'En cours de traitement'),
-                        ('resolu', 'Résolu'), 
-                        ('ignore', 'Ignoré'),
-                    ]
-                elif current_status in ['resolu', 'ignore']:
-                    self.fields['status'].choices = [(current_status, dict(Ticket.STATUS_CHOICES).get(current_status, current_status))]
-                else: 
-                    self.fields['status'].choices = [(current_status, dict(Ticket.STATUS_CHOICES).get(current_status, current_status))]
\ No newline at end of file
+            user = self.request.user if self.request else None
+            if user is not None and not user.is_superuser:
+                labels = dict(Ticket.STATUS_CHOICES)
+                self.fields['status'].choices = [
+                    (status, labels.get(status, status))
+                    for status in workflow.allowed_statuses(self.current_status, user)
+                ]
+
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        if self.instance.pk:
+            user = self.request.user if self.request else None
+            workflow.check_transition(self.current_status, status, user)
+        return status
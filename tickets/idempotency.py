@@ -0,0 +1,112 @@
+"""
+Idempotence des soumissions : une plateforme qui renvoie une requête avec le
+même en-tête Idempotency-Key reçoit la réponse d'origine, sans nouveau ticket.
+
+La clé est enregistrée dans la même transaction que le ticket, sous une
+contrainte d'unicité (plateforme, clé) : de deux requêtes simultanées, une
+seule peut valider, l'autre est annulée et rejoue la réponse de la première.
+Les réponses sont aussi gardées dans un cache Django (TICKET_IDEMPOTENCY_CACHE)
+pour qu'une répétition ne touche pas la base.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+StoredResponse = namedtuple('StoredResponse', ['request_hash', 'status_code', 'body'])
+
+
+class IdempotencyConflict(Exception):
+    """Clé déjà utilisée pour une requête différente."""
+
+
+def request_fingerprint(data):
+    raw = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_key(platform_name, key):
+    digest = hashlib.sha256(f'{platform_name}\x00{key}'.encode()).hexdigest()
+    return f'idempotency:{digest}'
+
+
+def _remember(platform_name, key, stored, expires_at):
+    timeout = (expires_at - timezone.now()).total_seconds()
+    if timeout > 0:
+        caches[settings.TICKET_IDEMPOTENCY_CACHE].set(_cache_key(platform_name, key), tuple(stored), timeout)
+
+
+def lookup(platform_name, key):
+    """Réponse enregistrée pour cette clé (cache, puis base), ou None."""
+    cached = caches[settings.TICKET_IDEMPOTENCY_CACHE].get(_cache_key(platform_name, key))
+    if cached is not None:
+        return StoredResponse(*cached)
+    row = IdempotencyKey.objects.filter(
+        platform_name=platform_name, key=key, expires_at__gt=timezone.now()
+    ).values_list('request_hash', 'status_code', 'response_body', 'expires_at').first()
+    if row is None:
+        return None
+    stored = StoredResponse(*row[:3])
+    _remember(platform_name, key, stored, row[3])
+    return stored
+
+
+def check_fingerprint(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        raise IdempotencyConflict(
+            "Cette clé d'idempotence a déjà servi pour une requête différente."
+        )
+    return stored
+
+
+def execute(platform_name, key, fingerprint, create):
+    """
+    Exécute ``create()`` (qui renvoie (code, corps, ticket)) au plus une fois
+    pour cette clé. Renvoie (StoredResponse, rejouée).
+    """
+    for _ in range(2):
+        expires_at = timezone.now() + timedelta(seconds=settings.TICKET_IDEMPOTENCY_TTL)
+        try:
+            with transaction.atomic():
+                status_code, body, ticket = create()
+                IdempotencyKey.objects.create(
+                    platform_name=platform_name, key=key, request_hash=fingerprint, ticket=ticket,
+                    status_code=status_code, response_body=body, expires_at=expires_at,
+                )
+        except IntegrityError:
+            # Une autre requête avec la même clé a validé avant nous
+            stored = lookup(platform_name, key)
+            if stored is not None:
+                return stored, True
+            # La clé existante a expiré : on la remplace
+            IdempotencyKey.objects.filter(
+                platform_name=platform_name, key=key, expires_at__lte=timezone.now()
+            ).delete()
+            continue
+        stored = StoredResponse(fingerprint, status_code, body)
+        _remember(platform_name, key, stored, expires_at)
+        return stored, False
+    raise IntegrityError(f"Clé d'idempotence « {key} » impossible à enregistrer.")
+
+
+def purge_expired(batch_size=1000, now=None):
+    """Supprime les clés expirées par lots ; renvoie le nombre supprimé."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
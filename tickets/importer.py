@@ -0,0 +1,296 @@
+"""
+Import en masse de tickets : dumps d'anciens outils, soumissions perdues
+rejouées depuis les journaux des plateformes (commande import_tickets).
+
+Le fichier (JSONL ou CSV, compressé en gzip si son nom finit par .gz) est lu
+en flux par une chaîne de générateurs :
+- lecture des lignes (read_rows) ;
+- validation avec les règles de l'API (TicketImportSerializer) et
+  classification de la priorité, par paquets, dans un pool de processus
+  (prepare) ; les paquets reviennent dans l'ordre du fichier ;
+- écriture par lots de TICKET_IMPORT_CHUNK_SIZE lignes : COPY FROM STDIN sous
+  PostgreSQL, bulk_create ailleurs.
+
+Chaque lot est écrit dans la même transaction que le point de reprise
+(TicketImport) : une exécution interrompue reprend après la dernière ligne
+écrite, sans doublon. Les tickets dont l'ingest_reference existe déjà sont
+ignorés, ce qui permet de rejouer un journal. Les lignes refusées vont, avec
+leurs erreurs, dans un fichier JSONL. Les tickets importés ne sont ni
+regroupés en incidents (commande cluster_tickets) ni attribués (commande
+assign_tickets).
+"""
+import csv
+import gzip
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from . import message_store
+from .models import Ticket, TicketImport
+from .priority import classify
+from .serializers import TicketImportSerializer
+
+# Lignes par paquet envoyé à un processus de validation
+TASK_SIZE = 1000
+
+# Colonnes facultatives : vides dans un CSV, elles valent absentes
+OPTIONAL = ('submission_date', 'status', 'priority', 'ingest_reference')
+
+ImportProgress = namedtuple('ImportProgress', 'line read imported rejected duplicates seconds')
+
+
+def default_source(path):
+    return os.path.abspath(path)
+
+
+def default_rejected_path(path):
+    return f'{path}.rejected.jsonl'
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(path, input_format=None, start=0):
+    """
+    Lignes (numéro, ligne) du fichier ``path`` après la ligne ``start`` : un
+    dict, ou le texte brut d'une ligne JSON illisible. Numéros des lignes du
+    fichier en JSONL, des enregistrements (en-tête exclu) en CSV.
+    """
+    input_format = input_format or detect_format(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as stream:
+        if input_format == 'csv':
+            for number, row in enumerate(csv.DictReader(stream), start=1):
+                if number > start:
+                    yield number, row
+            return
+        for number, line in enumerate(stream, start=1):
+            # Les lignes déjà importées ne sont pas décodées
+            if number <= start or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, line.rstrip('\r\n')
+
+
+def _plain(errors):
+    if isinstance(errors, dict):
+        return {key: _plain(value) for key, value in errors.items()}
+    if isinstance(errors, list):
+        return [_plain(value) for value in errors]
+    return str(errors)
+
+
+def prepare(rows, platform_name=None):
+    """
+    Valide et classe un paquet ``rows`` [(numéro, ligne)]. Renvoie (dernier
+    numéro, [(numéro, champs du ticket)], [(numéro, erreurs, ligne)]).
+    """
+    # Une seule instance : DRF construit ses champs une fois, pas à chaque ligne
+    serializer = TicketImportSerializer()
+    valid, rejected = [], []
+    for number, row in rows:
+        if not isinstance(row, dict):
+            rejected.append((number, {'non_field_errors': ["Un ticket doit être un objet JSON."]}, row))
+            continue
+        data = {key: value for key, value in row.items() if not (key in OPTIONAL and value in ('', None))}
+        if platform_name and not data.get('platform_name'):
+            data['platform_name'] = platform_name
+        try:
+            values = dict(serializer.run_validation(data))
+        except ValidationError as exc:
+            rejected.append((number, _plain(as_serializer_error(exc)), row))
+            continue
+        if 'priority' not in values:
+            values['priority'] = classify(values.get('subject', ''), values.get('message')).priority
+        valid.append((number, values))
+    return rows[-1][0], valid, rejected
+
+
+def _tasks(rows, size):
+    rows = iter(rows)
+    while task := list(itertools.islice(rows, size)):
+        yield task
+
+
+def prepared(rows, workers, platform_name=None, task_size=TASK_SIZE):
+    """
+    Résultats de prepare() pour ``rows``, dans l'ordre du fichier. Avec plus
+    d'un processus, au plus deux paquets par processus sont en cours : la
+    lecture ne prend pas d'avance sur l'écriture.
+    """
+    work = partial(prepare, platform_name=platform_name)
+    # Les processus sont créés par fork (Django déjà chargé) ; à défaut, tout
+    # est fait ici
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        yield from map(work, _tasks(rows, task_size))
+        return
+    # Les processus ne font aucune requête : la connexion héritée du fork
+    # n'est ni utilisée ni fermée par eux (sortie par os._exit)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        pending = deque()
+        for task in _tasks(rows, task_size):
+            pending.append(pool.submit(work, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def copy_rows(tickets, connection):
+    """Colonnes et lignes au format texte de COPY des tickets ``tickets``."""
+    fields = Ticket._meta.concrete_fields
+    buffer = io.StringIO()
+    for ticket in tickets:
+        buffer.write('\t'.join(
+            _copy_value(field.get_db_prep_save(field.pre_save(ticket, True), connection)) for field in fields
+        ))
+        buffer.write('\n')
+    return [field.column for field in fields], buffer.getvalue()
+
+
+def copy_tickets(tickets, connection):
+    """
+    Insère ``tickets`` avec COPY FROM STDIN (PostgreSQL). Les identifiants
+    sont pris d'avance dans la séquence, pour ranger les messages longs.
+    """
+    table = Ticket._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [table, len(tickets)],
+        )
+        for ticket, (pk,) in zip(tickets, cursor.fetchall()):
+            ticket.pk = pk
+        bodies = [(ticket, message_store.split(ticket)) for ticket in tickets]
+        columns, data = copy_rows(tickets, connection)
+        statement = "COPY {} ({}) FROM STDIN".format(
+            connection.ops.quote_name(table), ', '.join(connection.ops.quote_name(column) for column in columns)
+        )
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            raw.copy_expert(statement, io.StringIO(data))
+        else:
+            # psycopg 3
+            with raw.copy(statement) as copy:
+                copy.write(data)
+    message_store.store([(ticket, body) for ticket, body in bodies if body is not None])
+
+
+def write_tickets(tickets, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        copy_tickets(tickets, connection)
+    else:
+        Ticket.objects.using(using).bulk_create(tickets)
+
+
+def _new_tickets(valid):
+    """Tickets à écrire parmi ``valid``, et nombre de références déjà importées."""
+    references = [values['ingest_reference'] for _, values in valid if 'ingest_reference' in values]
+    seen = set(
+        Ticket.objects.filter(ingest_reference__in=references).values_list('ingest_reference', flat=True)
+    ) if references else set()
+    tickets = []
+    for _, values in valid:
+        reference = values.get('ingest_reference')
+        if reference is not None:
+            if reference in seen:
+                continue
+            seen.add(reference)
+        tickets.append(Ticket(**values))
+    return tickets, len(valid) - len(tickets)
+
+
+def import_tickets(path, input_format=None, source=None, chunk_size=None, workers=None,
+                   platform_name=None, rejected_path=None, restart=False, progress=None):
+    """
+    Importe le fichier ``path`` à partir de son point de reprise (nommé
+    ``source``, par défaut le chemin du fichier ; ``restart`` repart du début).
+    ``progress`` reçoit un ImportProgress après chaque lot ; renvoie le dernier.
+    """
+    chunk_size = chunk_size or settings.TICKET_IMPORT_CHUNK_SIZE
+    workers = settings.TICKET_IMPORT_WORKERS if workers is None else workers
+    source = source or default_source(path)
+    rejected_path = rejected_path or default_rejected_path(path)
+
+    checkpoint, _ = TicketImport.objects.get_or_create(source=source)
+    if restart:
+        checkpoint.line = checkpoint.imported = checkpoint.rejected = checkpoint.duplicates = 0
+        checkpoint.finished_at = None
+        checkpoint.save()
+    start = checkpoint.line
+
+    started = time.monotonic()
+    totals = {'line': start, 'read': 0, 'imported': 0, 'rejected': 0, 'duplicates': 0}
+    valid, rejected = [], []
+
+    def flush(line):
+        # Les refus sont écrits avant la validation du lot : une reprise peut
+        # les répéter, pas les perdre
+        if rejected:
+            with open(rejected_path, 'a', encoding='utf-8') as rejected_file:
+                for number, errors, row in rejected:
+                    rejected_file.write(json.dumps(
+                        {'line': number, 'errors': errors, 'row': row}, ensure_ascii=False, default=str
+                    ) + '\n')
+                rejected_file.flush()
+                os.fsync(rejected_file.fileno())
+        with transaction.atomic():
+            tickets, duplicates = _new_tickets(valid)
+            if tickets:
+                write_tickets(tickets)
+            TicketImport.objects.filter(pk=checkpoint.pk).update(
+                line=line, imported=F('imported') + len(tickets), rejected=F('rejected') + len(rejected),
+                duplicates=F('duplicates') + duplicates, updated_at=timezone.now(),
+            )
+        totals.update(
+            line=line, read=totals['read'] + len(valid) + len(rejected),
+            imported=totals['imported'] + len(tickets), rejected=totals['rejected'] + len(rejected),
+            duplicates=totals['duplicates'] + duplicates,
+        )
+        valid.clear()
+        rejected.clear()
+        if progress:
+            progress(ImportProgress(seconds=time.monotonic() - started, **totals))
+
+    line = start
+    rows = read_rows(path, input_format, start=start)
+    # Paquets plus petits que les lots : un lot s'arrête au plus près de chunk_size
+    tasks = prepared(rows, workers, platform_name, task_size=min(TASK_SIZE, chunk_size))
+    for line, task_valid, task_rejected in tasks:
+        valid += task_valid
+        rejected += task_rejected
+        if len(valid) + len(rejected) >= chunk_size:
+            flush(line)
+    if valid or rejected or line > totals['line']:
+        flush(line)
+    TicketImport.objects.filter(pk=checkpoint.pk).update(finished_at=timezone.now())
+    return ImportProgress(seconds=time.monotonic() - started, **totals)
@@ -0,0 +1,266 @@
+"""
+Ingestion asynchrone des tickets (mode write-behind).
+
+La vue asynchrone dépose les tickets validés dans une file bornée en mémoire ;
+un thread d'écriture les regroupe et les insère par lots (taille ou fenêtre de
+temps). À l'arrêt du processus, ce qui n'a pas pu être écrit est recopié dans
+un fichier JSONL local. Ce fichier, comme ceux d'un lot dont l'écriture a
+échoué, est relu au démarrage puis toutes les TICKET_ASYNC_INGEST_REPLAY_INTERVAL
+secondes, avec les relectures laissées en route (échec, processus arrêté).
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .clustering import assign_clusters
+from .models import Ticket
+from .priority import classify
+from .scheduler import schedule
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class TicketIngestor:
+    def __init__(self, max_size, batch_size, flush_interval, spill_path, replay_interval=None):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.replay_interval = (
+            settings.TICKET_ASYNC_INGEST_REPLAY_INTERVAL if replay_interval is None else replay_interval
+        )
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+    def submit(self, validated_data):
+        """Met un ticket en file et renvoie sa référence provisoire."""
+        reference = uuid.uuid4()
+        item = dict(validated_data, ingest_reference=reference, submission_date=timezone.now())
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            raise QueueFull()
+        return reference
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='ticket-ingestor', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Arrête le thread d'écriture puis recopie la file restante sur disque."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout)
+        pending = self._drain()
+        if pending:
+            self.spill(pending)
+
+    def _drain(self, limit=None):
+        items = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _next_batch(self):
+        try:
+            first = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            next_replay = 0
+            while not self._stop.is_set():
+                if time.monotonic() >= next_replay:
+                    self._replay_safely()
+                    next_replay = time.monotonic() + self.replay_interval
+                batch = self._next_batch()
+                if batch:
+                    self.write(batch)
+            # Dernier passage : on vide ce qui peut l'être avant de rendre la main.
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                self.write(batch)
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Écrit immédiatement tout le contenu de la file (sans thread)."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self.write(batch)
+
+    def write(self, batch):
+        close_old_connections()
+        tickets = []
+        for item in batch:
+            data = dict(item)
+            data['priority'] = classify(data.get('subject', ''), data.get('message')).priority
+            tickets.append(Ticket(**data))
+        try:
+            with transaction.atomic():
+                assigner = assign_clusters(tickets)
+                Ticket.objects.bulk_create(tickets)
+                assigner.finish()
+                schedule(tickets)
+        except Exception:
+            logger.exception("Échec de l'insertion d'un lot de %d tickets, recopie sur disque.", len(batch))
+            self.spill(batch)
+            return 0
+        return len(tickets)
+
+    def spill(self, items):
+        if not items:
+            return
+        with self._lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for item in items:
+                    record = dict(item)
+                    record['ingest_reference'] = str(record['ingest_reference'])
+                    record['submission_date'] = record['submission_date'].isoformat()
+                    spill_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                spill_file.flush()
+                os.fsync(spill_file.fileno())
+        logger.warning("%d ticket(s) en attente recopié(s) dans %s.", len(items), self.spill_path)
+
+    def _replay_safely(self):
+        try:
+            self.replay_spill()
+        except Exception:
+            # Le fichier de relecture reste en place : repris au passage suivant
+            logger.exception("Échec de la relecture de %s, nouvel essai dans %s s.", self.spill_path, self.replay_interval)
+
+    def _claim_replay_files(self):
+        """
+        Renomme à son nom les fichiers à relire : le fichier de débordement, et
+        les relectures laissées en route par ce processus ou par un processus
+        arrêté. Le renommage est atomique : un fichier n'est pris qu'une fois.
+        """
+        claimed = []
+        candidates = [self.spill_path] + sorted(glob.glob(f'{glob.escape(self.spill_path)}.*.replay'))
+        for path in candidates:
+            if path != self.spill_path:
+                owner = path[len(self.spill_path) + 1:].split('.', 1)[0]
+                if owner == str(os.getpid()):
+                    claimed.append(path)
+                    continue
+                if not owner.isdigit() or _process_alive(int(owner)):
+                    continue
+            replay_path = f'{self.spill_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.replay'
+            try:
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                continue
+            claimed.append(replay_path)
+        return claimed
+
+    def replay_spill(self):
+        """Réinsère les tickets recopiés sur disque (arrêt, lot en échec, relecture interrompue)."""
+        with self._replay_lock:
+            with self._lock:
+                replay_paths = self._claim_replay_files()
+            return sum(self._replay(replay_path) for replay_path in replay_paths)
+
+    def _replay(self, replay_path):
+        items = []
+        with open(replay_path, encoding='utf-8') as replay_file:
+            for line in replay_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record['ingest_reference'] = uuid.UUID(record['ingest_reference'])
+                record['submission_date'] = parse_datetime(record['submission_date'])
+                items.append(record)
+
+        # Un ticket déjà inséré (avant l'arrêt, ou par une relecture
+        # interrompue) ne doit pas l'être deux fois.
+        references = [item['ingest_reference'] for item in items]
+        existing = set()
+        for start in range(0, len(references), self.batch_size):
+            chunk = references[start:start + self.batch_size]
+            existing.update(
+                Ticket.objects.filter(ingest_reference__in=chunk).values_list('ingest_reference', flat=True)
+            )
+        items = [item for item in items if item['ingest_reference'] not in existing]
+
+        written = 0
+        for start in range(0, len(items), self.batch_size):
+            written += self.write(items[start:start + self.batch_size])
+        os.remove(replay_path)
+        if written:
+            logger.info("%d ticket(s) réinséré(s) depuis %s.", written, self.spill_path)
+        return written
+
+
+def _process_alive(pid):
+    if os.name != 'posix':
+        # Sans signal 0, une relecture d'un autre processus n'est pas reprise
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = TicketIngestor(
+                max_size=settings.TICKET_ASYNC_INGEST_QUEUE_SIZE,
+                batch_size=settings.TICKET_ASYNC_INGEST_BATCH_SIZE,
+                flush_interval=settings.TICKET_ASYNC_INGEST_FLUSH_INTERVAL,
+                spill_path=settings.TICKET_ASYNC_INGEST_SPILL_FILE,
+                replay_interval=settings.TICKET_ASYNC_INGEST_REPLAY_INTERVAL,
+            )
+            _ingestor.start()
+            atexit.register(_ingestor.stop)
+        return _ingestor
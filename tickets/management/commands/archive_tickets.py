@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from tickets.archive import archivable, archive_tickets
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace vers les archives, par lots, les tickets résolus ou ignorés "
+        "soumis il y a plus de --days jours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TICKET_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.TICKET_ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=settings.TICKET_ARCHIVE_PAUSE,
+            help="Secondes d'attente entre deux lots, pour ménager la base en journée.",
+        )
+        parser.add_argument('--limit', type=int, help="Nombre maximal de tickets archivés par cette exécution.")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les tickets concernés sans rien déplacer.")
+
+    def handle(self, *args, **options):
+        queryset = archivable(options['days'])
+        counts = dict(queryset.order_by().values_list('status').annotate(Count('pk')))
+        total = sum(counts.values())
+        if options['limit'] is not None:
+            total = min(total, options['limit'])
+        if options['dry_run']:
+            detail = ', '.join(f"{status} : {count}" for status, count in sorted(counts.items()))
+            self.stdout.write(
+                f"{total} ticket(s) clos depuis plus de {options['days']} jour(s) à archiver"
+                + (f" ({detail})." if detail else ".")
+            )
+            return
+
+        started = time.monotonic()
+
+        def progress(batch):
+            rate = batch.batch / batch.seconds if batch.seconds else 0
+            self.stdout.write(f"{batch.archived}/{total} ticket(s) archivé(s) — lot de {batch.batch} à {rate:.0f} tickets/s")
+
+        archived = archive_tickets(
+            queryset, batch_size=options['batch_size'], pause=options['pause'],
+            limit=options['limit'], progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        rate = archived / elapsed if elapsed else 0
+        self.stdout.write(f"{archived} ticket(s) archivé(s) en {elapsed:.1f} s ({rate:.0f} tickets/s, pauses comprises).")
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tickets.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Attribue les tickets nouveaux non assignés aux agents les moins chargés "
+        "(voir tickets/scheduler.py). Tourne en continu, sauf avec --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Un seul passage, puis arrêt.")
+        parser.add_argument('--batch-size', type=int, default=settings.TICKET_SCHEDULER_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Secondes d'attente quand la file est vide ou les agents pleins.",
+        )
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(batch_size=options['batch_size'])
+        try:
+            while True:
+                started = time.monotonic()
+                result = scheduler.run_once()
+                elapsed = time.monotonic() - started
+                if result.assigned or options['once']:
+                    self.stdout.write(
+                        f"{result.assigned} ticket(s) attribué(s), {result.skipped} en attente "
+                        f"d'un agent disponible en {elapsed:.2f} s"
+                    )
+                if options['once']:
+                    break
+                if result.assigned < scheduler.batch_size:
+                    close_old_connections()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
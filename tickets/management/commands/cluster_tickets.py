@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tickets import workflow
+from tickets.clustering import ClusterAssigner
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Rattache à un incident les tickets ouverts qui n'en ont pas encore (tickets antérieurs au regroupement)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pending = Ticket.objects.filter(
+            fingerprint__isnull=True, status__in=[workflow.NEW, workflow.IN_PROGRESS]
+        ).order_by('pk').only('pk', 'subject', 'message', 'platform_name')
+        last_pk = 0
+        clustered = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                assigner = ClusterAssigner()
+                assigner.assign_many(batch)
+                Ticket.objects.bulk_update(batch, ['fingerprint', 'cluster'])
+                assigner.finish()
+            clustered += sum(1 for ticket in batch if ticket.cluster_id)
+            last_pk = batch[-1].pk
+        self.stdout.write(f"{clustered} ticket(s) rattaché(s) à un incident.")
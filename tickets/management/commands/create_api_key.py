@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tickets.models import ApiKey
+
+
+class Command(BaseCommand):
+    help = "Crée une clé API pour une plateforme et l'affiche (une seule fois)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('platform_name')
+        parser.add_argument('--rate-per-minute', type=int, default=None)
+        parser.add_argument('--burst', type=int, default=None)
+
+    def handle(self, *args, **options):
+        api_key, raw_key = ApiKey.generate(
+            options['platform_name'],
+            rate_per_minute=options['rate_per_minute'],
+            burst=options['burst'],
+        )
+        self.stderr.write(f"Clé créée pour « {api_key.platform_name} » (préfixe {api_key.key_prefix}).")
+        self.stdout.write(raw_key)
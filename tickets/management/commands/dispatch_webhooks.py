@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tickets.webhooks import Dispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie aux plateformes les notifications de tickets clos en attente "
+        "(voir tickets/webhooks.py). Tourne en continu, sauf avec --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Un seul passage, puis arrêt.")
+        parser.add_argument('--limit', type=int, default=1000, help="Événements au plus par passage.")
+        parser.add_argument('--batch-size', type=int, default=settings.TICKET_WEBHOOK_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help="Secondes d'attente quand il n'y a rien à envoyer.",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(batch_size=options['batch_size'])
+        try:
+            while True:
+                started = time.monotonic()
+                result = dispatcher.run_once(limit=options['limit'])
+                elapsed = time.monotonic() - started
+                if any(result) or options['once']:
+                    rate = result.delivered / elapsed if elapsed else 0
+                    self.stdout.write(
+                        f"{result.delivered} notification(s) envoyée(s), {result.failed} à réessayer, "
+                        f"{result.dead} abandonnée(s) en {elapsed:.2f} s ({rate:.0f}/s)"
+                    )
+                if options['once']:
+                    break
+                if sum(result) < options['limit']:
+                    close_old_connections()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.close()
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.importer import default_rejected_path, default_source, import_tickets
+from tickets.models import TicketImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en masse des tickets depuis un fichier JSONL ou CSV (éventuellement .gz), "
+        "avec les règles de validation de l'API. Reprend après la dernière ligne importée "
+        "en cas d'interruption. Les tickets importés ne sont ni regroupés en incidents "
+        "(commande cluster_tickets) ni attribués (commande assign_tickets)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help="Par défaut, d'après l'extension du fichier.")
+        parser.add_argument('--platform', help="Plateforme d'origine des lignes qui n'en ont pas.")
+        parser.add_argument('--chunk-size', type=int, default=settings.TICKET_IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            '--workers', type=int, default=settings.TICKET_IMPORT_WORKERS,
+            help="Processus de validation (0 ou 1 : dans ce processus).",
+        )
+        parser.add_argument('--rejected', help="Fichier des lignes refusées (par défaut <path>.rejected.jsonl).")
+        parser.add_argument('--name', help="Nom du point de reprise (par défaut le chemin du fichier).")
+        parser.add_argument('--restart', action='store_true', help="Ignore le point de reprise et repart du début.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            open(path, 'rb').close()
+        except OSError as exc:
+            raise CommandError(f"Fichier illisible : {exc}")
+
+        if not options['restart']:
+            checkpoint = TicketImport.objects.filter(source=options['name'] or default_source(path)).first()
+            if checkpoint and checkpoint.line:
+                self.stdout.write(f"Reprise après la ligne {checkpoint.line} ({checkpoint.imported} ticket(s) déjà importé(s)).")
+
+        def progress(step):
+            rate = step.read / step.seconds if step.seconds else 0
+            self.stdout.write(
+                f"ligne {step.line} : {step.imported} ticket(s) importé(s), {step.rejected} refusé(s), "
+                f"{step.duplicates} déjà présent(s) — {rate:.0f} lignes/s"
+            )
+
+        result = import_tickets(
+            path, input_format=options['format'], source=options['name'], chunk_size=options['chunk_size'],
+            workers=options['workers'], platform_name=options['platform'], rejected_path=options['rejected'],
+            restart=options['restart'], progress=progress,
+        )
+        rate = result.read / result.seconds if result.seconds else 0
+        self.stdout.write(
+            f"{result.read} ligne(s) lue(s) en {result.seconds:.1f} s ({rate:.0f} lignes/s) : "
+            f"{result.imported} ticket(s) importé(s), {result.rejected} refusé(s), {result.duplicates} déjà présent(s)."
+        )
+        if result.rejected:
+            self.stdout.write(f"Lignes refusées : {options['rejected'] or default_rejected_path(path)}")
+
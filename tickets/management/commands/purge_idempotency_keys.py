@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tickets.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées, par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(f"{deleted} clé(s) d'idempotence expirée(s) supprimée(s).")
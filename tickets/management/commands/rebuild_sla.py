@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.sla import RESOLUTION, SlaTracker
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les délais de traitement (quantiles et dépassements) depuis tout le "
+        "journal des événements, et les enregistre pour la page Délais de l'admin."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        progress = lambda count: self.stdout.write(f"{count} événement(s) lu(s)...")
+        tracker = SlaTracker()
+        events = tracker.rebuild(progress=progress if options['verbosity'] > 1 else None)
+        tickets = sum(sketch.count for (_, _, metric), sketch in tracker.sketches.items() if metric == RESOLUTION)
+        self.stdout.write(
+            f"{events} événement(s) lu(s), {tickets} résolution(s), "
+            f"{sum(tracker.breaches.values())} dépassement(s) en {time.monotonic() - started:.2f} s."
+        )
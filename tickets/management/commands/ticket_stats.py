@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tickets.stats import install_stats_schema, rebuild, verify
+
+
+class Command(BaseCommand):
+    help = "Vérifie (par défaut) ou recalcule les statistiques de tickets à partir des tickets et des archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recalcule toute la table de statistiques.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if options['rebuild']:
+            install_stats_schema(connection)
+            rows = rebuild(connection)
+            self.stdout.write(f"Statistiques recalculées ({rows} ligne(s)).")
+            return
+
+        differences = verify(connection)
+        for table, bucket, expected, recorded in differences[:50]:
+            self.stderr.write(
+                f"{table} {' / '.join(map(str, bucket))} : {recorded} enregistré(s), {expected} attendu(s)"
+            )
+        if differences:
+            raise CommandError(f"{len(differences)} écart(s) ; relancez avec --rebuild.")
+        self.stdout.write("Statistiques conformes.")
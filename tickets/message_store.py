@@ -0,0 +1,94 @@
+"""
+Stockage des messages longs.
+
+Un message de plus de TICKET_MESSAGE_INLINE_LENGTH caractères (journaux collés
+par certaines plateformes) n'est pas gardé entier dans la table des tickets :
+``Ticket.message`` n'en garde que le début (``message_truncated``), et le
+message complet va, compressé avec zlib, dans ``tickets_ticketmessage``. Il
+n'est lu que pour être affiché : ``full_message`` du ticket (fiche de l'admin,
+API, export). Les lignes des tickets restent petites, et les listes, filtres
+et parcours lisent moins de pages.
+
+La découpe est faite à l'insertion (Ticket.save, Ticket.objects.bulk_create)
+et à la modification du message (workflow.save_ticket). La ligne du message
+garde l'identifiant du ticket, sans clé étrangère contrôlée : elle suit le
+ticket dans les archives. La recherche plein texte porte sur le message
+complet, indexé à l'enregistrement (search.index_messages).
+"""
+import zlib
+
+from django.conf import settings
+from django.db import connections, router
+
+from . import search
+
+COMPRESSION_LEVEL = 6
+
+
+def compress(text):
+    return zlib.compress(text.encode(), COMPRESSION_LEVEL)
+
+
+def decompress(data):
+    return zlib.decompress(bytes(data)).decode()
+
+
+def split(ticket):
+    """
+    Si le message de ``ticket`` est trop long, n'en garde que le début et
+    renvoie le message complet compressé ; sinon None.
+    """
+    limit = settings.TICKET_MESSAGE_INLINE_LENGTH
+    message = ticket.message or ''
+    if len(message) <= limit:
+        return None
+    ticket._full_message = message
+    ticket.message = message[:limit]
+    ticket.message_truncated = True
+    return compress(message)
+
+
+def store(pairs):
+    """
+    Enregistre les messages complets ``pairs`` : (ticket, données compressées),
+    et les indexe pour la recherche plein texte.
+    """
+    from .models import TicketMessage
+
+    rows = [
+        TicketMessage(ticket_id=ticket.pk, data=data, length=len(ticket._full_message))
+        for ticket, data in pairs
+    ]
+    if rows:
+        TicketMessage.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['ticket'], update_fields=['data', 'length']
+        )
+        search.index_messages(
+            connections[router.db_for_write(TicketMessage)],
+            {ticket.pk: ticket._full_message for ticket, _ in pairs},
+        )
+
+
+def load(obj):
+    """Message complet du ticket (ou ticket archivé) ``obj``."""
+    if not obj.message_truncated:
+        return obj.message
+    if getattr(obj, '_full_message', None) is None:
+        load_many([obj])
+    return obj._full_message
+
+
+def load_many(objs):
+    """Charge en une requête les messages complets des tickets tronqués de ``objs``."""
+    from .models import TicketMessage
+
+    pending = {obj.pk: obj for obj in objs if obj.message_truncated and getattr(obj, '_full_message', None) is None}
+    if not pending:
+        return
+    # Même base que les tickets (réplique éventuellement)
+    using = next(iter(pending.values()))._state.db
+    for pk, data in TicketMessage.objects.using(using).filter(pk__in=list(pending)).values_list('pk', 'data'):
+        pending.pop(pk)._full_message = decompress(data)
+    for obj in pending.values():
+        # Ligne du message perdue : le début vaut mieux que rien
+        obj._full_message = obj.message
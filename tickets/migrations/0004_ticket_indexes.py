@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_ingest_reference'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-submission_date'], name='ticket_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', '-submission_date'], name='ticket_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['priority', '-submission_date'], name='ticket_priority_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['platform_name', '-submission_date'], name='ticket_platform_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('agent__isnull', True), ('status', 'nouveau')), fields=['-submission_date'], name='ticket_unassigned_new_idx'),
+        ),
+    ]
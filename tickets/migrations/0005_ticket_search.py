@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:30
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def install_search(apps, schema_editor):
+    from tickets.search import install_search_schema
+    install_search_schema(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from tickets.search import uninstall_search_schema
+    uninstall_search_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticket_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='ticket_email_upper_idx'),
+        ),
+        migrations.RunPython(install_search, uninstall_search),
+    ]
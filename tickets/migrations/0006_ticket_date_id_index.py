@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-submission_date', '-id'], name='ticket_date_id_idx'),
+        ),
+    ]
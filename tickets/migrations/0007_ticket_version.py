@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Version'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:45
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def import_settings_keys(apps, schema_editor):
+    # Reprise des clés définies par variables d'environnement (API_KEY_SITE*)
+    ApiKey = apps.get_model('tickets', 'ApiKey')
+    for raw_key, platform_name in getattr(settings, 'API_KEYS', {}).items():
+        if not raw_key:
+            continue
+        ApiKey.objects.get_or_create(
+            key_hash=hashlib.sha256(raw_key.encode()).hexdigest(),
+            defaults={'platform_name': platform_name, 'key_prefix': raw_key[:8]},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticket_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name='Plateforme')),
+                ('key_prefix', models.CharField(editable=False, max_length=8, verbose_name='Début de la clé')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Empreinte de la clé')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('rate_per_minute', models.PositiveIntegerField(blank=True, null=True, verbose_name='Requêtes par minute')),
+                ('burst', models.PositiveIntegerField(blank=True, null=True, verbose_name='Rafale maximale')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Modifiée le')),
+            ],
+            options={
+                'verbose_name': 'Clé API',
+                'verbose_name_plural': 'Clés API',
+                'ordering': ['platform_name', '-created_at'],
+            },
+        ),
+        migrations.RunPython(import_settings_keys, migrations.RunPython.noop),
+    ]
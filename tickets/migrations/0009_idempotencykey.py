@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_apikey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name='Plateforme')),
+                ('key', models.CharField(max_length=255, verbose_name="Clé d'idempotence")),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Empreinte de la requête')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Code de réponse')),
+                ('response_body', models.JSONField(verbose_name='Corps de la réponse')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expire le')),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tickets.ticket', verbose_name='Ticket')),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+                'constraints': [models.UniqueConstraint(fields=('platform_name', 'key'), name='idempotency_platform_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name="Plateforme d'origine")),
+                ('label', models.CharField(max_length=100, verbose_name='Libellé')),
+                ('fingerprint', models.BigIntegerField(verbose_name='Empreinte')),
+                ('band_0', models.PositiveIntegerField(db_index=True, editable=False)),
+                ('band_1', models.PositiveIntegerField(db_index=True, editable=False)),
+                ('band_2', models.PositiveIntegerField(db_index=True, editable=False)),
+                ('band_3', models.PositiveIntegerField(db_index=True, editable=False)),
+                ('ticket_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de tickets')),
+                ('first_seen_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Premier ticket')),
+                ('last_seen_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Dernier ticket')),
+            ],
+            options={
+                'verbose_name': 'Incident',
+                'verbose_name_plural': 'Incidents',
+                'ordering': ['-last_seen_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Empreinte'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='tickets.incidentcluster', verbose_name='Incident'),
+        ),
+    ]
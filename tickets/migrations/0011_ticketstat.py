@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+def install_stats(apps, schema_editor):
+    from tickets.stats import install_stats_schema, rebuild
+    install_stats_schema(schema_editor.connection)
+    rebuild(schema_editor.connection)
+
+
+def uninstall_stats(apps, schema_editor):
+    from tickets.stats import uninstall_stats_schema
+    uninstall_stats_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_incidentcluster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('platform_name', models.CharField(max_length=100, verbose_name="Plateforme d'origine")),
+                ('status', models.CharField(max_length=50, verbose_name='Statut')),
+                ('priority', models.CharField(max_length=50, verbose_name='Priorité')),
+                ('count', models.IntegerField(default=0, verbose_name='Nombre de tickets')),
+            ],
+            options={
+                'verbose_name': 'Statistique de tickets',
+                'verbose_name_plural': 'Statistiques de tickets',
+                'constraints': [models.UniqueConstraint(fields=('day', 'platform_name', 'status', 'priority'), name='ticketstat_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketStatTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name="Plateforme d'origine")),
+                ('status', models.CharField(max_length=50, verbose_name='Statut')),
+                ('priority', models.CharField(max_length=50, verbose_name='Priorité')),
+                ('count', models.IntegerField(default=0, verbose_name='Nombre de tickets')),
+            ],
+            options={
+                'verbose_name': 'Total de tickets',
+                'verbose_name_plural': 'Totaux de tickets',
+                'constraints': [models.UniqueConstraint(fields=('platform_name', 'status', 'priority'), name='ticketstattotal_bucket_uniq')],
+            },
+        ),
+        migrations.RunPython(install_stats, uninstall_stats),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:25
+
+import django.db.models.deletion
+import django.db.models.functions.text
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def install_stats(apps, schema_editor):
+    # Les triggers de statistiques couvrent désormais aussi les archives
+    from tickets.stats import install_stats_schema
+    install_stats_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_ticketstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100, verbose_name='Prénom du plaignant')),
+                ('last_name', models.CharField(max_length=100, verbose_name='Nom du plaignant')),
+                ('email', models.EmailField(max_length=255, verbose_name='Email du plaignant')),
+                ('subject', models.CharField(max_length=100, verbose_name='Sujet du ticket')),
+                ('message', models.TextField(verbose_name='Description détaillée')),
+                ('submission_date', models.DateTimeField(verbose_name='Date de soumission')),
+                ('platform_name', models.CharField(max_length=100, verbose_name="Plateforme d'origine")),
+                ('status', models.CharField(choices=[('nouveau', 'Nouveau'), ('en cours de traitement', 'En cours de traitement'), ('resolu', 'Résolu'), ('ignore', 'Ignoré')], max_length=50, verbose_name='Statut')),
+                ('priority', models.CharField(choices=[('basse', 'Basse'), ('moyenne', 'Moyenne'), ('critique', 'Critique')], max_length=50, verbose_name='Priorité')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Archivé le')),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_tickets', to=settings.AUTH_USER_MODEL, verbose_name='Agent assigné')),
+                ('cluster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_tickets', to='tickets.incidentcluster', verbose_name='Incident')),
+            ],
+            options={
+                'verbose_name': 'Ticket archivé',
+                'verbose_name_plural': 'Tickets archivés',
+                'ordering': ['-submission_date'],
+                'indexes': [models.Index(fields=['-submission_date', '-id'], name='archived_date_id_idx'), models.Index(django.db.models.functions.text.Upper('email'), name='archived_email_upper_idx')],
+            },
+        ),
+        migrations.RunPython(install_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_archivedticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name='Plateforme')),
+                ('event', models.CharField(max_length=50, verbose_name='Événement')),
+                ('payload', models.JSONField(verbose_name='Contenu')),
+                ('state', models.CharField(choices=[('en attente', 'En attente'), ('envoye', 'Envoyé'), ('abandonne', 'Abandonné')], default='en attente', max_length=20, verbose_name='État')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Essais')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochain essai')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoyé le')),
+                ('ticket', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tickets.ticket', verbose_name='Ticket')),
+            ],
+            options={
+                'verbose_name': 'Notification webhook',
+                'verbose_name_plural': 'Notifications webhook',
+                'indexes': [models.Index(condition=models.Q(('state', 'en attente')), fields=['next_attempt_at'], name='webhook_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_webhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketMessage',
+            fields=[
+                ('ticket', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='stored_message', serialize=False, to='tickets.ticket', verbose_name='Ticket')),
+                ('data', models.BinaryField(verbose_name='Message compressé')),
+                ('length', models.PositiveIntegerField(verbose_name='Longueur (caractères)')),
+            ],
+            options={
+                'verbose_name': 'Message long',
+                'verbose_name_plural': 'Messages longs',
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedticket',
+            name='message_truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Message tronqué'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='message_truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Message tronqué'),
+        ),
+    ]
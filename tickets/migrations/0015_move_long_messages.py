@@ -0,0 +1,63 @@
+import zlib
+
+from django.conf import settings
+from django.db import migrations, transaction
+from django.db.models.functions import Length
+
+BATCH_SIZE = 500
+
+
+def _move(model, message_model, using, limit):
+    # Par lots sur la clé primaire, chacun dans sa transaction : pas de verrou
+    # durable sur une grosse table
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.using(using)
+            .annotate(message_length=Length('message'))
+            .filter(pk__gt=last_pk, message_length__gt=limit, message_truncated=False)
+            .order_by('pk')
+            .values_list('pk', 'message')[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        with transaction.atomic(using=using):
+            message_model.objects.using(using).bulk_create(
+                [message_model(ticket_id=pk, data=zlib.compress(message.encode(), 6), length=len(message)) for pk, message in rows],
+                ignore_conflicts=True,
+            )
+            for pk, message in rows:
+                model.objects.using(using).filter(pk=pk).update(message=message[:limit], message_truncated=True)
+        last_pk = rows[-1][0]
+
+
+def move_long_messages(apps, schema_editor):
+    using = schema_editor.connection.alias
+    limit = settings.TICKET_MESSAGE_INLINE_LENGTH
+    message_model = apps.get_model('tickets', 'TicketMessage')
+    for name in ('Ticket', 'ArchivedTicket'):
+        _move(apps.get_model('tickets', name), message_model, using, limit)
+
+
+def restore_long_messages(apps, schema_editor):
+    using = schema_editor.connection.alias
+    message_model = apps.get_model('tickets', 'TicketMessage')
+    for name in ('Ticket', 'ArchivedTicket'):
+        model = apps.get_model('tickets', name)
+        for pk, data in message_model.objects.using(using).values_list('pk', 'data').iterator():
+            model.objects.using(using).filter(pk=pk, message_truncated=True).update(
+                message=zlib.decompress(bytes(data)).decode(), message_truncated=False
+            )
+
+
+class Migration(migrations.Migration):
+    # Une transaction par lot (voir _move)
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0014_ticketmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_long_messages, restore_long_messages),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_move_long_messages'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('agent__isnull', True), ('status', 'nouveau')), fields=['priority', 'submission_date'], name='ticket_unassigned_prio_idx'),
+        ),
+    ]
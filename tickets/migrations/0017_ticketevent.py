@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def install_events(apps, schema_editor):
+    from tickets.events import install_events_schema
+    install_events_schema(schema_editor.connection)
+
+
+def uninstall_events(apps, schema_editor):
+    from tickets.events import uninstall_events_schema
+    uninstall_events_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0016_ticket_unassigned_prio_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlaSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkpoint', models.BigIntegerField(verbose_name='Dernier événement lu')),
+                ('state', models.JSONField(verbose_name='État')),
+                ('rebuilt', models.BooleanField(default=False, verbose_name='Recalcul complet')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+            ],
+            options={
+                'verbose_name': 'Instantané des délais',
+                'verbose_name_plural': 'Instantanés des délais',
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform_name', models.CharField(max_length=100, verbose_name='Plateforme')),
+                ('priority', models.CharField(max_length=50, verbose_name='Priorité')),
+                ('submission_date', models.DateTimeField(verbose_name='Date de soumission')),
+                ('old_status', models.CharField(max_length=50, verbose_name='Ancien statut')),
+                ('new_status', models.CharField(max_length=50, verbose_name='Nouveau statut')),
+                ('created_at', models.DateTimeField(verbose_name='Date')),
+                ('new_agent', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Nouvel agent')),
+                ('old_agent', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Ancien agent')),
+                ('ticket', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='tickets.ticket', verbose_name='Ticket')),
+            ],
+            options={
+                'verbose_name': 'Événement de ticket',
+                'verbose_name_plural': 'Événements de tickets',
+            },
+        ),
+        migrations.RunPython(install_events, uninstall_events),
+    ]
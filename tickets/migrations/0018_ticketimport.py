@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0017_ticketevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Source')),
+                ('line', models.PositiveIntegerField(default=0, verbose_name='Dernière ligne traitée')),
+                ('imported', models.PositiveIntegerField(default=0, verbose_name='Tickets importés')),
+                ('rejected', models.PositiveIntegerField(default=0, verbose_name='Lignes refusées')),
+                ('duplicates', models.PositiveIntegerField(default=0, verbose_name='Déjà importées')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'Import de tickets',
+                'verbose_name_plural': 'Imports de tickets',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+import hashlib
+
+from django.conf import settings
+from django.db import migrations
+
+
+def import_settings_keys(apps, schema_editor):
+    # 0008 écrivait toujours dans la base par défaut : une autre base migrée
+    # (réplique locale, DB_REPLICA_ENABLED) est restée sans les clés
+    # d'environnement. Seule une table vide est complétée, pour ne pas
+    # recréer une clé supprimée volontairement.
+    ApiKey = apps.get_model('tickets', 'ApiKey')
+    db_alias = schema_editor.connection.alias
+    if ApiKey.objects.using(db_alias).exists():
+        return
+    for raw_key, platform_name in getattr(settings, 'API_KEYS', {}).items():
+        if not raw_key:
+            continue
+        ApiKey.objects.using(db_alias).get_or_create(
+            key_hash=hashlib.sha256(raw_key.encode()).hexdigest(),
+            defaults={'platform_name': platform_name, 'key_prefix': raw_key[:8]},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0018_ticketimport'),
+    ]
+
+    operations = [
+        migrations.RunPython(import_settings_keys, migrations.RunPython.noop),
+    ]
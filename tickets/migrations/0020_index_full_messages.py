@@ -0,0 +1,46 @@
+import zlib
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+
+
+def index_full_messages(apps, schema_editor):
+    # La recherche n'indexait que le début des messages longs (0015) : schéma
+    # de recherche refait (SQLite : contenu FTS5 lu dans une vue), puis texte
+    # complet des messages existants indexé, par lots
+    from tickets.search import index_messages, install_search_schema, uninstall_search_schema
+
+    connection = schema_editor.connection
+    using = connection.alias
+    if connection.vendor == 'sqlite':
+        uninstall_search_schema(connection)
+    install_search_schema(connection)
+
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketMessage = apps.get_model('tickets', 'TicketMessage')
+    last_pk = 0
+    while True:
+        pks = list(
+            Ticket.objects.using(using).filter(pk__gt=last_pk, message_truncated=True)
+            .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            return
+        rows = TicketMessage.objects.using(using).filter(pk__in=pks).values_list('pk', 'data')
+        with transaction.atomic(using=using):
+            index_messages(connection, {pk: zlib.decompress(bytes(data)).decode() for pk, data in rows})
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    # Une transaction par lot (voir index_full_messages)
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0019_import_settings_keys_per_database'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_full_messages, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,51 @@
-from django.db import models
+import hashlib
+import secrets
+
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.contrib.auth.models import User
+from . import message_store, status_cache, workflow
+
+class IncidentCluster(models.Model):
+    """
+    Incident regroupant les tickets quasi identiques d'une plateforme
+    (voir clustering.py). Les bandes de l'empreinte sont indexées pour
+    retrouver les incidents proches sans parcourir la table.
+    """
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme d'origine")
+    label = models.CharField(max_length=100, verbose_name="Libellé")
+    fingerprint = models.BigIntegerField(verbose_name="Empreinte")
+    band_0 = models.PositiveIntegerField(db_index=True, editable=False)
+    band_1 = models.PositiveIntegerField(db_index=True, editable=False)
+    band_2 = models.PositiveIntegerField(db_index=True, editable=False)
+    band_3 = models.PositiveIntegerField(db_index=True, editable=False)
+    ticket_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de tickets")
+    first_seen_at = models.DateTimeField(default=timezone.now, verbose_name="Premier ticket")
+    last_seen_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Dernier ticket")
+
+    class Meta:
+        verbose_name = "Incident"
+        verbose_name_plural = "Incidents"
+        ordering = ['-last_seen_at']
+
+    def __str__(self):
+        return f"{self.label} ({self.platform_name})"
+
+
+class TicketQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Messages longs : début dans le ticket, message complet à part (message_store.py)
+        objs = list(objs)
+        bodies = [(ticket, message_store.split(ticket)) for ticket in objs]
+        bodies = [(ticket, data) for ticket, data in bodies if data is not None]
+        if not bodies:
+            return super().bulk_create(objs, *args, **kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            message_store.store(bodies)
+        return created
+
 
 class Ticket(models.Model):
     STATUS_CHOICES = [
@@ -22,6 +67,8 @@ class Ticket(models.Model):
     
     subject = models.CharField(max_length=100, verbose_name="Sujet du ticket")
     message = models.TextField(verbose_name="Description détaillée")
+    # Message trop long : seul son début est ici, le reste dans TicketMessage
+    message_truncated = models.BooleanField(default=False, editable=False, verbose_name="Message tronqué")
     
     submission_date = models.DateTimeField(default=timezone.now, verbose_name="Date de soumission")
     platform_name = models.CharField(max_length=100, verbose_name="Plateforme d'origine")
@@ -49,10 +96,390 @@ class Ticket(models.Model):
         verbose_name="Agent assigné"
     )
 
+    # Incrémentée à chaque modification (verrouillage optimiste, voir workflow.py)
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Version")
+
+    # Référence provisoire renvoyée par l'ingestion asynchrone (api/tickets/submit/async/)
+    ingest_reference = models.UUIDField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name="Référence d'ingestion"
+    )
+
+    # Empreinte SimHash du sujet et du message, et incident de rattachement
+    fingerprint = models.BigIntegerField(null=True, blank=True, editable=False, verbose_name="Empreinte")
+    cluster = models.ForeignKey(
+        IncidentCluster,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tickets',
+        verbose_name="Incident"
+    )
+
+    objects = TicketQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Ticket de plainte"
         verbose_name_plural = "Tickets de plainte"
         ordering = ['-submission_date']
+        indexes = [
+            # Tri par défaut de la liste (l'admin ajoute -id), filtre par date de
+            # l'admin et pagination par curseur sur (submission_date, id)
+            models.Index(fields=['-submission_date', '-id'], name='ticket_date_id_idx'),
+            # Filtres de l'admin combinés au tri par date
+            models.Index(fields=['status', '-submission_date'], name='ticket_status_date_idx'),
+            models.Index(fields=['priority', '-submission_date'], name='ticket_priority_date_idx'),
+            models.Index(fields=['platform_name', '-submission_date'], name='ticket_platform_date_idx'),
+            # File des tickets nouveaux non assignés (mark_as_in_progress_and_assign)
+            models.Index(
+                fields=['-submission_date'],
+                name='ticket_unassigned_new_idx',
+                condition=models.Q(status='nouveau', agent__isnull=True),
+            ),
+            # Même file par priorité, pour l'attribution automatique (tickets/scheduler.py)
+            models.Index(
+                fields=['priority', 'submission_date'],
+                name='ticket_unassigned_prio_idx',
+                condition=models.Q(status='nouveau', agent__isnull=True),
+            ),
+            # Recherche exacte par email dans l'admin (email__iexact -> UPPER(email) sur PostgreSQL)
+            models.Index(Upper('email'), name='ticket_email_upper_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut lu en base, pour contrôler la transition sans relire la ligne
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if not adding:
+            loaded_status = getattr(self, '_loaded_status', None)
+            if loaded_status is not None:
+                workflow.check_transition(loaded_status, self.status)
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        update_fields = kwargs.get('update_fields')
+        body = message_store.split(self) if update_fields is None or 'message' in update_fields else None
+        if body is None:
+            super().save(*args, **kwargs)
+        else:
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'message_truncated'}
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+                message_store.store([(self, body)])
+        self._loaded_status = self.status
+        if not adding:
+            status_cache.invalidate([self.pk])
+
+    @property
+    def full_message(self):
+        """Message complet, lu dans TicketMessage si ``message`` n'en est que le début."""
+        return message_store.load(self)
+
+    def __str__(self):
+        return f"Ticket {self.id}: {self.subject} ({self.get_status_display()})"
+
+
+class ArchivedTicket(models.Model):
+    """
+    Ticket clos (résolu ou ignoré) sorti de la table des tickets par la
+    commande archive_tickets (voir archive.py). Conserve l'identifiant
+    d'origine ; consultable dans l'admin, en lecture seule.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID")
+    first_name = models.CharField(max_length=100, verbose_name="Prénom du plaignant")
+    last_name = models.CharField(max_length=100, verbose_name="Nom du plaignant")
+    email = models.EmailField(max_length=255, verbose_name="Email du plaignant")
+    subject = models.CharField(max_length=100, verbose_name="Sujet du ticket")
+    message = models.TextField(verbose_name="Description détaillée")
+    message_truncated = models.BooleanField(default=False, editable=False, verbose_name="Message tronqué")
+    submission_date = models.DateTimeField(verbose_name="Date de soumission")
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme d'origine")
+    status = models.CharField(max_length=50, choices=Ticket.STATUS_CHOICES, verbose_name="Statut")
+    priority = models.CharField(max_length=50, choices=Ticket.PRIORITY_CHOICES, verbose_name="Priorité")
+    agent = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_tickets',
+        verbose_name="Agent assigné"
+    )
+    cluster = models.ForeignKey(
+        IncidentCluster,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_tickets',
+        verbose_name="Incident"
+    )
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Archivé le")
+
+    class Meta:
+        verbose_name = "Ticket archivé"
+        verbose_name_plural = "Tickets archivés"
+        ordering = ['-submission_date']
+        indexes = [
+            models.Index(fields=['-submission_date', '-id'], name='archived_date_id_idx'),
+            models.Index(Upper('email'), name='archived_email_upper_idx'),
+        ]
+
+    @property
+    def full_message(self):
+        return message_store.load(self)
+
+    def __str__(self):
+        return f"Ticket {self.id} (archivé) : {self.subject}"
+
+
+class TicketMessage(models.Model):
+    """
+    Message complet d'un ticket dont ``message`` n'est que le début, compressé
+    (voir message_store.py). Sans contrainte de clé étrangère : la ligne reste
+    quand le ticket est archivé, sous le même identifiant.
+    """
+    ticket = models.OneToOneField(
+        Ticket,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='stored_message',
+        verbose_name="Ticket"
+    )
+    data = models.BinaryField(verbose_name="Message compressé")
+    length = models.PositiveIntegerField(verbose_name="Longueur (caractères)")
+
+    class Meta:
+        verbose_name = "Message long"
+        verbose_name_plural = "Messages longs"
+
+
+class TicketStat(models.Model):
+    """
+    Nombre de tickets par jour de soumission, plateforme, statut et priorité,
+    tenu à jour par des triggers (voir stats.py). Ne pas écrire directement.
+    """
+    day = models.DateField(verbose_name="Jour")
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme d'origine")
+    status = models.CharField(max_length=50, verbose_name="Statut")
+    priority = models.CharField(max_length=50, verbose_name="Priorité")
+    count = models.IntegerField(default=0, verbose_name="Nombre de tickets")
+
+    class Meta:
+        verbose_name = "Statistique de tickets"
+        verbose_name_plural = "Statistiques de tickets"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'platform_name', 'status', 'priority'], name='ticketstat_bucket_uniq'),
+        ]
+
+
+class TicketStatTotal(models.Model):
+    """Comme TicketStat, toutes dates confondues (stock de tickets ouverts)."""
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme d'origine")
+    status = models.CharField(max_length=50, verbose_name="Statut")
+    priority = models.CharField(max_length=50, verbose_name="Priorité")
+    count = models.IntegerField(default=0, verbose_name="Nombre de tickets")
+
+    class Meta:
+        verbose_name = "Total de tickets"
+        verbose_name_plural = "Totaux de tickets"
+        constraints = [
+            models.UniqueConstraint(fields=['platform_name', 'status', 'priority'], name='ticketstattotal_bucket_uniq'),
+        ]
+
+
+class ApiKey(models.Model):
+    """
+    Clé API d'une plateforme partenaire. Seule l'empreinte SHA-256 de la clé
+    est conservée ; la clé elle-même n'est affichée qu'à sa création.
+    """
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme")
+    key_prefix = models.CharField(max_length=8, editable=False, verbose_name="Début de la clé")
+    key_hash = models.CharField(max_length=64, unique=True, editable=False, verbose_name="Empreinte de la clé")
+    is_active = models.BooleanField(default=True, verbose_name="Active")
+
+    rate_per_minute = models.PositiveIntegerField(null=True, blank=True, verbose_name="Requêtes par minute")
+    burst = models.PositiveIntegerField(null=True, blank=True, verbose_name="Rafale maximale")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    # Sert d'horodatage de version pour invalider les caches des workers
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Modifiée le")
+
+    class Meta:
+        verbose_name = "Clé API"
+        verbose_name_plural = "Clés API"
+        ordering = ['platform_name', '-created_at']
+
+    @staticmethod
+    def hash_key(raw_key):
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def set_key(self, raw_key):
+        self.key_prefix = raw_key[:8]
+        self.key_hash = self.hash_key(raw_key)
+
+    def set_random_key(self):
+        """Tire une nouvelle clé et renvoie sa valeur en clair."""
+        raw_key = secrets.token_urlsafe(32)
+        self.set_key(raw_key)
+        return raw_key
+
+    @classmethod
+    def generate(cls, platform_name, **kwargs):
+        """Crée une clé aléatoire ; renvoie (ApiKey, clé en clair)."""
+        api_key = cls(platform_name=platform_name, **kwargs)
+        raw_key = api_key.set_random_key()
+        api_key.save()
+        return api_key, raw_key
+
+    def __str__(self):
+        return f"{self.platform_name} ({self.key_prefix}…)"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Réponse enregistrée d'une soumission portant un en-tête Idempotency-Key,
+    rejouée telle quelle si la plateforme renvoie la même requête.
+    """
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme")
+    key = models.CharField(max_length=255, verbose_name="Clé d'idempotence")
+    request_hash = models.CharField(max_length=64, verbose_name="Empreinte de la requête")
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Ticket"
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name="Code de réponse")
+    response_body = models.JSONField(verbose_name="Corps de la réponse")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Expire le")
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        constraints = [
+            models.UniqueConstraint(fields=['platform_name', 'key'], name='idempotency_platform_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.platform_name} : {self.key}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Changement de statut à notifier à une plateforme, écrit dans la même
+    transaction que le changement (outbox) puis envoyé par la commande
+    dispatch_webhooks (voir webhooks.py).
+    """
+    PENDING = 'en attente'
+    DELIVERED = 'envoye'
+    DEAD = 'abandonne'
+    STATE_CHOICES = [
+        (PENDING, 'En attente'),
+        (DELIVERED, 'Envoyé'),
+        (DEAD, 'Abandonné'),
+    ]
+
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme")
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Ticket"
+    )
+    event = models.CharField(max_length=50, verbose_name="Événement")
+    payload = models.JSONField(verbose_name="Contenu")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=PENDING, verbose_name="État")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Essais")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Prochain essai")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Envoyé le")
+
+    class Meta:
+        verbose_name = "Notification webhook"
+        verbose_name_plural = "Notifications webhook"
+        indexes = [
+            # Événements à envoyer, par date d'échéance (webhooks.Dispatcher.claim)
+            models.Index(
+                fields=['next_attempt_at'],
+                name='webhook_pending_idx',
+                condition=models.Q(state='en attente'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.pk} → {self.platform_name} ({self.get_state_display()})"
+
+
+class TicketEvent(models.Model):
+    """
+    Changement de statut ou d'agent d'un ticket, en ajout seul. Écrit par la
+    base (triggers, voir events.py), donc aussi pour les UPDATE ensemblistes.
+    Plateforme, priorité et date de soumission sont recopiées : les délais se
+    calculent sans relire le ticket, même archivé.
+    """
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.DO_NOTHING, db_constraint=False, related_name='events', verbose_name="Ticket"
+    )
+    platform_name = models.CharField(max_length=100, verbose_name="Plateforme")
+    priority = models.CharField(max_length=50, verbose_name="Priorité")
+    submission_date = models.DateTimeField(verbose_name="Date de soumission")
+    old_status = models.CharField(max_length=50, verbose_name="Ancien statut")
+    new_status = models.CharField(max_length=50, verbose_name="Nouveau statut")
+    old_agent = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='+', verbose_name="Ancien agent"
+    )
+    new_agent = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='+', verbose_name="Nouvel agent"
+    )
+    created_at = models.DateTimeField(verbose_name="Date")
+
+    class Meta:
+        verbose_name = "Événement de ticket"
+        verbose_name_plural = "Événements de tickets"
+
+    def __str__(self):
+        return f"Ticket {self.ticket_id} : {self.old_status} → {self.new_status}"
+
+
+class SlaSnapshot(models.Model):
+    """
+    État des délais de traitement (voir sla.py) après lecture du journal des
+    événements jusqu'à ``checkpoint``. Seuls les derniers sont gardés.
+    """
+    checkpoint = models.BigIntegerField(verbose_name="Dernier événement lu")
+    state = models.JSONField(verbose_name="État")
+    # Recalculé depuis tout le journal (commande rebuild_sla) : repris par les processus en cours
+    rebuilt = models.BooleanField(default=False, verbose_name="Recalcul complet")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Instantané des délais"
+        verbose_name_plural = "Instantanés des délais"
+
+
+class TicketImport(models.Model):
+    """
+    Point de reprise d'un import (commande import_tickets), mis à jour dans la
+    transaction de chaque lot écrit.
+    """
+    source = models.CharField(max_length=255, unique=True, verbose_name="Source")
+    line = models.PositiveIntegerField(default=0, verbose_name="Dernière ligne traitée")
+    imported = models.PositiveIntegerField(default=0, verbose_name="Tickets importés")
+    rejected = models.PositiveIntegerField(default=0, verbose_name="Lignes refusées")
+    duplicates = models.PositiveIntegerField(default=0, verbose_name="Déjà importées")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    class Meta:
+        verbose_name = "Import de tickets"
+        verbose_name_plural = "Imports de tickets"
 
     def __str__(self):
-        return f"Ticket {self.id}: {self.subject} ({self.get_status_display()})"
\ No newline at end of file
+        return f"{self.source} (ligne {self.line})"
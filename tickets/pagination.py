@@ -0,0 +1,126 @@
+"""
+Pagination des grandes listes de tickets :
+- comptage estimé par le planificateur PostgreSQL au-delà d'un seuil ;
+- navigation par curseur (keyset) sur (submission_date, id), dont le coût ne
+  dépend pas de la profondeur de la page, contrairement à OFFSET.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+KEYSET_ORDERING = ('-submission_date', '-pk')
+
+
+def estimate_count(queryset):
+    """
+    Nombre de lignes estimé par le planificateur, sans parcourir la table.
+    Renvoie None si la base ne sait pas estimer (SQLite).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Au-delà de TICKET_ESTIMATED_COUNT_THRESHOLD lignes estimées, le total
+    affiché est l'estimation plutôt qu'un COUNT(*) exact.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is not None and estimate > settings.TICKET_ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
+
+
+def encode_cursor(ticket):
+    raw = f'{ticket.submission_date.isoformat()}|{ticket.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        date, pk = raw.rsplit('|', 1)
+        submission_date = parse_datetime(date)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Curseur invalide : {value!r}")
+    if submission_date is None:
+        raise ValueError(f"Curseur invalide : {value!r}")
+    return submission_date, pk
+
+
+def after_cursor(queryset, cursor):
+    """Lignes situées après ``cursor`` dans l'ordre (-submission_date, -id)."""
+    submission_date, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(submission_date__lt=submission_date) | Q(submission_date=submission_date, pk__lt=pk)
+    )
+
+
+class TicketKeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = after_cursor(queryset, cursor)
+            except ValueError as exc:
+                raise ValidationError({self.cursor_query_param: [str(exc)]})
+
+        # Une ligne de plus pour savoir s'il existe une page suivante, sans COUNT(*).
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
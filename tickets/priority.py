@@ -0,0 +1,225 @@
+"""
+Classification de la priorité des tickets par mots-clés.
+
+Les tables de règles sont compilées une seule fois en une expression régulière
+unique (un trie par niveau de priorité), de sorte qu'un ticket est classé en un
+seul passage sur son texte, quel que soit le nombre de règles.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Niveaux du plus grave au moins grave : le premier niveau trouvé l'emporte.
+DEFAULT_RULES = {
+    'critique': [
+        'erreur serveur', 'site inaccessible', 'impossible de se connecter',
+        'page blanche', 'plantage', 'panne', 'données perdues', 'piratage',
+        'fuite de données', 'problème de sécurité', 'transaction échouée',
+        'paiement non reçu', 'compte bloqué', 'urgent', 'bloqué', 'crash',
+        'downtime', 'plus rien ne fonctionne', 'non fonctionnel', 'brisé', 'cassé'
+    ],
+    'moyenne': [
+        'lent', 'lenteur', 'fonctionne mal', 'bug mineur', 'erreur d’affichage',
+        'incohérence', 'mauvais alignement', 'champ manquant', 'bouton ne répond pas',
+        'pas à jour', 'problème d’interface', 'traduction incorrecte', 'police illisible',
+        'message d’erreur', 'navigabilité difficile', 'formulaire incomplet',
+        'déconnexion aléatoire', 'image non chargée'
+    ],
+}
+
+DEFAULT_PRIORITY = 'basse'
+
+PriorityMatch = namedtuple('PriorityMatch', ['priority', 'keyword', 'field'])
+
+_APOSTROPHES = str.maketrans({'’': "'", '‘': "'", 'ʼ': "'", '`': "'", '´': "'"})
+
+
+def normalize(text):
+    """Minuscules, sans accents, apostrophes unifiées."""
+    text = unicodedata.normalize('NFKD', (text or '').translate(_APOSTROPHES))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return text.casefold()
+
+
+def _trie_pattern(phrases):
+    # Factorise les préfixes communs : le coût d'un essai à une position donnée
+    # dépend de la longueur du texte qui correspond, pas du nombre de règles.
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        is_end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if is_end:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class PriorityClassifier:
+    def __init__(self, rules=None, default=DEFAULT_PRIORITY):
+        rules = DEFAULT_RULES if rules is None else rules
+        self.default = default
+        self.levels = list(rules)
+        # Mot-clé normalisé -> mot-clé tel qu'écrit dans la table, pour l'audit.
+        self.keywords = []
+        groups = []
+        for level in self.levels:
+            originals = {}
+            for keyword in rules[level]:
+                normalized = normalize(keyword).strip()
+                if normalized:
+                    originals.setdefault(normalized, keyword)
+            self.keywords.append(originals)
+            if originals:
+                groups.append('(' + _trie_pattern(originals) + ')')
+            else:
+                groups.append('(?!)')
+        # Assertion avant : chaque position du texte est testée, donc une règle
+        # grave n'est jamais masquée par une règle moins grave qui la chevauche.
+        self.regex = re.compile('(?=' + '|'.join(groups) + ')') if groups else None
+
+    @property
+    def rule_count(self):
+        return sum(len(keywords) for keywords in self.keywords)
+
+    def _scan(self, text):
+        """Renvoie (indice du niveau, mot-clé normalisé) le plus grave trouvé."""
+        best = None
+        for match in self.regex.finditer(text):
+            level_index = match.lastindex - 1
+            if level_index == 0:
+                return level_index, match.group(match.lastindex)
+            if best is None or level_index < best[0]:
+                best = (level_index, match.group(match.lastindex))
+        return best
+
+    def classify(self, subject, message=None):
+        if self.regex is None:
+            return PriorityMatch(self.default, None, None)
+
+        best = None
+        for field, text in (('subject', subject), ('message', message)):
+            if text is None:
+                continue
+            found = self._scan(normalize(text))
+            if found and (best is None or found[0] < best[0]):
+                best = (found[0], found[1], field)
+            if best and best[0] == 0:
+                break
+
+        if best is None:
+            return PriorityMatch(self.default, None, None)
+        level_index, keyword, field = best
+        return PriorityMatch(self.levels[level_index], self.keywords[level_index][keyword], field)
+
+
+def load_rules(path):
+    with open(path, encoding='utf-8') as rules_file:
+        rules = json.load(rules_file)
+    if not isinstance(rules, dict) or not all(isinstance(v, list) for v in rules.values()):
+        raise ValueError(f"{path} : format attendu {{\"niveau\": [\"mot-clé\", ...]}}")
+    return rules
+
+
+class _ClassifierCache:
+    """
+    Classifieur partagé par le processus. Si TICKET_PRIORITY_RULES_FILE est
+    défini, le fichier est relu dès que sa date de modification change
+    (vérifiée au plus toutes les TICKET_PRIORITY_RULES_CHECK_INTERVAL secondes).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classifier = None
+        self._path = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def get(self):
+        path = getattr(settings, 'TICKET_PRIORITY_RULES_FILE', None) or None
+        classifier = self._classifier
+        if classifier is not None and path == self._path:
+            if path is None:
+                return classifier
+            interval = getattr(settings, 'TICKET_PRIORITY_RULES_CHECK_INTERVAL', 5)
+            if time.monotonic() - self._checked_at < interval:
+                return classifier
+        return self._refresh(path)
+
+    def _refresh(self, path):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if path is None:
+                if self._classifier is None or self._path is not None:
+                    self._classifier = PriorityClassifier()
+                    self._path, self._mtime = None, None
+                return self._classifier
+
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                logger.exception("Fichier de règles de priorité illisible : %s", path)
+                mtime = None
+            if self._classifier is not None and path == self._path and mtime == self._mtime:
+                return self._classifier
+
+            try:
+                classifier = PriorityClassifier(load_rules(path))
+            except (OSError, ValueError):
+                logger.exception("Règles de priorité invalides dans %s, règles précédentes conservées.", path)
+                if self._classifier is None:
+                    self._classifier = PriorityClassifier()
+                return self._classifier
+
+            logger.info("Règles de priorité chargées depuis %s (%d règles).", path, classifier.rule_count)
+            self._classifier, self._path, self._mtime = classifier, path, mtime
+            return classifier
+
+    def reload(self):
+        with self._lock:
+            self._classifier = None
+            self._path, self._mtime = None, None
+        return self.get()
+
+
+_cache = _ClassifierCache()
+
+
+def get_classifier():
+    return _cache.get()
+
+
+def reload_rules():
+    return _cache.reload()
+
+
+def classify(subject, message=None):
+    """
+    Classe un ticket. Le message n'est analysé que si
+    TICKET_PRIORITY_SCAN_MESSAGE est activé.
+    """
+    if not getattr(settings, 'TICKET_PRIORITY_SCAN_MESSAGE', False):
+        message = None
+    result = get_classifier().classify(subject, message)
+    if result.keyword is not None:
+        logger.debug("Priorité %s : mot-clé %r trouvé dans %s.", result.priority, result.keyword, result.field)
+    return result
@@ -0,0 +1,234 @@
+"""
+Attribution automatique des tickets nouveaux aux agents les moins chargés.
+
+La charge d'un agent est le nombre de ses tickets « en cours de traitement ».
+Les agents sont les comptes actifs de l'équipe (is_staff), limités à certaines
+plateformes s'ils figurent dans TICKET_AGENT_SKILLS. Les charges sont lues en
+une requête, puis tenues en mémoire dans un tas par plateforme : chaque ticket
+va à l'agent le moins chargé qui traite sa plateforme (le plus anciennement
+servi à charge égale), les critiques d'abord, sans dépasser
+TICKET_SCHEDULER_MAX_LOAD. La file n'est lue que pour les plateformes qu'un
+agent non plein peut servir. Les charges sont relues toutes les
+TICKET_SCHEDULER_REFRESH secondes (tickets clos ou pris à la main entre-temps)
+et seuls les agents dont la charge a changé sont remis dans les tas.
+
+Un lot est écrit avec un UPDATE conditionnel par agent : un ticket pris entre-
+temps par un agent (claims.claim_next) n'est pas réattribué. Deux façons de
+tourner : la commande assign_tickets (en continu), et/ou à l'enregistrement
+des tickets si TICKET_AUTO_ASSIGN est activé.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from . import status_cache
+from .claims import CLAIMABLE, CLAIMED_STATUS
+from .models import Ticket
+
+logger = logging.getLogger(__name__)
+
+# Ordre de traitement de la file
+PRIORITIES = ('critique', 'moyenne', 'basse')
+
+AssignResult = namedtuple('AssignResult', 'assigned skipped')
+
+
+class AgentLoads:
+    """
+    Charges des agents, et pour chaque plateforme un tas (charge, ordre, agent)
+    des agents qui la traitent. Une entrée dont la charge n'est plus celle de
+    l'agent est périmée : elle est jetée quand elle arrive en tête du tas.
+    """
+
+    def __init__(self, max_load=0):
+        self.max_load = max_load
+        self.loads = {}
+        self.skills = {}
+        self._heaps = {}
+        self._order = itertools.count()
+
+    def update(self, loads, skills=None):
+        """
+        Met à jour les charges ``loads`` {agent: charge} ; un agent absent de
+        ``loads`` n'est plus servi. ``skills`` {agent: plateformes}, un agent
+        absent traitant toutes les plateformes.
+        """
+        skills = skills or {}
+        if skills != self.skills:
+            self.skills = skills
+            self._heaps.clear()
+        for agent_id in set(self.loads) - set(loads):
+            del self.loads[agent_id]
+        for agent_id, load in loads.items():
+            if self.loads.get(agent_id) != load:
+                self.loads[agent_id] = load
+                self._push(agent_id)
+
+    def pick(self, platform):
+        """Agent le moins chargé qui traite ``platform``, ou None s'ils sont tous pleins."""
+        heap = self._heap(platform)
+        while heap:
+            load, _, agent_id = heap[0]
+            if self.loads.get(agent_id) != load:
+                heapq.heappop(heap)
+                continue
+            if self.max_load and load >= self.max_load:
+                return None
+            return agent_id
+        return None
+
+    def add(self, agent_id, count=1):
+        if agent_id in self.loads:
+            self.loads[agent_id] += count
+            self._push(agent_id)
+
+    def open_platforms(self):
+        """Plateformes qu'un agent non plein peut encore servir ; None : toutes."""
+        platforms = set()
+        for agent_id, load in self.loads.items():
+            if self.max_load and load >= self.max_load:
+                continue
+            handled = self.skills.get(agent_id)
+            if handled is None:
+                return None
+            platforms |= handled
+        return platforms
+
+    def handles(self, agent_id, platform):
+        platforms = self.skills.get(agent_id)
+        return platforms is None or platform in platforms
+
+    def _heap(self, platform):
+        heap = self._heaps.get(platform)
+        # Reconstruit quand les entrées périmées dominent
+        if heap is None or len(heap) > 4 * len(self.loads) + 64:
+            heap = [
+                (load, next(self._order), agent_id)
+                for agent_id, load in self.loads.items() if self.handles(agent_id, platform)
+            ]
+            heapq.heapify(heap)
+            self._heaps[platform] = heap
+        return heap
+
+    def _push(self, agent_id):
+        entry = (self.loads[agent_id], next(self._order), agent_id)
+        for platform, heap in self._heaps.items():
+            if self.handles(agent_id, platform):
+                heapq.heappush(heap, entry)
+
+
+class Scheduler:
+    def __init__(self, batch_size=None, max_load=None, refresh_interval=None):
+        self.batch_size = batch_size or settings.TICKET_SCHEDULER_BATCH_SIZE
+        self.refresh_interval = settings.TICKET_SCHEDULER_REFRESH if refresh_interval is None else refresh_interval
+        self.loads = AgentLoads(settings.TICKET_SCHEDULER_MAX_LOAD if max_load is None else max_load)
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Relit en une requête les agents actifs et leur charge."""
+        agents = get_user_model().objects.filter(is_active=True, is_staff=True).annotate(
+            load=Count('assigned_tickets', filter=Q(assigned_tickets__status=CLAIMED_STATUS))
+        ).values_list('pk', 'username', 'load')
+        loads, skills = {}, {}
+        for agent_id, username, load in agents:
+            loads[agent_id] = load
+            if username in settings.TICKET_AGENT_SKILLS:
+                skills[agent_id] = frozenset(settings.TICKET_AGENT_SKILLS[username])
+        self.loads.update(loads, skills)
+        self._refreshed_at = time.monotonic()
+
+    def run_once(self, limit=None):
+        """Attribue un lot de la file des tickets nouveaux non assignés."""
+        limit = limit or self.batch_size
+        with self._lock:
+            self._refresh_if_due()
+            queue = Ticket.objects.filter(**CLAIMABLE)
+            # Sans agent libre pour une plateforme, ses tickets ne sont pas lus :
+            # en tête de file, ils occuperaient chaque lot et bloqueraient les autres
+            platforms = self.loads.open_platforms()
+            if platforms is not None:
+                if not platforms:
+                    return AssignResult(0, 0)
+                queue = queue.filter(platform_name__in=platforms)
+            queued = []
+            # Une requête par priorité, sur l'index des tickets non assignés,
+            # plutôt qu'un tri de toute la file par rang de priorité
+            for priority in PRIORITIES:
+                if len(queued) >= limit:
+                    break
+                queued += queue.filter(priority=priority).order_by(
+                    'submission_date', 'pk'
+                ).values_list('pk', 'platform_name')[:limit - len(queued)]
+            return self._assign(queued)
+
+    def assign_tickets(self, tickets):
+        """Attribue les tickets ``tickets`` qui viennent d'être enregistrés."""
+        rank = {priority: index for index, priority in enumerate(PRIORITIES)}
+        tickets = sorted(tickets, key=lambda t: (rank.get(t.priority, len(PRIORITIES)), t.submission_date, t.pk))
+        with self._lock:
+            self._refresh_if_due()
+            return self._assign([(ticket.pk, ticket.platform_name) for ticket in tickets])
+
+    def _refresh_if_due(self):
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+
+    def _assign(self, queued):
+        plan = {}
+        for pk, platform in queued:
+            agent_id = self.loads.pick(platform)
+            if agent_id is not None:
+                plan.setdefault(agent_id, []).append(pk)
+                self.loads.add(agent_id)
+        assigned = 0
+        with transaction.atomic():
+            for agent_id, pks in plan.items():
+                updated = Ticket.objects.filter(pk__in=pks, **CLAIMABLE).update(
+                    status=CLAIMED_STATUS, agent_id=agent_id, version=F('version') + 1
+                )
+                if updated < len(pks):
+                    # Tickets pris par ailleurs entre la lecture et l'UPDATE
+                    self.loads.add(agent_id, updated - len(pks))
+                assigned += updated
+            if assigned:
+                status_cache.invalidate()
+        return AssignResult(assigned, len(queued) - assigned)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def schedule(tickets):
+    """
+    Avec TICKET_AUTO_ASSIGN, attribue ``tickets`` (juste créés) après validation
+    de la transaction en cours. Un échec laisse les tickets à la commande
+    assign_tickets.
+    """
+    if not settings.TICKET_AUTO_ASSIGN or not tickets:
+        return
+
+    def run():
+        try:
+            get_scheduler().assign_tickets(tickets)
+        except Exception:
+            logger.exception("Échec de l'attribution automatique de %d ticket(s).", len(tickets))
+
+    transaction.on_commit(run)
@@ -0,0 +1,267 @@
+"""
+Recherche plein texte des tickets.
+
+Le document de recherche est maintenu par la base elle-même (triggers), ce qui
+couvre aussi les insertions par lots (bulk_create) et les UPDATE ensemblistes :
+- PostgreSQL : colonne tsvector ``search_document`` + index GIN, configuration
+  ``fr_unaccent`` (racinisation française, sans accents) ;
+- SQLite : table virtuelle FTS5 ``tickets_ticket_fts`` (sans racinisation),
+  utilisée pour le développement et les tests.
+
+Un message long n'a que son début dans la table des tickets (message_store.py) :
+son texte complet est indexé par message_store.store() avec index_messages().
+Les triggers le gardent tant que le message ne change pas (PostgreSQL : partie
+de poids C de l'ancien document ; SQLite : texte gardé dans
+``tickets_ticket_fts_message``, et table FTS5 sans contenu).
+"""
+import re
+
+from django.core.validators import validate_email
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+TABLE = 'tickets_ticket'
+FTS_TABLE = 'tickets_ticket_fts'
+FTS_MESSAGE_TABLE = 'tickets_ticket_fts_message'
+SEARCH_CONFIG = 'fr_unaccent'
+FTS_COLUMNS = ('subject', 'first_name', 'last_name', 'email', 'message')
+# Poids bm25 par colonne FTS5, dans l'ordre de FTS_COLUMNS
+FTS_WEIGHTS = (10.0, 3.0, 3.0, 3.0, 1.0)
+
+# Taille des paquets de index_messages (variables d'une requête SQLite)
+INDEX_BATCH_SIZE = 500
+
+
+def _postgres_document(row, message):
+    return (
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({row}subject, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', concat_ws(' ', {row}first_name, {row}last_name, {row}email)), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', {message}), 'C')"
+    )
+
+
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = french);
+            ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+        END IF;
+    END
+    $$
+    """,
+    f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_document tsvector",
+    f"""
+    CREATE OR REPLACE FUNCTION {TABLE}_search_document() RETURNS trigger AS $$
+    BEGIN
+        -- Message inchangé : la partie de poids C de l'ancien document est gardée,
+        -- avec le texte complet d'un message long indexé par index_messages()
+        IF TG_OP = 'UPDATE' AND OLD.search_document IS NOT NULL
+                AND NEW.message IS NOT DISTINCT FROM OLD.message THEN
+            NEW.search_document :=
+                setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.subject, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}', concat_ws(' ', NEW.first_name, NEW.last_name, NEW.email)), 'B') ||
+                ts_filter(OLD.search_document, '{{c}}');
+        ELSE
+            NEW.search_document := {_postgres_document('NEW.', "coalesce(NEW.message, '')")};
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"DROP TRIGGER IF EXISTS {TABLE}_search_document_trg ON {TABLE}",
+    f"""
+    CREATE TRIGGER {TABLE}_search_document_trg
+        BEFORE INSERT OR UPDATE OF subject, first_name, last_name, email, message ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {TABLE}_search_document()
+    """,
+    # Rattrapage des lignes existantes : déclenche le trigger
+    f"UPDATE {TABLE} SET subject = subject WHERE search_document IS NULL",
+    f"CREATE INDEX IF NOT EXISTS {TABLE}_search_gin ON {TABLE} USING GIN (search_document)",
+]
+
+POSTGRES_DROP = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_search_document_trg ON {TABLE}",
+    f"DROP FUNCTION IF EXISTS {TABLE}_search_document()",
+    f"DROP INDEX IF EXISTS {TABLE}_search_gin",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_document",
+]
+
+POSTGRES_INDEX_MESSAGE = (
+    f"UPDATE {TABLE} SET search_document = {_postgres_document('', '%s')} WHERE id = %s"
+)
+
+
+def _sqlite_values(row):
+    # Message indexé : texte complet d'un message long, s'il est connu
+    message = f"coalesce((SELECT message FROM {FTS_MESSAGE_TABLE} WHERE id = {row}.id), {row}.message)"
+    return ', '.join(message if column == 'message' else f'{row}.{column}' for column in FTS_COLUMNS)
+
+
+_columns = ', '.join(FTS_COLUMNS)
+_new_values = _sqlite_values('new')
+_old_values = _sqlite_values('old')
+
+SQLITE_TABLES = [
+    f"CREATE TABLE IF NOT EXISTS {FTS_MESSAGE_TABLE} (id INTEGER PRIMARY KEY, message TEXT NOT NULL)",
+    # Sans contenu : le texte indexé n'est pas toujours celui de la table des tickets
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='', tokenize='unicode61 remove_diacritics 2')",
+]
+
+SQLITE_REBUILD = [
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) SELECT id, {_sqlite_values(TABLE)} FROM {TABLE}",
+]
+
+# Django reconstruit les tables SQLite lors de certaines migrations, ce qui
+# supprime les triggers : ils sont recréés après chaque migrate (apps.py).
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+            DELETE FROM {FTS_MESSAGE_TABLE} WHERE id = old.id;
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+            -- Nouveau message : le texte complet de l'ancien n'est plus indexé
+            DELETE FROM {FTS_MESSAGE_TABLE} WHERE id = new.id AND new.message IS NOT old.message;
+            INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+}
+
+
+def install_search_schema(connection):
+    """Crée ou répare le document de recherche. Idempotent."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            for statement in SQLITE_TABLES:
+                cursor.execute(statement)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [TABLE])
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                for statement in SQLITE_REBUILD:
+                    cursor.execute(statement)
+
+
+def uninstall_search_schema(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_DROP:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_MESSAGE_TABLE}")
+
+
+def index_messages(connection, messages):
+    """
+    Indexe le texte complet des messages longs ``messages`` {id du ticket:
+    message}, à la place du seul début gardé dans la table des tickets.
+    """
+    items = list(messages.items())
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(POSTGRES_INDEX_MESSAGE, [(message, pk) for pk, message in items])
+        elif connection.vendor == 'sqlite':
+            for start in range(0, len(items), INDEX_BATCH_SIZE):
+                batch = items[start:start + INDEX_BATCH_SIZE]
+                ids = ', '.join('%s' for _ in batch)
+                pks = [pk for pk, _ in batch]
+                # Ligne FTS retirée avec les valeurs indexées jusqu'ici, puis
+                # remise avec le nouveau texte
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) "
+                    f"SELECT 'delete', id, {_sqlite_values(TABLE)} FROM {TABLE} WHERE id IN ({ids})", pks,
+                )
+                cursor.executemany(
+                    f"INSERT INTO {FTS_MESSAGE_TABLE}(id, message) VALUES (%s, %s) "
+                    f"ON CONFLICT(id) DO UPDATE SET message = excluded.message", batch,
+                )
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) "
+                    f"SELECT id, {_sqlite_values(TABLE)} FROM {TABLE} WHERE id IN ({ids})", pks,
+                )
+
+
+def is_email(term):
+    if '@' not in term or ' ' in term:
+        return False
+    try:
+        validate_email(term)
+    except ValidationError:
+        return False
+    return True
+
+
+def fts5_query(term):
+    """Chaque mot devient un préfixe entre guillemets ; tous doivent être présents."""
+    words = re.findall(r'\w+', term)
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def is_supported(queryset):
+    return connections[queryset.db].vendor in ('postgresql', 'sqlite')
+
+
+def search(queryset, term):
+    """
+    Filtre ``queryset`` sur ``term`` et l'annote de ``search_rank`` (plus grand
+    = plus pertinent). Une adresse email complète passe par une égalité
+    insensible à la casse, servie par l'index sur UPPER(email).
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+    if is_email(term):
+        return queryset.filter(email__iexact=term).annotate(
+            search_rank=RawSQL('1.0', [], output_field=FloatField())
+        )
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(
+            RawSQL(f"{TABLE}.search_document @@ {query}", [term], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank_cd({TABLE}.search_document, {query})", [term], output_field=FloatField())
+        )
+
+    if vendor == 'sqlite':
+        match = fts5_query(term)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            # bm25 est négatif : plus petit = plus pertinent
+            search_rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)",
+                [match], output_field=FloatField()
+            )
+        )
+
+    raise NotImplementedError(f"Recherche plein texte non disponible pour {vendor}.")
@@ -1,35 +1,70 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Ticket
+from .clustering import assign_clusters
+from .priority import classify
+from .scheduler import schedule
+from projet.metrics import phase
 
 class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
-        fields = ['first_name', 'last_name', 'email', 'subject', 'message', 'platform_name']
+        fields = ['id', 'first_name', 'last_name', 'email', 'subject', 'message', 'platform_name']
+        read_only_fields = ['id']
+
+    def validate_message(self, value):
+        max_length = settings.TICKET_MESSAGE_MAX_LENGTH
+        if len(value) > max_length:
+            raise serializers.ValidationError(f"Message trop long : {len(value)} caractères (maximum {max_length}).")
+        return value
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.message_truncated:
+            data['message'] = instance.full_message
+        return data
 
     def create(self, validated_data):
-        subject = validated_data.get('subject', '').lower()
-        priority = 'basse'
-
-        critical_keywords = [
-            'erreur serveur', 'site inaccessible', 'impossible de se connecter',
-            'page blanche', 'plantage', 'panne', 'données perdues', 'piratage',
-            'fuite de données', 'problème de sécurité', 'transaction échouée',
-            'paiement non reçu', 'compte bloqué', 'urgent', 'bloqué', 'crash',
-            'downtime', 'plus rien ne fonctionne', 'non fonctionnel', 'brisé', 'cassé'
-        ]
+        # Priorité fournie (import d'un historique) ou classée par mots-clés
+        priority = validated_data.pop('priority', None)
+        if priority is None:
+            with phase('classifier'):
+                priority = classify(validated_data.get('subject', ''), validated_data.get('message')).priority
+        ticket = Ticket(priority=priority, **validated_data)
+        with phase('clustering'):
+            assigner = assign_clusters([ticket])
+        with phase('insert'):
+            ticket.save(force_insert=True)
+            assigner.finish()
+        schedule([ticket])
+        return ticket
 
-        medium_keywords = [
-            'lent', 'lenteur', 'fonctionne mal', 'bug mineur', 'erreur d’affichage',
-            'incohérence', 'mauvais alignement', 'champ manquant', 'bouton ne répond pas',
-            'pas à jour', 'problème d’interface', 'traduction incorrecte', 'police illisible',
-            'message d’erreur', 'navigabilité difficile', 'formulaire incomplet',
-            'déconnexion aléatoire', 'image non chargée'
-        ]
 
-        if any(keyword in subject for keyword in critical_keywords):
-            priority = 'critique'
-        elif any(keyword in subject for keyword in medium_keywords):
-            priority = 'moyenne'
+class TicketImportSerializer(TicketSerializer):
+    """
+    Ligne d'un import (commande import_tickets) : mêmes règles que l'API, plus
+    les colonnes d'un historique. Sans priorité, elle est classée d'après les
+    mots-clés ; ingest_reference n'est pas vérifié ici (une requête par ligne).
+    L'import valide les lignes avec run_validation et les écrit par lots.
+    """
+    submission_date = serializers.DateTimeField(required=False)
+    status = serializers.ChoiceField(choices=Ticket.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Ticket.PRIORITY_CHOICES, required=False)
+    ingest_reference = serializers.UUIDField(required=False)
+
+    class Meta(TicketSerializer.Meta):
+        fields = TicketSerializer.Meta.fields + ['submission_date', 'status', 'priority', 'ingest_reference']
 
-        ticket = Ticket.objects.create(priority=priority, **validated_data)
-        return ticket
\ No newline at end of file
+
+class TicketReadSerializer(serializers.ModelSerializer):
+    agent = serializers.StringRelatedField()
+    # Message complet : charger d'abord les messages longs d'une liste avec message_store.load_many
+    message = serializers.CharField(source='full_message', read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = [
+            'id', 'first_name', 'last_name', 'email', 'subject', 'message', 'platform_name',
+            'status', 'priority', 'agent', 'submission_date'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,346 @@
+"""
+Délais de traitement des tickets (SLA) : prise en charge et résolution.
+
+Ils sont tirés du journal des événements (events.py) et tenus en mémoire dans
+des esquisses de quantiles DDSketch, une par (plateforme, priorité, délai) :
+p50/p90/p99 à 1 % près en quelques kilo-octets, fusionnables pour les totaux
+toutes plateformes. Le suivi ne lit que les événements arrivés depuis son
+dernier passage ; son état est enregistré régulièrement (SlaSnapshot) pour
+que les autres processus et les redémarrages repartent de là. La commande
+rebuild_sla le recalcule depuis tout le journal.
+
+- prise en charge : le ticket quitte « nouveau » (pris, ou ignoré) ;
+- résolution : passage à un statut clos, depuis la soumission.
+Les délais au-delà des objectifs TICKET_SLA_TARGETS sont comptés, et les
+derniers gardés en liste.
+
+Les identifiants d'événements sont attribués avant la validation des
+transactions : un événement plus ancien peut apparaître après un plus récent.
+Le suivi garde donc les identifiants lus après un trou, et n'abandonne le
+trou qu'après TICKET_SLA_SETTLE secondes (transaction annulée).
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import workflow
+from .models import SlaSnapshot, Ticket, TicketEvent
+
+FIRST_RESPONSE = 'first_response'
+RESOLUTION = 'resolution'
+METRICS = {FIRST_RESPONSE: 'Prise en charge', RESOLUTION: 'Résolution'}
+QUANTILES = (0.5, 0.9, 0.99)
+CHUNK_SIZE = 5000
+SNAPSHOTS_KEPT = 3
+
+EVENT_FIELDS = ('pk', 'ticket_id', 'platform_name', 'priority', 'submission_date', 'old_status', 'new_status', 'created_at')
+
+
+class DDSketch:
+    """
+    Esquisse de quantiles à erreur relative bornée (Masson et al., VLDB 2019) :
+    chaque valeur compte dans la case ceil(log_gamma(valeur)). Deux esquisses
+    de même précision se fusionnent en additionnant leurs cases.
+    """
+    # Valeurs (secondes) comptées comme nulles
+    MIN_VALUE = 1e-3
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, count=1):
+        if value <= self.MIN_VALUE:
+            self.zero += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Esquisses de précisions différentes.")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def _collapse(self):
+        # Cases les plus basses réunies : les hauts quantiles gardent leur précision
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': sorted(self.bins.items()),
+            'zero': self.zero,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.bins = {index: count for index, count in data['bins']}
+        sketch.zero = data['zero']
+        sketch.count = data['count']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class SlaTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        # (plateforme, priorité, délai) -> esquisse / nombre de dépassements
+        self.sketches = {}
+        self.breaches = {}
+        self.recent_breaches = deque(maxlen=settings.TICKET_SLA_RECENT_BREACHES)
+        # Tous les événements jusqu'à checkpoint sont lus ; pending : ceux lus après un trou
+        self.checkpoint = 0
+        self.pending = {}
+        self.snapshot_id = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def report(self):
+        """Délais par plateforme et priorité, totaux fusionnés et derniers dépassements."""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            self.catch_up()
+            self._save_if_due()
+            rows = [self._row(key, sketch) for key, sketch in sorted(self.sketches.items())]
+            totals = {}
+            for (_, priority, metric), sketch in self.sketches.items():
+                total = totals.setdefault(('', priority, metric), DDSketch(sketch.relative_accuracy))
+                total.merge(sketch)
+            breaches = {}
+            for (_, priority, metric), count in self.breaches.items():
+                breaches[('', priority, metric)] = breaches.get(('', priority, metric), 0) + count
+            return {
+                'rows': rows,
+                'totals': [self._row(key, sketch, breaches) for key, sketch in sorted(totals.items())],
+                'recent_breaches': list(self.recent_breaches),
+                'checkpoint': self.checkpoint,
+            }
+
+    def _row(self, key, sketch, breaches=None):
+        platform_name, priority, metric = key
+        return {
+            'platform_name': platform_name,
+            'priority': priority,
+            'metric': metric,
+            'count': sketch.count,
+            'quantiles': [sketch.quantile(q) for q in QUANTILES],
+            'target': target(priority, metric),
+            'breaches': (self.breaches if breaches is None else breaches).get(key, 0),
+        }
+
+    def catch_up(self):
+        """Lit les événements arrivés depuis le dernier passage. Renvoie leur nombre."""
+        consumed = 0
+        cursor = self.checkpoint
+        while True:
+            rows = list(
+                TicketEvent.objects.filter(pk__gt=cursor).order_by('pk').values_list(*EVENT_FIELDS)[:CHUNK_SIZE]
+            )
+            for row in rows:
+                if row[0] not in self.pending:
+                    self.consume(row)
+                    consumed += 1
+            if len(rows) < CHUNK_SIZE:
+                break
+            cursor = rows[-1][0]
+        self._advance()
+        return consumed
+
+    def consume(self, row):
+        pk, ticket_id, platform_name, priority, submission_date, old_status, new_status, created_at = row
+        seconds = (created_at - submission_date).total_seconds()
+        if old_status == workflow.NEW and new_status != workflow.NEW:
+            self._record((platform_name, priority, FIRST_RESPONSE), seconds, ticket_id, created_at)
+        if new_status in workflow.CLOSED_STATUSES and old_status not in workflow.CLOSED_STATUSES:
+            self._record((platform_name, priority, RESOLUTION), seconds, ticket_id, created_at)
+        if pk == self.checkpoint + 1 and not self.pending:
+            self.checkpoint = pk
+        else:
+            self.pending[pk] = created_at.timestamp()
+        self._dirty = True
+
+    def _record(self, key, seconds, ticket_id, created_at):
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = DDSketch(settings.TICKET_SLA_RELATIVE_ACCURACY)
+        sketch.add(seconds)
+        limit = target(key[1], key[2])
+        if limit is not None and seconds > limit:
+            self.breaches[key] = self.breaches.get(key, 0) + 1
+            self.recent_breaches.appendleft({
+                'ticket_id': ticket_id, 'platform_name': key[0], 'priority': key[1], 'metric': key[2],
+                'seconds': seconds, 'at': created_at.isoformat(),
+            })
+
+    def _advance(self):
+        settled = time.time() - settings.TICKET_SLA_SETTLE
+        while self.pending:
+            while self.checkpoint + 1 in self.pending:
+                self.checkpoint += 1
+                del self.pending[self.checkpoint]
+            if not self.pending:
+                break
+            first = min(self.pending)
+            if self.pending[first] > settled:
+                break
+            # Trou plus ancien que TICKET_SLA_SETTLE : transaction annulée
+            self.checkpoint = first - 1
+
+    def load(self):
+        """Reprend le dernier état enregistré (sans en avoir : part de zéro)."""
+        self._reset()
+        snapshot = SlaSnapshot.objects.order_by('-pk').first()
+        if snapshot is not None:
+            self._restore(snapshot)
+        self._loaded = True
+
+    def _restore(self, snapshot):
+        state = snapshot.state
+        self.sketches = {tuple(key): DDSketch.from_dict(data) for *key, data in state['sketches']}
+        self.breaches = {tuple(key): count for *key, count in state['breaches']}
+        self.recent_breaches.extend(state['recent_breaches'])
+        self.pending = {int(pk): at for pk, at in state['pending'].items()}
+        self.checkpoint = snapshot.checkpoint
+        self.snapshot_id = snapshot.pk
+
+    def save(self, rebuilt=False):
+        state = {
+            'sketches': [[*key, sketch.to_dict()] for key, sketch in self.sketches.items()],
+            'breaches': [[*key, count] for key, count in self.breaches.items()],
+            'recent_breaches': list(self.recent_breaches),
+            'pending': {str(pk): at for pk, at in self.pending.items()},
+        }
+        snapshot = SlaSnapshot.objects.create(checkpoint=self.checkpoint, state=state, rebuilt=rebuilt)
+        SlaSnapshot.objects.filter(pk__lte=snapshot.pk - SNAPSHOTS_KEPT).delete()
+        self.snapshot_id = snapshot.pk
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        return snapshot
+
+    def _save_if_due(self):
+        if time.monotonic() - self._saved_at < settings.TICKET_SLA_SAVE_INTERVAL:
+            return
+        # Recalcul complet fait entre-temps par la commande rebuild_sla
+        rebuilt = SlaSnapshot.objects.filter(pk__gt=self.snapshot_id, rebuilt=True).order_by('-pk').first()
+        if rebuilt is not None:
+            self._reset()
+            self._restore(rebuilt)
+            self.catch_up()
+        if self._dirty:
+            self.save()
+        self._saved_at = time.monotonic()
+
+    def rebuild(self, progress=None):
+        """Recalcule tout depuis le journal et l'enregistre. Renvoie le nombre d'événements lus."""
+        with self._lock:
+            self._reset()
+            consumed = 0
+            for row in TicketEvent.objects.order_by('pk').values_list(*EVENT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+                self.consume(row)
+                consumed += 1
+                if progress is not None and consumed % CHUNK_SIZE == 0:
+                    progress(consumed)
+            self._advance()
+            self.save(rebuilt=True)
+            self._loaded = True
+            return consumed
+
+
+def target(priority, metric):
+    """Objectif en secondes, ou None."""
+    return settings.TICKET_SLA_TARGETS.get(priority, {}).get(metric)
+
+
+def overdue_tickets(limit=50):
+    """Tickets ouverts ayant déjà dépassé leur objectif de prise en charge ou de résolution."""
+    now = timezone.now()
+    condition = Q()
+    for priority, targets in settings.TICKET_SLA_TARGETS.items():
+        if FIRST_RESPONSE in targets:
+            condition |= Q(
+                priority=priority, status=workflow.NEW,
+                submission_date__lt=now - timedelta(seconds=targets[FIRST_RESPONSE]),
+            )
+        if RESOLUTION in targets:
+            condition |= Q(
+                priority=priority, status__in=[workflow.NEW, workflow.IN_PROGRESS],
+                submission_date__lt=now - timedelta(seconds=targets[RESOLUTION]),
+            )
+    if not condition:
+        return Ticket.objects.none()
+    return Ticket.objects.filter(condition).select_related('agent').defer('message').order_by('submission_date')[:limit]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '—'
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min"
+    if seconds < 86400:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d}"
+    return f"{seconds // 86400} j {seconds % 86400 // 3600} h"
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = SlaTracker()
+        return _tracker
@@ -0,0 +1,271 @@
+"""
+Statistiques des tickets tenues à jour au fil de l'eau.
+
+La table ``tickets_ticketstat`` compte les tickets par (jour de soumission,
+plateforme, statut, priorité), et ``tickets_ticketstattotal`` les mêmes
+comptes toutes dates confondues. Comme pour la recherche, ce sont des triggers
+qui la maintiennent : les insertions par lots, les UPDATE ensemblistes
+(actions de l'admin, prise de tickets) et les suppressions sont couverts
+sans passer par save(). Les tickets archivés restent comptés : la table
+d'archives porte les mêmes triggers, l'archivage ne change donc rien aux
+statistiques.
+- PostgreSQL : triggers par instruction avec tables de transition, un seul
+  INSERT ... ON CONFLICT agrégé par instruction ;
+- SQLite : triggers par ligne.
+
+Le tableau de bord ne lit que cette table : son coût dépend du nombre de
+jours affichés, pas du nombre de tickets.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import workflow
+from .models import TicketStat, TicketStatTotal
+
+TABLE = 'tickets_ticket'
+ARCHIVE_TABLE = 'tickets_archivedticket'
+STAT_TABLE = 'tickets_ticketstat'
+TOTAL_TABLE = 'tickets_ticketstattotal'
+# Tables comptées -> préfixe des triggers
+SOURCES = {
+    TABLE: STAT_TABLE,
+    ARCHIVE_TABLE: f'{STAT_TABLE}_archive',
+}
+DIMENSIONS = 'platform_name, status, priority'
+# Table de statistiques -> colonnes de la case
+ROLLUPS = {
+    STAT_TABLE: f'day, {DIMENSIONS}',
+    TOTAL_TABLE: DIMENSIONS,
+}
+OPEN_STATUSES = (workflow.NEW, workflow.IN_PROGRESS)
+
+
+def _upsert(table, select):
+    bucket = ROLLUPS[table]
+    return (
+        f"INSERT INTO {table} ({bucket}, count) {select} "
+        f"ON CONFLICT ({bucket}) DO UPDATE SET count = {table}.count + excluded.count"
+    )
+
+
+def day_sql(connection, column):
+    """Jour local (TIME_ZONE) d'une date de soumission, en SQL."""
+    if connection.vendor == 'postgresql':
+        return f"({column} AT TIME ZONE '{settings.TIME_ZONE}')::date"
+    # SQLite stocke l'heure UTC : décalage du fuseau au moment de
+    # l'installation (les fuseaux avec heure d'été ne sont qu'approchés).
+    offset = ZoneInfo(settings.TIME_ZONE).utcoffset(datetime.now())
+    return f"date({column}, '{int(offset.total_seconds()):+d} seconds')"
+
+
+def _sources(connection):
+    """Tables comptées existant déjà (les migrations les créent l'une après l'autre)."""
+    existing = set(connection.introspection.table_names())
+    return [table for table in SOURCES if table in existing]
+
+
+def _postgres_schema(connection, table):
+    def rows(alias, sign):
+        return (
+            f"SELECT {day_sql(connection, f'{alias}.submission_date')} AS day, {alias}.platform_name, "
+            f"{alias}.status, {alias}.priority, {sign} AS delta"
+        )
+
+    def upserts(source):
+        # Tri par case : deux instructions simultanées verrouillent les
+        # lignes de statistiques dans le même ordre (pas d'interblocage).
+        return ';\n'.join(
+            _upsert(table, (
+                f"SELECT {bucket}, SUM(delta) FROM ({source}) AS changes "
+                f"GROUP BY {bucket} HAVING SUM(delta) <> 0 ORDER BY {bucket}"
+            ))
+            for table, bucket in ROLLUPS.items()
+        )
+
+    changed = (
+        "FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE "
+        "(o.submission_date, o.platform_name, o.status, o.priority) IS DISTINCT FROM "
+        "(n.submission_date, n.platform_name, n.status, n.priority)"
+    )
+    functions = {
+        'insert': ('NEW TABLE AS new_rows', upserts(f"{rows('n', 1)} FROM new_rows n")),
+        'delete': ('OLD TABLE AS old_rows', upserts(f"{rows('o', -1)} FROM old_rows o")),
+        'update': (
+            'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+            upserts(f"{rows('o', -1)} {changed} UNION ALL {rows('n', 1)} {changed}"),
+        ),
+    }
+    statements = []
+    for event, (referencing, body) in functions.items():
+        name = f'{SOURCES[table]}_{event}'
+        statements += [
+            f"""
+            CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+            BEGIN
+                {body};
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            f"DROP TRIGGER IF EXISTS {name}_trg ON {table}",
+            f"""
+            CREATE TRIGGER {name}_trg AFTER {event.upper()} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+            """,
+        ]
+    return statements
+
+
+def _sqlite_triggers(connection, table):
+    def upserts(alias, sign):
+        day = day_sql(connection, f'{alias}.submission_date')
+        dimensions = f'{alias}.platform_name, {alias}.status, {alias}.priority'
+        return (
+            f"{_upsert(STAT_TABLE, f'VALUES ({day}, {dimensions}, {sign})')}; "
+            f"{_upsert(TOTAL_TABLE, f'VALUES ({dimensions}, {sign})')};"
+        )
+
+    changed = (
+        "old.submission_date IS NOT new.submission_date OR old.platform_name IS NOT new.platform_name "
+        "OR old.status IS NOT new.status OR old.priority IS NOT new.priority"
+    )
+    prefix = SOURCES[table]
+    return {
+        f'{prefix}_ai': f"CREATE TRIGGER {prefix}_ai AFTER INSERT ON {table} BEGIN {upserts('new', 1)} END",
+        f'{prefix}_ad': f"CREATE TRIGGER {prefix}_ad AFTER DELETE ON {table} BEGIN {upserts('old', -1)} END",
+        f'{prefix}_au': (
+            f"CREATE TRIGGER {prefix}_au AFTER UPDATE OF submission_date, platform_name, status, priority "
+            f"ON {table} WHEN {changed} BEGIN {upserts('old', -1)} {upserts('new', 1)} END"
+        ),
+    }
+
+
+def install_stats_schema(connection):
+    """Crée ou répare les triggers de statistiques. Idempotent."""
+    sources = _sources(connection)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in sources:
+                for statement in _postgres_schema(connection, table):
+                    cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            triggers = {}
+            for table in sources:
+                triggers.update(_sqlite_triggers(connection, table))
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in triggers if name not in existing]
+            for name in missing:
+                cursor.execute(triggers[name])
+            if missing:
+                rebuild(connection)
+
+
+def uninstall_stats_schema(connection):
+    with connection.cursor() as cursor:
+        for table in _sources(connection):
+            if connection.vendor == 'postgresql':
+                for event in ('insert', 'delete', 'update'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {SOURCES[table]}_{event}_trg ON {table}")
+                    cursor.execute(f"DROP FUNCTION IF EXISTS {SOURCES[table]}_{event}()")
+            elif connection.vendor == 'sqlite':
+                for name in _sqlite_triggers(connection, table):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def _source_sql(connection, table):
+    columns = DIMENSIONS
+    if table == STAT_TABLE:
+        columns = f"{day_sql(connection, 'submission_date')} AS day, {DIMENSIONS}"
+    tickets = ' UNION ALL '.join(
+        f"SELECT submission_date, {DIMENSIONS} FROM {source}" for source in _sources(connection)
+    )
+    return f"SELECT {columns}, COUNT(*) FROM ({tickets}) AS tickets GROUP BY {ROLLUPS[table]}"
+
+
+def rebuild(connection):
+    """Recalcule les statistiques depuis les tickets (parcours complet)."""
+    rows = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for table, bucket in ROLLUPS.items():
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"INSERT INTO {table} ({bucket}, count) {_source_sql(connection, table)}")
+            rows += cursor.rowcount
+    return rows
+
+
+def verify(connection):
+    """
+    Compare les statistiques aux tickets. Renvoie la liste des écarts
+    (table, case, compte attendu, compte enregistré).
+    """
+    def bucket(table, row):
+        if table == STAT_TABLE and isinstance(row[0], str):
+            # SQLite renvoie les dates calculées sous forme de texte
+            row = (datetime.strptime(row[0], '%Y-%m-%d').date(),) + tuple(row[1:])
+        return tuple(row)
+
+    differences = []
+    with connection.cursor() as cursor:
+        for table, columns in ROLLUPS.items():
+            cursor.execute(_source_sql(connection, table))
+            expected = {bucket(table, row[:-1]): row[-1] for row in cursor.fetchall()}
+            cursor.execute(f"SELECT {columns}, count FROM {table} WHERE count <> 0")
+            recorded = {bucket(table, row[:-1]): row[-1] for row in cursor.fetchall()}
+            differences += [
+                (table, key, expected.get(key, 0), recorded.get(key, 0))
+                for key in sorted(expected.keys() | recorded.keys())
+                if expected.get(key, 0) != recorded.get(key, 0)
+            ]
+    return differences
+
+
+def dashboard(since=None, until=None):
+    """
+    Chiffres du tableau de bord, lus dans la table de statistiques seulement :
+    totaux par plateforme, statut et priorité et détail par jour sur la
+    période [since, until] (30 derniers jours par défaut), et stock de
+    tickets ouverts toutes dates confondues.
+    """
+    until = until or timezone.localdate()
+    since = since or until - timedelta(days=29)
+    stats = TicketStat.objects.using(router.db_for_read(TicketStat)).filter(count__gt=0).order_by()
+
+    totals = {'total': 0, 'by_platform': defaultdict(int), 'by_status': defaultdict(int), 'by_priority': defaultdict(int)}
+    days = {}
+    rows = stats.filter(day__range=(since, until)).values('day', 'platform_name', 'status', 'priority', 'count')
+    for row in rows:
+        count = row['count']
+        day = days.setdefault(row['day'], {'day': row['day'], 'total': 0, 'by_status': defaultdict(int)})
+        day['total'] += count
+        day['by_status'][row['status']] += count
+        totals['total'] += count
+        totals['by_platform'][row['platform_name']] += count
+        totals['by_status'][row['status']] += count
+        totals['by_priority'][row['priority']] += count
+
+    backlog = {'total': 0, 'by_platform': defaultdict(int), 'by_priority': defaultdict(int)}
+    rows = TicketStatTotal.objects.using(stats.db).filter(status__in=OPEN_STATUSES, count__gt=0).values(
+        'platform_name', 'priority', 'count'
+    )
+    for row in rows:
+        backlog['total'] += row['count']
+        backlog['by_platform'][row['platform_name']] += row['count']
+        backlog['by_priority'][row['priority']] += row['count']
+
+    def plain(counts):
+        return {key: dict(value) if isinstance(value, defaultdict) else value for key, value in counts.items()}
+
+    return {
+        'since': since,
+        'until': until,
+        'backlog': plain(backlog),
+        'totals': plain(totals),
+        'by_day': [plain(days[day]) for day in sorted(days)],
+    }
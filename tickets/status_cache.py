@@ -0,0 +1,101 @@
+"""
+Suivi des tickets par les plateformes : statut et priorité d'un lot de
+tickets (api/tickets/status/?ids=12,15,20), avec ETag et réponse 304.
+
+Chaque ticket lu est gardé dans un cache Django (TICKET_STATUS_CACHE) : une
+plateforme qui interroge souvent les mêmes tickets ne touche pas la base.
+Les écritures suppriment les entrées concernées après validation de la
+transaction (invalidate()) : celles du ticket quand on le connaît
+(Ticket.save, workflow.save_ticket, claim_next), toutes sinon, par un numéro
+de génération, pour les mises à jour en masse (workflow.transition,
+claims.assign). TICKET_STATUS_CACHE_TTL borne le retard d'une écriture qui
+échapperait à ces chemins (SQL brut, suppression dans l'admin), ou de tout
+changement si le cache n'est pas partagé par les workers.
+
+L'ETag d'une réponse dérive de la version de chaque ticket, incrémentée à
+chaque modification : tant qu'aucun ticket du lot ne change, elle reste la
+même et un If-None-Match renvoie 304.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'ticket-status:'
+GENERATION_KEY = KEY_PREFIX + 'generation'
+
+# version vaut None pour un ticket archivé (figé)
+TicketStatus = namedtuple('TicketStatus', ['platform_name', 'status', 'priority', 'version'])
+
+
+def _cache():
+    return caches[settings.TICKET_STATUS_CACHE]
+
+
+def lookup(pks):
+    """{id: TicketStatus} des tickets ``pks`` trouvés : cache, puis tickets, puis archives."""
+    from .models import ArchivedTicket, Ticket
+
+    cache = _cache()
+    keys = {f'{KEY_PREFIX}{pk}': pk for pk in pks}
+    cached = cache.get_many([*keys, GENERATION_KEY])
+    generation = cached.pop(GENERATION_KEY, 0)
+    found = {
+        keys[key]: TicketStatus(*entry[1:]) for key, entry in cached.items() if entry[0] == generation
+    }
+
+    missing = [pk for pk in pks if pk not in found]
+    if missing:
+        loaded = {
+            pk: TicketStatus(*row) for pk, *row in Ticket.objects.filter(pk__in=missing).order_by()
+            .values_list('pk', 'platform_name', 'status', 'priority', 'version')
+        }
+        archived = [pk for pk in missing if pk not in loaded]
+        if archived:
+            loaded.update(
+                (pk, TicketStatus(*row, None)) for pk, *row in ArchivedTicket.objects.filter(pk__in=archived)
+                .order_by().values_list('pk', 'platform_name', 'status', 'priority')
+            )
+        cache.set_many(
+            {f'{KEY_PREFIX}{pk}': (generation, *entry) for pk, entry in loaded.items()},
+            settings.TICKET_STATUS_CACHE_TTL,
+        )
+        found.update(loaded)
+    return found
+
+
+def etag(platform_name, pks, found):
+    """ETag du lot ``pks`` (triés) : version de chaque ticket de la plateforme."""
+    parts = [platform_name]
+    for pk in pks:
+        entry = found.get(pk)
+        if entry is None or entry.platform_name != platform_name:
+            parts.append(f'{pk}:-')
+        else:
+            parts.append(f'{pk}:{"archive" if entry.version is None else entry.version}')
+    return '"%s"' % hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+
+def invalidate(pks=None):
+    """
+    Oublie les tickets ``pks`` (tous si None) après validation de la
+    transaction en cours.
+    """
+    if pks is None:
+        transaction.on_commit(_next_generation)
+        return
+    keys = [f'{KEY_PREFIX}{pk}' for pk in pks]
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def _next_generation():
+    cache = _cache()
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Clé évincée entre-temps
+        cache.set(GENERATION_KEY, 1, None)
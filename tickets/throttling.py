@@ -0,0 +1,170 @@
+"""
+Limitation de débit par plateforme (seau à jetons).
+
+Chaque plateforme dispose d'un seau de ``burst`` jetons, rempli à
+``rate_per_minute`` jetons par minute ; une soumission consomme un jeton par
+ticket. Un lot plus grand que la rafale n'est accepté que sur un seau plein,
+qu'il met en négatif : les requêtes suivantes attendent que tout le lot soit
+remboursé. Les limites viennent de la clé API (ApiKey.rate_per_minute /
+burst), sinon de TICKET_THROTTLE_RATES, sinon des valeurs par défaut.
+
+Deux stockages :
+- ``memory`` : seaux du processus, mis à jour sans verrou (un tuple remplacé
+  en une affectation). Deux requêtes simultanées peuvent lire le même état :
+  le dépassement possible est borné par le nombre de threads du worker.
+- ``cache`` : seaux dans un cache Django partagé par les workers
+  (TICKET_THROTTLE_CACHE). Chaque mise à jour prend un verrou par plateforme
+  (cache.add), ce qui suppose un add atomique : Memcached, Redis, base de
+  données ; pas le cache fichier.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketStore:
+    """Seaux à jetons ; les sous-classes fournissent load(key) et save(key, state, rate_per_second, burst)."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    def consume(self, key, rate_per_minute, burst, cost=1):
+        """
+        Prend ``cost`` jetons dans le seau ``key``. Renvoie None si c'est
+        accordé, sinon le nombre de secondes à attendre.
+        """
+        rate_per_second = rate_per_minute / 60.0
+        # Au-delà de la rafale, un seau plein suffit ; le reste devient une dette
+        needed = min(cost, burst)
+        now = self.clock()
+        state = self.load(key)
+        if state is None:
+            tokens = float(burst)
+        else:
+            tokens, updated_at = state
+            tokens = min(float(burst), tokens + max(0.0, now - updated_at) * rate_per_second)
+
+        if tokens >= needed:
+            self.save(key, (tokens - cost, now), rate_per_second, burst)
+            return None
+        return (needed - tokens) / rate_per_second if rate_per_second > 0 else None
+
+
+class MemoryTokenBucketStore(TokenBucketStore):
+    def __init__(self, clock=time.time):
+        super().__init__(clock)
+        self._buckets = {}
+
+    def load(self, key):
+        return self._buckets.get(key)
+
+    def save(self, key, state, rate_per_second, burst):
+        # Affectation d'un tuple : atomique sous le GIL, sans verrou
+        self._buckets[key] = state
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class CacheTokenBucketStore(TokenBucketStore):
+    key_prefix = 'ticket-throttle:'
+    # Durée de vie d'un verrou abandonné, et attente maximale d'un verrou pris
+    lock_timeout = 2
+    lock_wait = 0.1
+
+    def __init__(self, alias='default', clock=time.time):
+        super().__init__(clock)
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consume(self, key, rate_per_minute, burst, cost=1):
+        lock_key = self.key_prefix + key + ':lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not self.cache.add(lock_key, 1, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                # Seau occupé par d'autres requêtes de la même plateforme
+                return self.lock_wait
+            time.sleep(0.002)
+        try:
+            return super().consume(key, rate_per_minute, burst, cost)
+        finally:
+            self.cache.delete(lock_key)
+
+    def load(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def save(self, key, state, rate_per_second, burst):
+        # Un seau plein n'a plus besoin d'être conservé : expiration une fois
+        # rempli, dette comprise
+        refill_time = (burst - state[0]) / rate_per_second if rate_per_second > 0 else None
+        timeout = int(refill_time) + 1 if refill_time is not None else None
+        self.cache.set(self.key_prefix + key, state, timeout)
+
+
+_memory_store = MemoryTokenBucketStore()
+
+
+def get_store():
+    if settings.TICKET_THROTTLE_BACKEND == 'cache':
+        return CacheTokenBucketStore(settings.TICKET_THROTTLE_CACHE)
+    return _memory_store
+
+
+def get_limits(platform_name, api_key=None):
+    """(requêtes par minute, rafale) applicables à une plateforme."""
+    rate, burst = settings.TICKET_THROTTLE_RATES.get(
+        platform_name, (settings.TICKET_THROTTLE_DEFAULT_RATE, settings.TICKET_THROTTLE_DEFAULT_BURST)
+    )
+    if api_key is not None:
+        rate = api_key.rate_per_minute or rate
+        burst = api_key.burst or burst
+    return rate, burst
+
+
+def check_platform(platform_name, api_key=None, cost=1):
+    """Renvoie None si la requête passe, sinon le délai d'attente en secondes."""
+    if not settings.TICKET_THROTTLE_ENABLED:
+        return None
+    rate, burst = get_limits(platform_name, api_key)
+    return get_store().consume(platform_name, rate, burst, cost)
+
+
+class PlatformTokenBucketThrottle(BaseThrottle):
+    """Throttle DRF, à placer après APIKeyAuthentication (utilise request.auth)."""
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        platform_name = request.auth
+        if not platform_name:
+            return True
+        self.retry_after = check_platform(
+            platform_name, getattr(request, 'api_key', None), self.get_cost(request, view)
+        )
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class PlatformBatchThrottle(PlatformTokenBucketThrottle):
+    """Un jeton par ticket du lot."""
+
+    def get_cost(self, request, view):
+        data = request.data
+        return max(1, len(data)) if isinstance(data, list) else 1
+
+    def allow_request(self, request, view):
+        # Lot au-delà de TICKET_BATCH_MAX_SIZE : refusé par la vue (413) sans
+        # rien créer, il ne doit pas endetter le seau de la plateforme
+        data = request.data
+        if isinstance(data, list) and len(data) > settings.TICKET_BATCH_MAX_SIZE:
+            self.retry_after = None
+            return True
+        return super().allow_request(request, view)
@@ -1,6 +1,18 @@
 from django.urls import path
-from .views import TicketSubmitAPIView
+from django.views.decorators.csrf import csrf_exempt
+from .views import (
+    TicketSubmitAPIView, TicketBatchSubmitAPIView, TicketAsyncSubmitView,
+    TicketClaimAPIView, TicketListAPIView, TicketStatsAPIView, TicketExportAPIView,
+    TicketStatusAPIView,
+)
 
 urlpatterns = [
+    path('', TicketListAPIView.as_view(), name='ticket-list'),
     path('submit/', TicketSubmitAPIView.as_view(), name='ticket-submit'),
-]
\ No newline at end of file
+    path('submit/batch/', TicketBatchSubmitAPIView.as_view(), name='ticket-submit-batch'),
+    path('submit/async/', csrf_exempt(TicketAsyncSubmitView.as_view()), name='ticket-submit-async'),
+    path('status/', TicketStatusAPIView.as_view(), name='ticket-status'),
+    path('claim/', TicketClaimAPIView.as_view(), name='ticket-claim'),
+    path('stats/', TicketStatsAPIView.as_view(), name='ticket-stats'),
+    path('export.<str:export_format>', TicketExportAPIView.as_view(), name='ticket-export'),
+]
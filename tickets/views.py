@@ -1,26 +1,371 @@
+import json
+import math
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, IsAdminUser
 
-from .serializers import TicketSerializer
+from . import idempotency, message_store, status_cache
+from .claims import claim_next
+from .clustering import assign_clusters
+from .export import FORMATS, export_response
+from .ingest import QueueFull, get_ingestor
+from .models import Ticket
+from .pagination import TicketKeysetPagination
+from .parsers import NDJSONParser
+from .priority import classify
+from .scheduler import schedule
+from .serializers import TicketSerializer, TicketReadSerializer
+from .stats import dashboard
+from .throttling import PlatformBatchThrottle, PlatformTokenBucketThrottle, check_platform
 from projet.authentication import APIKeyAuthentication
+from projet.metrics import phase
+from projet.routers import read_alias, replica_reads
 
 class TicketSubmitAPIView(APIView):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [AllowAny] 
+    throttle_classes = [PlatformTokenBucketThrottle]
 
     def post(self, request, format=None):
         platform_name_from_auth = request.auth
         if not platform_name_from_auth:
             return Response({"detail": "Nom de plateforme non déterminé via l'API Key."}, status=status.HTTP_400_BAD_REQUEST)
 
+        idempotency_key = request.headers.get(idempotency.HEADER)
+        if idempotency_key is not None:
+            if not idempotency_key or len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+                return Response(
+                    {"detail": f"L'en-tête {idempotency.HEADER} doit compter de 1 à {idempotency.MAX_KEY_LENGTH} caractères."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            fingerprint = idempotency.request_fingerprint(request.data)
+            stored = idempotency.lookup(platform_name_from_auth, idempotency_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+
         data = request.data.copy()
         data['platform_name'] = platform_name_from_auth 
 
         serializer = TicketSerializer(data=data)
-        if serializer.is_valid():
+        with phase('validation'):
+            valid = serializer.is_valid()
+        if not valid:
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if idempotency_key is None:
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            with phase('serialization'):
+                body = serializer.data
+            return Response(body, status=status.HTTP_201_CREATED)
+
+        def create():
+            # Peut être rappelé si la clé existante avait expiré
+            ticket = serializer.create(serializer.validated_data)
+            return status.HTTP_201_CREATED, dict(TicketSerializer(ticket).data), ticket
+
+        stored, replayed = idempotency.execute(platform_name_from_auth, idempotency_key, fingerprint, create)
+        if replayed:
+            return self.replay(stored, fingerprint)
+        return Response(stored.body, status=stored.status_code)
+
+    def replay(self, stored, fingerprint):
+        try:
+            idempotency.check_fingerprint(stored, fingerprint)
+        except idempotency.IdempotencyConflict as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = Response(stored.body, status=stored.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+class TicketBatchSubmitAPIView(APIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [AllowAny]
+    parser_classes = [JSONParser, NDJSONParser]
+    throttle_classes = [PlatformBatchThrottle]
+
+    def post(self, request, format=None):
+        platform_name_from_auth = request.auth
+        if not platform_name_from_auth:
+            return Response({"detail": "Nom de plateforme non déterminé via l'API Key."}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"detail": "Le corps de la requête doit être une liste de tickets."}, status=status.HTTP_400_BAD_REQUEST)
+        if not items:
+            return Response({"detail": "Aucun ticket à soumettre."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_size = settings.TICKET_BATCH_MAX_SIZE
+        if len(items) > max_size:
+            return Response(
+                {"detail": f"Lot trop volumineux : {len(items)} tickets (maximum {max_size})."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        results = []
+        tickets_to_create = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({"index": index, "status": "rejected", "errors": {"non_field_errors": ["Un ticket doit être un objet JSON."]}})
+                continue
+
+            data = dict(item)
+            data['platform_name'] = platform_name_from_auth
+
+            serializer = TicketSerializer(data=data)
+            if serializer.is_valid():
+                validated_data = serializer.validated_data
+                priority = classify(validated_data.get('subject', ''), validated_data.get('message')).priority
+                ticket = Ticket(priority=priority, **validated_data)
+                tickets_to_create.append(ticket)
+                results.append({"index": index, "status": "created", "ticket": ticket})
+            else:
+                results.append({"index": index, "status": "rejected", "errors": serializer.errors})
+
+        if tickets_to_create:
+            with transaction.atomic():
+                assigner = assign_clusters(tickets_to_create)
+                Ticket.objects.bulk_create(tickets_to_create)
+                assigner.finish()
+                schedule(tickets_to_create)
+
+        for result in results:
+            ticket = result.pop('ticket', None)
+            if ticket is not None:
+                result['id'] = ticket.pk
+                result['priority'] = ticket.priority
+
+        created_count = len(tickets_to_create)
+        rejected_count = len(results) - created_count
+        if rejected_count == 0:
+            response_status = status.HTTP_201_CREATED
+        elif created_count == 0:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        return Response(
+            {"created": created_count, "rejected": rejected_count, "results": results},
+            status=response_status
+        )
+
+
+class TicketAsyncSubmitView(View):
+    """
+    Soumission asynchrone : le ticket est validé puis mis en file, et l'insertion
+    se fait plus tard par lots. Répond 202 avec une référence provisoire.
+    """
+    authentication_class = APIKeyAuthentication
+
+    async def post(self, request):
+        if not settings.TICKET_ASYNC_INGEST:
+            return JsonResponse({"detail": "L'ingestion asynchrone n'est pas activée."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            # Résolution de la clé : cache en mémoire, requête SQL en cas d'échec
+            auth = await sync_to_async(self.authentication_class().authenticate)(request)
+        except AuthenticationFailed as exc:
+            return JsonResponse({"detail": str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        platform_name_from_auth = auth[1] if auth else None
+        if not platform_name_from_auth:
+            return JsonResponse({"detail": "Nom de plateforme non déterminé via l'API Key."}, status=status.HTTP_400_BAD_REQUEST)
+
+        retry_after = check_platform(platform_name_from_auth, getattr(request, 'api_key', None))
+        if retry_after is not None:
+            response = JsonResponse(
+                {"detail": f"Trop de requêtes pour cette plateforme. Réessayez dans {math.ceil(retry_after)} s."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(math.ceil(retry_after))
+            return response
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"detail": "JSON invalide."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({"detail": "Le corps de la requête doit être un objet JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        data['platform_name'] = platform_name_from_auth
+
+        serializer = TicketSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            reference = get_ingestor().submit(serializer.validated_data)
+        except QueueFull:
+            response = JsonResponse(
+                {"detail": "File d'ingestion saturée, réessayez plus tard."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = '1'
+            return response
+
+        return JsonResponse({"reference": str(reference), "status": "en attente"}, status=status.HTTP_202_ACCEPTED)
+
+
+class TicketStatusAPIView(APIView):
+    """
+    Statut et priorité d'un lot de tickets de la plateforme : ?ids=12,15,20
+    (au plus TICKET_STATUS_MAX_IDS). Répond 304 si l'ETag envoyé dans
+    If-None-Match est toujours valable. Voir status_cache.py.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, format=None):
+        platform_name_from_auth = request.auth
+        if not platform_name_from_auth:
+            return Response({"detail": "Nom de plateforme non déterminé via l'API Key."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            pks = sorted({int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()})
+        except ValueError:
+            pks = None
+        if not pks or not 0 < pks[0] <= pks[-1] < 2 ** 63:
+            return Response(
+                {"detail": "« ids » doit être une liste d'identifiants de tickets séparés par des virgules."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_ids = settings.TICKET_STATUS_MAX_IDS
+        if len(pks) > max_ids:
+            return Response({"detail": f"Trop d'identifiants : {len(pks)} (maximum {max_ids})."}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = status_cache.lookup(pks)
+        etag = status_cache.etag(platform_name_from_auth, pks, found)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            tickets, not_found = [], []
+            for pk in pks:
+                entry = found.get(pk)
+                # Les tickets d'une autre plateforme sont réputés inexistants
+                if entry is None or entry.platform_name != platform_name_from_auth:
+                    not_found.append(pk)
+                else:
+                    tickets.append({"id": pk, "status": entry.status, "priority": entry.priority})
+            response = Response({"tickets": tickets, "not_found": not_found})
+        response['ETag'] = etag
+        # Le client peut garder la réponse, mais doit la revalider à chaque fois
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class TicketClaimAPIView(APIView):
+    """
+    Attribue à l'agent connecté les prochains tickets nouveaux non assignés,
+    par priorité puis ancienneté. Corps optionnel : {"count": N}.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, format=None):
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            return Response({"detail": "« count » doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+        max_count = settings.TICKET_CLAIM_MAX_COUNT
+        if not 1 <= count <= max_count:
+            return Response({"detail": f"« count » doit être compris entre 1 et {max_count}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        tickets = claim_next(request.user, count)
+        message_store.load_many(tickets)
+        return Response(TicketReadSerializer(tickets, many=True).data, status=status.HTTP_200_OK)
+
+
+def parse_date_params(request, names=('since', 'until')):
+    """Dates AAAA-MM-JJ optionnelles de la requête ; ValidationError si invalides."""
+    dates = {}
+    for name in names:
+        value = request.query_params.get(name)
+        if not value:
+            continue
+        try:
+            dates[name] = parse_date(value)
+        except ValueError:
+            dates[name] = None
+        if dates[name] is None:
+            raise ValidationError({name: [f"« {name} » doit être une date AAAA-MM-JJ."]})
+    return dates
+
+
+def filter_tickets(queryset, request, fields=('status', 'priority', 'platform_name')):
+    """
+    Filtres communs des listes de tickets : ?status=, ?priority=,
+    ?platform_name= et ?since= / ?until= (jours inclus, heure locale).
+    """
+    for field in fields:
+        value = request.query_params.get(field)
+        if value:
+            queryset = queryset.filter(**{field: value})
+    dates = parse_date_params(request)
+    # Bornes en datetime plutôt que __date : l'index sur la date reste utilisable
+    if 'since' in dates:
+        start = timezone.make_aware(datetime.combine(dates['since'], time.min))
+        queryset = queryset.filter(submission_date__gte=start)
+    if 'until' in dates:
+        end = timezone.make_aware(datetime.combine(dates['until'] + timedelta(days=1), time.min))
+        queryset = queryset.filter(submission_date__lt=end)
+    return queryset
+
+
+class TicketListAPIView(ListAPIView):
+    """
+    Liste des tickets en lecture seule, paginée par curseur, lue sur la
+    réplique si elle est disponible. Filtres optionnels : voir filter_tickets.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = TicketReadSerializer
+    pagination_class = TicketKeysetPagination
+
+    def get_queryset(self):
+        queryset = Ticket.objects.using(read_alias(self.request)).select_related('agent')
+        return filter_tickets(queryset, self.request)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        message_store.load_many(page)
+        return page
+
+
+class TicketExportAPIView(APIView):
+    """
+    Export en flux des tickets filtrés : api/tickets/export.csv ou export.ndjson,
+    ?gzip=1 pour une compression à la volée. Filtres : voir filter_tickets.
+    Lu sur la réplique si elle est disponible.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, export_format, format=None):
+        if export_format not in FORMATS:
+            return Response({"detail": f"Format inconnu : « {export_format} »."}, status=status.HTTP_404_NOT_FOUND)
+        queryset = Ticket.objects.using(read_alias(request)).order_by('-submission_date', '-pk')
+        queryset = filter_tickets(queryset, request)
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        return export_response(queryset, export_format, compress=compress)
+
+
+class TicketStatsAPIView(APIView):
+    """
+    Statistiques du tableau de bord, lues dans les compteurs tenus à jour
+    (voir stats.py). Paramètres optionnels : ?since=AAAA-MM-JJ&until=AAAA-MM-JJ
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        with replica_reads(request):
+            return Response(dashboard(**parse_date_params(request)))
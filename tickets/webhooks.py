@@ -0,0 +1,249 @@
+"""
+Notifications sortantes (webhooks) des tickets clos.
+
+Quand un agent passe un ticket en « résolu » ou « ignoré » (workflow.save_ticket
+ou transition en masse), un WebhookEvent est écrit dans la même transaction
+que le changement de statut (outbox) : l'admin ne contacte jamais la
+plateforme, et aucun événement n'est perdu ni envoyé pour un changement annulé.
+
+La commande dispatch_webhooks envoie ensuite les événements en attente :
+
+- par plateforme (URL et secret dans TICKET_WEBHOOKS), en lots d'au plus
+  TICKET_WEBHOOK_BATCH_SIZE événements par requête POST {"events": [...]} ;
+  les plateformes sont servies en parallèle, chacune sur sa connexion HTTP
+  persistante (keep-alive) ;
+- corps signé par HMAC-SHA256 avec le secret de la plateforme : en-têtes
+  X-Webhook-Timestamp et X-Webhook-Signature (sha256=<hex> de
+  « timestamp.corps ») ;
+- en cas d'échec (réseau ou code hors 2xx), nouvel essai après un délai
+  exponentiel (TICKET_WEBHOOK_RETRY_BASE * 2^(essais - 1), plafonné à
+  TICKET_WEBHOOK_RETRY_MAX, avec une gigue) ; après TICKET_WEBHOOK_MAX_ATTEMPTS
+  essais, l'événement est abandonné et reste visible dans l'admin.
+
+L'envoi est « au moins une fois » : une plateforme peut recevoir deux fois le
+même événement (identifiant "id"), par exemple si la réponse se perd.
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import math
+import random
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EVENT = 'ticket.status_changed'
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+TIMESTAMP_HEADER = 'X-Webhook-Timestamp'
+
+# (identifiant, plateforme, ancien statut, nouveau statut, priorité) d'un ticket modifié
+StatusChange = namedtuple('StatusChange', ['ticket_id', 'platform_name', 'previous_status', 'status', 'priority'])
+DispatchResult = namedtuple('DispatchResult', ['delivered', 'failed', 'dead'])
+
+
+def subscribed(platform_name=None):
+    """Au moins une plateforme (ou ``platform_name``) a-t-elle un webhook ?"""
+    if platform_name is None:
+        return bool(settings.TICKET_WEBHOOKS)
+    return platform_name in settings.TICKET_WEBHOOKS
+
+
+def enqueue(changes):
+    """
+    Enregistre l'événement de chaque StatusChange des plateformes abonnées.
+    À appeler dans la transaction du changement de statut.
+    """
+    from .models import WebhookEvent
+
+    now = timezone.now()
+    events = [
+        WebhookEvent(
+            platform_name=change.platform_name,
+            ticket_id=change.ticket_id,
+            event=EVENT,
+            payload={
+                'ticket': change.ticket_id,
+                'previous_status': change.previous_status,
+                'status': change.status,
+                'priority': change.priority,
+                'changed_at': now.isoformat(),
+            },
+            next_attempt_at=now,
+        )
+        for change in map(StatusChange._make, changes)
+        if subscribed(change.platform_name)
+    ]
+    if events:
+        WebhookEvent.objects.bulk_create(events)
+    return len(events)
+
+
+def sign(secret, timestamp, body):
+    message = f'{timestamp}.'.encode() + body
+    return 'sha256=' + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def retry_delay(attempts):
+    """Délai avant l'essai suivant le ``attempts``-ième, en secondes."""
+    delay = min(settings.TICKET_WEBHOOK_RETRY_MAX, settings.TICKET_WEBHOOK_RETRY_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class Dispatcher:
+    """
+    Envoi des événements en attente. Une instance garde une connexion HTTP
+    par plateforme d'un appel de run_once() à l'autre ; close() les ferme.
+    """
+
+    def __init__(self, batch_size=None, timeout=None, concurrency=None):
+        self.batch_size = batch_size or settings.TICKET_WEBHOOK_BATCH_SIZE
+        self.timeout = timeout or settings.TICKET_WEBHOOK_TIMEOUT
+        self.concurrency = concurrency or settings.TICKET_WEBHOOK_CONCURRENCY
+        self._connections = {}  # plateforme -> (hôte, connexion)
+
+    def close(self):
+        for _, conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+    def _connection(self, platform_name, url):
+        parts = urlsplit(url)
+        cached = self._connections.get(platform_name)
+        if cached is not None and cached[0] == parts.netloc:
+            return cached[1], True
+        if cached is not None:
+            cached[1].close()
+        conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        conn = conn_class(parts.hostname, parts.port, timeout=self.timeout)
+        self._connections[platform_name] = (parts.netloc, conn)
+        return conn, False
+
+    def post(self, platform_name, url, body, headers):
+        """POST sur la connexion de la plateforme ; renvoie le code de réponse."""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        while True:
+            conn, reused = self._connection(platform_name, url)
+            try:
+                conn.request('POST', path, body, headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._connections.pop(platform_name, None)
+                # Connexion persistante fermée entre-temps par le serveur : une nouvelle
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                conn.close()
+                self._connections.pop(platform_name, None)
+            return response.status
+
+    def deliver(self, platform_name, events):
+        """
+        Envoie ``events`` (une seule plateforme) ; renvoie {id: erreur ou None}
+        des événements envoyés. Après un lot en échec, les suivants ne sont pas
+        tentés et n'apparaissent pas dans le résultat.
+        """
+        endpoint = settings.TICKET_WEBHOOKS.get(platform_name)
+        if endpoint is None:
+            return {event.pk: "Aucun webhook configuré pour cette plateforme." for event in events}
+        results = {}
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            body = json.dumps({'events': [
+                {'id': event.pk, 'type': event.event, 'created_at': event.created_at.isoformat(), 'data': event.payload}
+                for event in batch
+            ]}, separators=(',', ':')).encode()
+            timestamp = str(int(time.time()))
+            headers = {
+                'Content-Type': 'application/json',
+                TIMESTAMP_HEADER: timestamp,
+                SIGNATURE_HEADER: sign(endpoint['secret'], timestamp, body),
+            }
+            try:
+                status = self.post(platform_name, endpoint['url'], body, headers)
+                error = None if 200 <= status < 300 else f"Réponse HTTP {status}"
+            except (OSError, http.client.HTTPException) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            results.update((event.pk, error) for event in batch)
+            if error is not None:
+                break
+        return results
+
+    def claim(self, limit, lease):
+        """
+        Événements dus, mis de côté le temps de l'envoi : leur échéance est
+        repoussée de ``lease`` secondes, pour qu'un autre dispatcher ne les
+        prenne pas, et qu'ils reviennent seuls si celui-ci s'arrête en route.
+        """
+        from .models import WebhookEvent
+
+        now = timezone.now()
+        due = WebhookEvent.objects.filter(state=WebhookEvent.PENDING, next_attempt_at__lte=now).order_by('next_attempt_at', 'pk')
+        with transaction.atomic():
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            events = list(due[:limit])
+            WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + timedelta(seconds=lease)
+            )
+        return events
+
+    def run_once(self, limit=1000):
+        """Un passage : envoie jusqu'à ``limit`` événements dus. Renvoie un DispatchResult."""
+        from .models import WebhookEvent
+
+        # Pire cas : chaque lot attend le délai maximal, deux fois (reconnexion)
+        events = self.claim(limit, lease=2 * self.timeout * (math.ceil(limit / self.batch_size) + 1))
+        by_platform = defaultdict(list)
+        for event in events:
+            by_platform[event.platform_name].append(event)
+
+        results = {}
+        # Threads pour le réseau seulement : la base est mise à jour ici
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for outcome in executor.map(lambda item: self.deliver(*item), by_platform.items()):
+                results.update(outcome)
+
+        now = timezone.now()
+        delivered = [event.pk for event in events if event.pk in results and results[event.pk] is None]
+        WebhookEvent.objects.filter(pk__in=delivered).update(
+            state=WebhookEvent.DELIVERED, delivered_at=now, attempts=F('attempts') + 1, last_error=''
+        )
+        failed = []
+        dead = 0
+        for event in events:
+            if event.pk not in results:
+                # Pas tenté (lot précédent en échec) : rendu, sans compter d'essai
+                event.next_attempt_at = now + timedelta(seconds=retry_delay(1))
+                failed.append(event)
+                continue
+            error = results[event.pk]
+            if error is None:
+                continue
+            event.attempts += 1
+            event.last_error = error
+            if event.attempts >= settings.TICKET_WEBHOOK_MAX_ATTEMPTS:
+                event.state = WebhookEvent.DEAD
+                dead += 1
+                logger.warning("Webhook abandonné après %d essai(s) : %s — %s", event.attempts, event, error)
+            else:
+                event.next_attempt_at = now + timedelta(seconds=retry_delay(event.attempts))
+            failed.append(event)
+        WebhookEvent.objects.bulk_update(failed, ['state', 'attempts', 'next_attempt_at', 'last_error'])
+        return DispatchResult(len(delivered), len(events) - len(delivered) - dead, dead)
@@ -0,0 +1,151 @@
+"""
+Cycle de vie des tickets : table des transitions de statut autorisées,
+verrouillage optimiste par numéro de version et transitions en masse.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from . import message_store, status_cache, webhooks
+
+NEW = 'nouveau'
+IN_PROGRESS = 'en cours de traitement'
+RESOLVED = 'resolu'
+IGNORED = 'ignore'
+
+STATUSES = (NEW, IN_PROGRESS, RESOLVED, IGNORED)
+CLOSED_STATUSES = (RESOLVED, IGNORED)
+
+# Statut actuel -> statuts accessibles pour un agent. Les superutilisateurs
+# peuvent passer d'un statut à n'importe quel autre.
+TRANSITIONS = {
+    NEW: (IN_PROGRESS, IGNORED),
+    IN_PROGRESS: (RESOLVED, IGNORED),
+    RESOLVED: (),
+    IGNORED: (),
+}
+
+TransitionResult = namedtuple('TransitionResult', ['updated', 'rejected'])
+
+
+class InvalidTransition(ValidationError):
+    pass
+
+
+class ConcurrentModification(Exception):
+    pass
+
+
+def can_transition(from_status, to_status, user=None):
+    if from_status == to_status:
+        return True
+    if user is not None and user.is_superuser:
+        return to_status in STATUSES
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def check_transition(from_status, to_status, user=None):
+    if not can_transition(from_status, to_status, user):
+        raise InvalidTransition(
+            f"Passage du statut « {from_status} » à « {to_status} » non autorisé.",
+            code='invalid_transition',
+        )
+
+
+def allowed_statuses(from_status, user=None):
+    """Statuts proposés dans le formulaire, statut actuel compris."""
+    return [status for status in STATUSES if can_transition(from_status, status, user)]
+
+
+def save_ticket(ticket, by_user, fields, expected_version=None):
+    """
+    Enregistre les ``fields`` modifiés d'un ticket existant par un UPDATE
+    conditionné sur sa version : si un autre enregistrement est passé entre
+    l'affichage et la soumission, rien n'est écrit et ConcurrentModification
+    est levée. Aucune relecture de la ligne n'est nécessaire.
+
+    Le passage à un statut clos est notifié à la plateforme (webhooks.py),
+    dans la même transaction.
+    """
+    previous_status = ticket._loaded_status or ticket.status
+    if 'status' in fields:
+        check_transition(previous_status, ticket.status, by_user)
+    if expected_version is None:
+        expected_version = ticket.version
+
+    model = type(ticket)
+    values = {}
+    for name in fields:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.primary_key:
+            values[field.name] = getattr(ticket, field.name)
+
+    # Message devenu trop long : début ici, message complet à part
+    body = message_store.split(ticket) if 'message' in values else None
+    if body is not None:
+        values.update(message=ticket.message, message_truncated=True)
+
+    with transaction.atomic():
+        updated = model._default_manager.filter(pk=ticket.pk, version=expected_version).update(
+            version=F('version') + 1, **values
+        )
+        if updated and body is not None:
+            message_store.store([(ticket, body)])
+        if updated and ticket.status != previous_status and ticket.status in CLOSED_STATUSES:
+            webhooks.enqueue([(ticket.pk, ticket.platform_name, previous_status, ticket.status, ticket.priority)])
+    if not updated:
+        raise ConcurrentModification(
+            f"Le ticket {ticket.pk} a été modifié par quelqu'un d'autre entre-temps."
+        )
+    ticket.version = expected_version + 1
+    ticket._loaded_status = ticket.status
+    status_cache.invalidate([ticket.pk])
+    return ticket
+
+
+def transition(queryset, to_status, by_user):
+    """
+    Passe en ``to_status`` tous les tickets de ``queryset`` pour lesquels la
+    transition est permise, en un seul UPDATE. Un agent ne modifie que les
+    tickets non assignés ou qui lui sont assignés ; un ticket pris en charge
+    par un agent lui est assigné s'il ne l'était pas.
+
+    Renvoie TransitionResult(updated, rejected), ``rejected`` étant la liste
+    des (id, statut) écartés. Le passage à un statut clos est notifié aux
+    plateformes (webhooks.py), dans la même transaction.
+    """
+    if to_status not in STATUSES:
+        raise InvalidTransition(f"Statut inconnu : « {to_status} ».", code='invalid_status')
+
+    sources = [status for status in STATUSES if status != to_status and can_transition(status, to_status, by_user)]
+    eligible = Q(status__in=sources)
+    if not by_user.is_superuser:
+        eligible &= Q(agent__isnull=True) | Q(agent=by_user)
+
+    rejected = list(queryset.exclude(eligible).order_by('pk').values_list('pk', 'status'))
+
+    values = {'status': to_status, 'version': F('version') + 1}
+    if to_status == IN_PROGRESS and not by_user.is_superuser:
+        values['agent'] = Coalesce('agent', Value(by_user.pk))
+    tickets = queryset.model._default_manager.filter(eligible, pk__in=queryset.values('pk'))
+    if to_status not in CLOSED_STATUSES or not webhooks.subscribed():
+        updated = tickets.update(**values)
+    else:
+        with transaction.atomic():
+            # Lignes verrouillées jusqu'à la fin : un événement par ticket réellement modifié
+            changed = list(tickets.select_for_update().values_list('pk', 'platform_name', 'status', 'priority'))
+            updated = queryset.model._default_manager.filter(
+                eligible, pk__in=[pk for pk, *_ in changed]
+            ).update(**values)
+            webhooks.enqueue(
+                (pk, platform_name, status, to_status, priority) for pk, platform_name, status, priority in changed
+            )
+    if updated:
+        status_cache.invalidate()
+    return TransitionResult(updated, rejected)